@@ -0,0 +1,33 @@
+"""Add explore feed snapshots
+
+Revision ID: a8d4f1e6b93c
+Revises: e4a7c2f9d316
+Create Date: 2026-10-18 20:07:45.183042
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a8d4f1e6b93c"
+down_revision: Union[str, None] = "e4a7c2f9d316"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "explore_feed_snapshots",
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("feed", sa.String(), nullable=False),
+        sa.Column("bot_ids", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.PrimaryKeyConstraint("version", "feed"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("explore_feed_snapshots")
@@ -0,0 +1,93 @@
+"""Add search vectors and trigram indexes
+
+Revision ID: a8d5c3e9f174
+Revises: f2c8e4a1b6d9
+Create Date: 2026-10-18 13:27:51.604118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a8d5c3e9f174"
+down_revision: Union[str, None] = "f2c8e4a1b6d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def weighted(*columns):
+    return " || ".join(
+        f"setweight(to_tsvector('simple'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+
+
+SEARCH_VECTORS = {
+    "bots": weighted(
+        ("bot_name", "A"),
+        ("short_description", "B"),
+        ("category", "C"),
+        ("description", "D"),
+    ),
+    "voices": weighted(
+        ("voice_name", "A"),
+        ("voice_description", "B"),
+        ("style", "C"),
+        ("gender", "C"),
+    ),
+}
+
+INDEXES = [
+    ("ix_bots_search_vector", "bots", ["search_vector"], {}),
+    ("ix_bots_bot_name_trgm", "bots", ["bot_name"], {"bot_name": "gin_trgm_ops"}),
+    ("ix_voices_search_vector", "voices", ["search_vector"], {}),
+    (
+        "ix_voices_voice_name_trgm",
+        "voices",
+        ["voice_name"],
+        {"voice_name": "gin_trgm_ops"},
+    ),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, expression in SEARCH_VECTORS.items():
+        op.add_column(
+            table,
+            sa.Column(
+                "search_vector",
+                postgresql.TSVECTOR(),
+                sa.Computed(expression, persisted=True),
+            ),
+        )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, ops in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_using="gin",
+                postgresql_ops=ops,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+    for table in SEARCH_VECTORS:
+        op.drop_column(table, "search_vector")
@@ -0,0 +1,64 @@
+"""Denormalize last message of chats
+
+Revision ID: b4e1d2c7a9f3
+Revises: 9e9a82982dc5
+Create Date: 2026-10-18 10:12:44.218305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b4e1d2c7a9f3"
+down_revision: Union[str, None] = "9e9a82982dc5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table, key in (("chats", "chat_id"), ("group_chats", "group_chat_id")):
+        op.add_column(
+            table,
+            sa.Column("last_message_time", sa.TIMESTAMP(timezone=True), nullable=True),
+        )
+
+        # Deleting the last message used to cascade to the whole chat
+        op.drop_constraint(f"{table}_last_message_fkey", table, type_="foreignkey")
+        op.create_foreign_key(
+            f"{table}_last_message_fkey",
+            table,
+            "messages",
+            ["last_message"],
+            ["message_id"],
+            ondelete="SET NULL",
+        )
+
+        op.execute(f"""
+            UPDATE {table}
+            SET last_message = latest.message_id,
+                last_message_time = latest.created_at
+            FROM (
+                SELECT DISTINCT ON ({key}) {key}, message_id, created_at
+                FROM messages
+                WHERE {key} IS NOT NULL
+                ORDER BY {key}, created_at DESC, message_id DESC
+            ) AS latest
+            WHERE latest.{key} = {table}.{key}
+            """)
+
+
+def downgrade() -> None:
+    for table in ("chats", "group_chats"):
+        op.drop_constraint(f"{table}_last_message_fkey", table, type_="foreignkey")
+        op.create_foreign_key(
+            f"{table}_last_message_fkey",
+            table,
+            "messages",
+            ["last_message"],
+            ["message_id"],
+            ondelete="CASCADE",
+        )
+        op.drop_column(table, "last_message_time")
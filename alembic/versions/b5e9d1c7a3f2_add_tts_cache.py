@@ -0,0 +1,37 @@
+"""Add TTS cache
+
+Revision ID: b5e9d1c7a3f2
+Revises: c3f7a2d8e615
+Create Date: 2026-10-18 15:21:40.118306
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e9d1c7a3f2"
+down_revision: Union[str, None] = "c3f7a2d8e615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tts_cache",
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("audio_url", sa.String(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tts_cache")
@@ -0,0 +1,42 @@
+"""Add BRIN index on message time
+
+Revision ID: c3f7a2d8e615
+Revises: a8d5c3e9f174
+Create Date: 2026-10-18 14:05:12.873520
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f7a2d8e615"
+down_revision: Union[str, None] = "a8d5c3e9f174"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Messages are inserted in time order, so a BRIN index stays tiny and
+    # lets the trending refresh read only the blocks written since the last run
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_created_at_brin",
+            "messages",
+            ["created_at"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_messages_created_at_brin",
+            table_name="messages",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,38 @@
+"""Add last hit time to the TTS cache
+
+Revision ID: c7e2b9f4a1d8
+Revises: a8d4f1e6b93c
+Create Date: 2026-10-18 21:26:14.602318
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c7e2b9f4a1d8"
+down_revision: Union[str, None] = "a8d4f1e6b93c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tts_cache",
+        sa.Column(
+            "last_hit_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        op.f("ix_tts_cache_last_hit_at"), "tts_cache", ["last_hit_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_tts_cache_last_hit_at"), table_name="tts_cache")
+    op.drop_column("tts_cache", "last_hit_at")
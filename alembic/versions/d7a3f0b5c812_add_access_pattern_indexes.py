@@ -0,0 +1,60 @@
+"""Add access pattern indexes
+
+Revision ID: d7a3f0b5c812
+Revises: b4e1d2c7a9f3
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d7a3f0b5c812"
+down_revision: Union[str, None] = "b4e1d2c7a9f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    (
+        "ix_messages_chat_id_created_at",
+        "messages",
+        ["chat_id", sa.text("created_at DESC"), "message_id"],
+    ),
+    (
+        "ix_messages_group_chat_id_created_at",
+        "messages",
+        ["group_chat_id", sa.text("created_at DESC"), "message_id"],
+    ),
+    ("ix_bots_privacy_category", "bots", ["privacy", "category"]),
+    ("ix_bots_created_by", "bots", ["created_by"]),
+    ("ix_voices_created_by", "voices", ["created_by"]),
+    ("ix_chats_user_id", "chats", ["user_id"]),
+    ("ix_group_chats_user_id", "group_chats", ["user_id"]),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently so the tables stay writable during the deploy
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,33 @@
+"""Add bot counter deltas
+
+Revision ID: e4a7c2f9d316
+Revises: b5e9d1c7a3f2
+Create Date: 2026-10-18 18:42:03.511927
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a7c2f9d316"
+down_revision: Union[str, None] = "b5e9d1c7a3f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bot_counter_deltas",
+        sa.Column("delta_id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("bot_id", sa.Integer(), nullable=False),
+        sa.Column("num_chats", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["bot_id"], ["bots.bot_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("delta_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bot_counter_deltas")
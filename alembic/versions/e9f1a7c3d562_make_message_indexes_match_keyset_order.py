@@ -0,0 +1,56 @@
+"""Make message indexes match the keyset order
+
+Revision ID: e9f1a7c3d562
+Revises: c7e2b9f4a1d8
+Create Date: 2026-10-18 22:14:37.940215
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e9f1a7c3d562"
+down_revision: Union[str, None] = "c7e2b9f4a1d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Messages are paged on (created_at DESC, message_id DESC)
+INDEXES = [
+    ("ix_messages_chat_id_created_at", "chat_id"),
+    ("ix_messages_group_chat_id_created_at", "group_chat_id"),
+]
+
+
+def replace_indexes(message_id_order: str) -> None:
+    # Build the new index next to the old one, so reads never lose it
+    with op.get_context().autocommit_block():
+        for name, column in INDEXES:
+            op.create_index(
+                f"{name}_new",
+                "messages",
+                [
+                    column,
+                    sa.text("created_at DESC"),
+                    sa.text(f"message_id {message_id_order}"),
+                ],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+            op.drop_index(
+                name,
+                table_name="messages",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+            op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def upgrade() -> None:
+    replace_indexes("DESC")
+
+
+def downgrade() -> None:
+    replace_indexes("ASC")
@@ -0,0 +1,59 @@
+"""Add keyset pagination indexes
+
+Revision ID: f2c8e4a1b6d9
+Revises: d7a3f0b5c812
+Create Date: 2026-10-18 12:41:09.218374
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c8e4a1b6d9"
+down_revision: Union[str, None] = "d7a3f0b5c812"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    (
+        "ix_bots_created_at",
+        "bots",
+        [sa.text("created_at DESC"), sa.text("bot_id DESC")],
+    ),
+    (
+        "ix_voices_created_at",
+        "voices",
+        [sa.text("created_at DESC"), sa.text("voice_id DESC")],
+    ),
+    (
+        "ix_user_likes_bots_user_id_created_at",
+        "user_likes_bots",
+        ["user_id", sa.text("created_at DESC"), sa.text("bot_id DESC")],
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,28 @@
+"""Store TTS cache replies once they repeat
+
+Revision ID: f4b8d2e6a917
+Revises: e9f1a7c3d562
+Create Date: 2026-10-18 23:41:07.215384
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f4b8d2e6a917"
+down_revision: Union[str, None] = "e9f1a7c3d562"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column("tts_cache", "audio_url", existing_type=sa.String(), nullable=True)
+
+
+def downgrade() -> None:
+    # Keys seen only once have no audio to keep
+    op.execute("DELETE FROM tts_cache WHERE audio_url IS NULL")
+    op.alter_column("tts_cache", "audio_url", existing_type=sa.String(), nullable=False)
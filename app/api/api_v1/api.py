@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.routes import bot, explore, user, chat, voice, groupchat
+from app.api.api_v1.routes import bot, explore, user, chat, voice, groupchat, admin
 
 api_router = APIRouter()
 api_router.include_router(explore.router)
@@ -9,3 +9,4 @@ api_router.include_router(user.router)
 api_router.include_router(voice.router)
 api_router.include_router(chat.router)
 api_router.include_router(groupchat.router)
+api_router.include_router(admin.router)
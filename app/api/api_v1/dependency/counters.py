@@ -0,0 +1,144 @@
+import asyncio
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+# Any constant shared by the workers, only one of them folds or reconciles
+# at a time
+COUNTER_LOCK_ID = 4815162342
+
+# Bot.num_chats is the number of bot messages in one-to-one chats: the
+# greeting and every reply. The messages table is the source of truth.
+RECONCILE_STATEMENTS = {
+    # Runs after LOCK_BOTS_STATEMENT, in its own snapshot: every like that
+    # committed before is counted, every later one waits for the lock and
+    # adds itself on top of the count
+    "likes": """
+        UPDATE bots SET likes = counted.total
+        FROM (
+            SELECT bots.bot_id, count(user_likes_bots.bot_id) AS total
+            FROM bots
+            LEFT JOIN user_likes_bots ON user_likes_bots.bot_id = bots.bot_id
+            GROUP BY bots.bot_id
+        ) AS counted
+        WHERE counted.bot_id = bots.bot_id AND bots.likes <> counted.total
+        """,
+    # One statement, so the dropped deltas and the counted messages come from
+    # the same snapshot: a delta committed later belongs to a message that is
+    # not counted, and is folded on top afterwards
+    "num_chats": """
+        WITH dropped AS (DELETE FROM bot_counter_deltas)
+        UPDATE bots SET num_chats = counted.total
+        FROM (
+            SELECT bots.bot_id, count(messages.message_id) AS total
+            FROM bots
+            LEFT JOIN messages
+                ON messages.created_by_bot = bots.bot_id
+                AND messages.chat_id IS NOT NULL
+            GROUP BY bots.bot_id
+        ) AS counted
+        WHERE counted.bot_id = bots.bot_id AND bots.num_chats <> counted.total
+        """,
+}
+
+# Likes and unlikes update their bot row in the statement that changes
+# user_likes_bots, so with the rows locked no like can be committed between
+# the count and the update
+LOCK_BOTS_STATEMENT = "SELECT bot_id FROM bots ORDER BY bot_id FOR UPDATE"
+
+FOLD_STATEMENT = """
+    WITH folded AS (
+        DELETE FROM bot_counter_deltas RETURNING bot_id, num_chats
+    )
+    UPDATE bots SET num_chats = bots.num_chats + pending.total
+    FROM (
+        SELECT bot_id, sum(num_chats) AS total FROM folded GROUP BY bot_id
+    ) AS pending
+    WHERE pending.bot_id = bots.bot_id
+    """
+
+
+def count_chat_message(db: AsyncSession, message: models.Message, amount: int):
+    """Records a change of num_chats in the transaction of the message.
+
+    Requests only insert a delta row, which never contends with other
+    requests, and fold_counters() applies the deltas to the bots in batches.
+    """
+    if message.chat_id is not None and message.created_by_bot is not None:
+        db.add(models.BotCounterDelta(bot_id=message.created_by_bot, num_chats=amount))
+
+
+async def uncount_chat(db: AsyncSession, chat_id: int):
+    """Records the removal of every bot message of a chat about to be deleted."""
+    await db.execute(
+        insert(models.BotCounterDelta).from_select(
+            ["bot_id", "num_chats"],
+            select(models.Message.created_by_bot, -func.count())
+            .where(
+                models.Message.chat_id == chat_id,
+                models.Message.created_by_bot.is_not(None),
+            )
+            .group_by(models.Message.created_by_bot),
+        )
+    )
+
+
+async def fold_counters() -> int:
+    """Applies the pending deltas to the bots, returns the number of bots updated.
+
+    Skipped (returns 0) while another worker folds or reconciles.
+    """
+    async with AsyncSessionLocal() as db:
+        locked = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": COUNTER_LOCK_ID}
+        )
+        if not locked:
+            return 0
+        updated = (await db.execute(text(FOLD_STATEMENT))).rowcount
+        await db.commit()
+    return updated
+
+
+async def fold_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await fold_counters()
+        except Exception as e:
+            print(f"Folding bot counters failed: {e}")
+
+
+async def pending_deltas() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(models.BotCounterDelta))
+
+
+async def reconcile_counters() -> dict:
+    """Recomputes the Bot counters from their source tables.
+
+    Waits for a running fold to finish, so a batch of deltas is never both
+    counted and folded, and locks the bots, so a concurrent like or unlike
+    is never overwritten by a count that missed it.
+    """
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:id)"), {"id": COUNTER_LOCK_ID}
+        )
+        await db.execute(text(LOCK_BOTS_STATEMENT))
+        fixed = {}
+        for column, statement in RECONCILE_STATEMENTS.items():
+            fixed[column] = (await db.execute(text(statement))).rowcount
+        await db.commit()
+    return fixed
+
+
+async def reconcile_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fixed = await reconcile_counters()
+            print(f"Reconciled bot counters: {fixed}")
+        except Exception as e:
+            print(f"Reconciling bot counters failed: {e}")
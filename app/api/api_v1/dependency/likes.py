@@ -0,0 +1,64 @@
+from typing import List
+from sqlalchemy import exists, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from app import models
+
+user_likes_bots = models.user_likes_bots
+
+
+def like_statement(user_id: str, bot_id: int):
+    """Likes a bot and bumps its counter in one statement.
+
+    The like is only inserted if the bot exists and is not liked yet, and
+    the counter only moves for a row that was actually inserted, so
+    repeated or concurrent likes are harmless. Returns one row: whether
+    the bot exists and its new like count, NULL when nothing changed.
+    """
+    inserted = (
+        insert(user_likes_bots)
+        .from_select(
+            ["user_id", "bot_id"],
+            select(literal(user_id), models.Bot.bot_id).where(
+                models.Bot.bot_id == bot_id
+            ),
+        )
+        .on_conflict_do_nothing()
+        .returning(user_likes_bots.c.bot_id)
+        .cte("inserted")
+    )
+    return counted(inserted, bot_id, models.Bot.likes + 1)
+
+
+def unlike_statement(user_id: str, bot_id: int):
+    """Unlikes a bot and lowers its counter in one statement, see like_statement."""
+    deleted = (
+        user_likes_bots.delete()
+        .where(
+            user_likes_bots.c.user_id == user_id,
+            user_likes_bots.c.bot_id == bot_id,
+        )
+        .returning(user_likes_bots.c.bot_id)
+        .cte("deleted")
+    )
+    return counted(deleted, bot_id, models.Bot.likes - 1)
+
+
+def counted(changed, bot_id: int, likes):
+    updated = (
+        update(models.Bot)
+        .where(models.Bot.bot_id.in_(select(changed.c.bot_id)))
+        .values(likes=likes)
+        .returning(models.Bot.likes)
+        .cte("updated")
+    )
+    return select(
+        exists().where(models.Bot.bot_id == bot_id).label("found"),
+        select(updated.c.likes).scalar_subquery().label("likes"),
+    )
+
+
+def liked_statement(user_id: str, bot_ids: List[int]):
+    return select(user_likes_bots.c.bot_id).where(
+        user_likes_bots.c.user_id == user_id,
+        user_likes_bots.c.bot_id.in_(bot_ids),
+    )
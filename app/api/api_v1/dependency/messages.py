@@ -0,0 +1,70 @@
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.api.api_v1.dependency.counters import count_chat_message
+
+
+def get_chat_keys(message: models.Message):
+    """Returns the chat model a message belongs to, its key column, the
+    matching message column and the chat id."""
+    if message.chat_id is not None:
+        return (
+            models.Chat,
+            models.Chat.chat_id,
+            models.Message.chat_id,
+            message.chat_id,
+        )
+    return (
+        models.GroupChat,
+        models.GroupChat.group_chat_id,
+        models.Message.group_chat_id,
+        message.group_chat_id,
+    )
+
+
+async def add_message(db: AsyncSession, message: models.Message) -> models.Message:
+    """Inserts a message and makes it the last message of its chat.
+
+    The update only moves forward in time, so a slower concurrent insert
+    never replaces a newer last message. The caller commits.
+    """
+    db.add(message)
+    await db.flush()
+    count_chat_message(db, message, 1)
+
+    chat_model, chat_key, _, chat_id = get_chat_keys(message)
+    await db.execute(
+        update(chat_model)
+        .where(
+            chat_key == chat_id,
+            or_(
+                chat_model.last_message_time.is_(None),
+                chat_model.last_message_time <= message.created_at,
+            ),
+        )
+        .values(last_message=message.message_id, last_message_time=message.created_at)
+    )
+    return message
+
+
+async def remove_message(db: AsyncSession, message: models.Message):
+    """Deletes a message and, if it was the last message of its chat, hands
+    that over to the message before it. The caller commits."""
+    chat_model, chat_key, message_key, chat_id = get_chat_keys(message)
+
+    previous = await db.scalar(
+        select(models.Message)
+        .where(message_key == chat_id, models.Message.message_id != message.message_id)
+        .order_by(models.Message.created_at.desc(), models.Message.message_id.desc())
+        .limit(1)
+    )
+    await db.execute(
+        update(chat_model)
+        .where(chat_key == chat_id, chat_model.last_message == message.message_id)
+        .values(
+            last_message=previous.message_id if previous else None,
+            last_message_time=previous.created_at if previous else None,
+        )
+    )
+    count_chat_message(db, message, -1)
+    await db.delete(message)
@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Sequence, Tuple, Union
+from fastapi import HTTPException, status
+from sqlalchemy import or_
+from app.schemas.page import Page
+
+# Rows are paged on (key, id), where key is a timestamp or a search rank
+Key = Union[datetime, float]
+
+
+def encode_cursor(key: Key, id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([key, id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Key, int]:
+    try:
+        key, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(key, str):
+            key = datetime.fromisoformat(key)
+        elif not isinstance(key, (int, float)):
+            raise TypeError("Unsupported cursor key")
+        return key, int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def keyset(query, key_column, id_column, cursor: Optional[str], limit: int):
+    """Pages a query in descending (key, id) order, e.g. newest first.
+
+    Rows are found by seeking past the cursor instead of skipping an OFFSET,
+    so a page costs the same however deep it is. The `key <=` bound is kept
+    on its own so it can be used as an index condition. One extra row is
+    fetched to tell whether there is a next page.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    if cursor:
+        key, id = decode_cursor(cursor)
+        query = query.where(
+            key_column <= key,
+            or_(key_column < key, id_column < id),
+        )
+    return query.order_by(key_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def make_page(
+    rows: Sequence, limit: int, get_key: Callable, convert: Callable = None
+) -> Page:
+    """Builds a Page from the rows of a keyset() query.
+
+    `get_key` returns the (key, id) of a row, `convert` optionally maps each
+    row to the item returned.
+    """
+    items = list(rows[:limit])
+    next_cursor = (
+        encode_cursor(*get_key(items[-1])) if items and len(rows) > limit else None
+    )
+    if convert is not None:
+        items = [convert(row) for row in items]
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,260 @@
+import asyncio
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import Float, bindparam, cast, delete, extract, func, select, text
+from sqlalchemy.sql.sqltypes import TIMESTAMP
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+
+class Feed(str, Enum):
+    trending = "trending"
+    most_chatted = "most_chatted"
+    most_liked = "most_liked"
+    new = "new"
+
+
+# Any constant shared by the workers, only one of them rebuilds at a time
+FEED_LOCK_ID = 4815162343
+
+
+def encode_feed_cursor(version: int, position: int) -> str:
+    raw = json.dumps([version, position])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_feed_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        version, position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        version, position = int(version), int(position)
+        if position < 0:
+            raise ValueError("Negative position")
+        return version, position
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def decayed_sum(created_at_column, now, half_life: float):
+    # Every event is worth 1 when it happens and half that each half-life
+    age = extract("epoch", now - created_at_column)
+    return cast(func.sum(func.power(0.5, age / half_life)), Float)
+
+
+class RankedFeeds:
+    """Ranked lists of public bot ids, rebuilt by a background task.
+
+    Trending scores are decayed exponentially and updated incrementally:
+    each refresh decays the scores it already has and only adds the
+    messages and likes created since the previous refresh. The other feeds
+    come from one pass over the public bots.
+
+    Every rebuild is stored as a new version in explore_feed_snapshots and
+    requests only slice a stored version, so a cursor means the same order
+    on every worker and across refreshes. One worker rebuilds at a time,
+    the others skip while it does or while the latest version is fresh.
+    Versions are kept for two refresh intervals, an older cursor gets a 400
+    rather than continuing in another order.
+    """
+
+    def __init__(self):
+        self.scores: Dict[int, float] = {}
+        self.scored_at: Optional[datetime] = None
+        self.lock = None
+        self.refresh_task = None
+
+    @property
+    def half_life(self) -> float:
+        return settings.trending_half_life_hours * 3600
+
+    async def update_scores(self, db, now: datetime):
+        if self.scored_at is None:
+            # Older events would add less than 1/32 of their weight
+            since = now - timedelta(seconds=5 * self.half_life)
+        else:
+            decay = 0.5 ** ((now - self.scored_at).total_seconds() / self.half_life)
+            since = self.scored_at
+            self.scores = {
+                bot_id: score * decay
+                for bot_id, score in self.scores.items()
+                if score * decay > 1e-3
+            }
+
+        now_param = bindparam("now", now, type_=TIMESTAMP(timezone=True))
+        sources = (
+            (models.Message.created_by_bot, models.Message.created_at, 1),
+            (
+                models.user_likes_bots.c.bot_id,
+                models.user_likes_bots.c.created_at,
+                settings.trending_like_weight,
+            ),
+        )
+        for bot_column, created_at_column, weight in sources:
+            rows = await db.execute(
+                select(
+                    bot_column,
+                    decayed_sum(created_at_column, now_param, self.half_life),
+                )
+                .where(
+                    bot_column.is_not(None),
+                    created_at_column > since,
+                    created_at_column <= now_param,
+                )
+                .group_by(bot_column)
+            )
+            for bot_id, score in rows:
+                self.scores[bot_id] = self.scores.get(bot_id, 0) + weight * score
+        self.scored_at = now
+
+    async def reload(self, min_age: float = 0) -> int:
+        """Stores a new version of the feeds, returns the number of public bots.
+
+        Skipped (returns 0) while another worker rebuilds, or when the latest
+        version is less than `min_age` seconds old.
+        """
+        # Serialized, two overlapping refreshes would count new events twice
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            return await self.rebuild(min_age)
+
+    async def rebuild(self, min_age: float) -> int:
+        now = datetime.now(timezone.utc)
+        version = int(now.timestamp() * 1000)
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": FEED_LOCK_ID}
+            )
+            if not locked:
+                return 0
+            latest = await db.scalar(
+                select(func.max(models.ExploreFeedSnapshot.version))
+            )
+            if latest is not None and version - latest < min_age * 1000:
+                return 0
+            # The clocks of the workers may disagree, versions only go forward
+            version = max(version, (latest or 0) + 1)
+
+            await self.update_scores(db, now)
+            bots = (
+                await db.execute(
+                    select(
+                        models.Bot.bot_id,
+                        models.Bot.num_chats,
+                        models.Bot.likes,
+                        models.Bot.created_at,
+                    ).where(models.Bot.privacy == "public")
+                )
+            ).all()
+
+            size = settings.explore_feed_size
+            public_ids = {bot.bot_id for bot in bots}
+            trending = heapq.nlargest(
+                size,
+                (item for item in self.scores.items() if item[0] in public_ids),
+                key=lambda item: item[1],
+            )
+            feeds: Dict[Feed, List[int]] = {
+                Feed.trending: [bot_id for bot_id, _ in trending],
+                Feed.most_chatted: [
+                    bot.bot_id
+                    for bot in heapq.nlargest(
+                        size, bots, key=lambda bot: (bot.num_chats, bot.bot_id)
+                    )
+                ],
+                Feed.most_liked: [
+                    bot.bot_id
+                    for bot in heapq.nlargest(
+                        size, bots, key=lambda bot: (bot.likes, bot.bot_id)
+                    )
+                ],
+                Feed.new: [
+                    bot.bot_id
+                    for bot in heapq.nlargest(
+                        size, bots, key=lambda bot: (bot.created_at, bot.bot_id)
+                    )
+                ],
+            }
+
+            db.add_all(
+                models.ExploreFeedSnapshot(
+                    version=version, feed=feed.value, bot_ids=bot_ids
+                )
+                for feed, bot_ids in feeds.items()
+            )
+            keep_ms = 2 * settings.explore_feed_refresh_interval * 1000
+            await db.execute(
+                delete(models.ExploreFeedSnapshot).where(
+                    models.ExploreFeedSnapshot.version < version - keep_ms
+                )
+            )
+            await db.commit()
+        return len(bots)
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Every worker runs this, the first one per interval rebuilds
+                await self.reload(min_age=interval / 2)
+            except Exception as e:
+                print(f"Refreshing explore feeds failed: {e}")
+
+    def start(self):
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.ensure_future(
+                self.refresh_forever(settings.explore_feed_refresh_interval)
+            )
+
+    async def find_page(
+        self, db, feed: Feed, limit: int, version: Optional[int], position: int
+    ):
+        snapshot = models.ExploreFeedSnapshot
+        query = select(
+            snapshot.version,
+            # Postgres arrays are 1-based and slices include both ends
+            snapshot.bot_ids[position + 1 : position + limit],
+            func.cardinality(snapshot.bot_ids),
+        ).where(snapshot.feed == feed.value)
+        if version is None:
+            query = query.order_by(snapshot.version.desc()).limit(1)
+        else:
+            query = query.where(snapshot.version == version)
+        return (await db.execute(query)).first()
+
+    async def get_page(
+        self, db, feed: Feed, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[int], Optional[str]]:
+        """Returns the ids of one page and the cursor of the next one."""
+        self.start()
+        version, position = None, 0
+        if cursor:
+            version, position = decode_feed_cursor(cursor)
+
+        row = await self.find_page(db, feed, limit, version, position)
+        if row is None and cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor has expired, start again from the first page",
+            )
+        if row is None:
+            # Nothing was built yet, e.g. on a fresh database
+            await self.reload()
+            row = await self.find_page(db, feed, limit, version, position)
+            if row is None:
+                return [], None
+
+        version, ids, total = row
+        end = position + len(ids)
+        next_cursor = encode_feed_cursor(version, end) if end < total else None
+        return ids, next_cursor
+
+
+ranked_feeds = RankedFeeds()
@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import random
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import null, select
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+
+def encode_sample_cursor(seed: int, cap: int, rank: int, id: int) -> str:
+    raw = json.dumps([seed, cap, rank, id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_sample_cursor(cursor: str) -> Tuple[int, int, Tuple[int, int]]:
+    try:
+        seed, cap, rank, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        seed, cap, after = int(seed), int(cap), (int(rank), int(id))
+    except (ValueError, TypeError):
+        seed, cap, after = 0, 0, None
+    if cap <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return seed, cap, after
+
+
+def shuffle_rank(seed: int, id: int) -> int:
+    # Stable across processes, unlike hash() of a str
+    digest = hashlib.blake2b(f"{seed}:{id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class ShuffledCatalog:
+    """Shuffled listings of the ids behind an explore page.
+
+    The ids for each key (e.g. a category) are loaded in the background.
+    A session orders the ids by shuffle_rank(seed, id), and the cursor
+    carries the seed, the largest id when the session started and the
+    (rank, id) of the last id served, so every worker, before and after a
+    refresh, continues the same order: ids that left the listing are gone,
+    ids created later are skipped, and none is seen twice.
+
+    The sorted order of recent (key, seed) pairs is kept, so a page is a
+    bisect and a slice of at most limit ids after the first one.
+    """
+
+    def __init__(self, query, cache_size: int = 32):
+        self.query = query
+        self.cache_size = cache_size
+        self.members: Dict[Optional[str], Set[int]] = {}
+        self.ids: List[int] = []
+        self.orders = OrderedDict()
+        self.loaded = False
+        self.lock = None
+        self.refresh_task = None
+
+    async def reload(self) -> int:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self.query)).all()
+
+        members: Dict[Optional[str], Set[int]] = {None: set()}
+        for id, key in rows:
+            members[None].add(id)
+            if key is not None:
+                members.setdefault(key, set()).add(id)
+
+        self.members = members
+        self.ids = list(members[None])
+        self.orders = OrderedDict()
+        self.loaded = True
+        return len(rows)
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"Refreshing explore catalog failed: {e}")
+
+    async def start(self):
+        if self.loaded:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.loaded:
+                return
+            await self.reload()
+            self.refresh_task = asyncio.ensure_future(
+                self.refresh_forever(settings.explore_shuffle_interval)
+            )
+
+    def get_order(self, key: Optional[str], seed: int) -> List[Tuple[int, int]]:
+        order = self.orders.get((key, seed))
+        if order is None:
+            order = sorted(
+                (shuffle_rank(seed, id), id) for id in self.members.get(key, ())
+            )
+            self.orders[(key, seed)] = order
+            while len(self.orders) > self.cache_size:
+                self.orders.popitem(last=False)
+        else:
+            self.orders.move_to_end((key, seed))
+        return order
+
+    async def get_page(
+        self,
+        key: Optional[str],
+        limit: int,
+        cursor: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> Tuple[List[int], Optional[str]]:
+        """Returns the ids of one page and the cursor of the next one."""
+        await self.start()
+        after = None
+        if cursor:
+            seed, cap, after = decode_sample_cursor(cursor)
+        else:
+            if seed is None:
+                seed = random.getrandbits(32)
+            cap = max(self.members.get(key, ()), default=0)
+        if cap == 0:
+            return [], None
+
+        order = self.get_order(key, seed)
+        index = bisect.bisect_right(order, after) if after else 0
+        ids = []
+        while index < len(order) and len(ids) < limit:
+            last = order[index]
+            index += 1
+            if last[1] <= cap:
+                ids.append(last[1])
+        # Ids created after the session started are not part of it
+        while index < len(order) and order[index][1] > cap:
+            index += 1
+
+        next_cursor = (
+            encode_sample_cursor(seed, cap, *last) if index < len(order) else None
+        )
+        return ids, next_cursor
+
+    async def choice(self) -> Optional[int]:
+        await self.start()
+        return random.choice(self.ids) if self.ids else None
+
+
+public_bots = ShuffledCatalog(
+    select(models.Bot.bot_id, models.Bot.category).where(models.Bot.privacy == "public")
+)
+public_group_chats = ShuffledCatalog(
+    select(models.GroupChat.group_chat_id, null().label("key")).where(
+        models.GroupChat.privacy == "public",
+        models.GroupChat.user_id == settings.admin_id,
+    )
+)
@@ -0,0 +1,37 @@
+import re
+from typing import Optional, Tuple
+from sqlalchemy import func, literal, literal_column, or_
+
+# Matches the text search configuration of the generated search_vector columns
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def build_tsquery(search: str) -> Optional[str]:
+    """Turns user input into a prefix tsquery, e.g. "ha pot" -> "ha:* & pot:*".
+
+    Only word characters are kept, so the result is always valid tsquery
+    syntax. Returns None when nothing searchable is left.
+    """
+    words = re.findall(r"\w+", search.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_condition(search_vector, name_column, search: str) -> Tuple:
+    """Returns the filter and rank of a ranked, typo tolerant search.
+
+    A row matches when every word prefixes a word of its search_vector, or
+    when the input is similar to a part of its name, which catches typos.
+    Both are answered by GIN indexes. Rank favours weighted full-text
+    matches, then name similarity.
+    """
+    tsquery = func.to_tsquery(SEARCH_CONFIG, build_tsquery(search))
+    condition = or_(
+        search_vector.op("@@")(tsquery),
+        literal(search).op("<%")(name_column),
+    )
+    rank = func.ts_rank_cd(search_vector, tsquery) + func.word_similarity(
+        search, name_column
+    )
+    return condition, rank
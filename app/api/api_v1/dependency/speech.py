@@ -0,0 +1,70 @@
+import asyncio
+import re
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+# A sentence ends at ., ! or ? (possibly repeated or followed by a closing
+# quote or bracket) followed by whitespace
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*(?=\s)")
+
+
+def split_sentences(text: str) -> Tuple[List[str], str]:
+    """Returns the complete sentences of `text` and the unfinished rest."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start : match.end()].strip())
+        start = match.end()
+    return [sentence for sentence in sentences if sentence], text[start:]
+
+
+async def iter_sentences(token_stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Regroups streamed tokens into sentences, each yielded once complete.
+
+    The end of a sentence is only known once the next token starts with
+    whitespace, so a sentence is held until then. Whatever is left when the
+    stream ends is yielded as the last sentence.
+    """
+    buffer = ""
+    async for token in token_stream:
+        buffer += token
+        sentences, buffer = split_sentences(buffer)
+        for sentence in sentences:
+            yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def synthesize_sentences(
+    sentences: AsyncIterator[str],
+    synthesize: Callable[[str], Awaitable[Optional[bytes]]],
+    concurrency: int,
+) -> AsyncIterator[Tuple[int, str, Optional[bytes]]]:
+    """Yields (sequence, sentence, audio) in order, synthesizing ahead.
+
+    Each sentence is sent to `synthesize` as soon as it is complete, up to
+    `concurrency` at a time, while later sentences are still being
+    generated. Reading more sentences waits when that many are
+    in flight.
+    """
+    pending = deque()
+    sequence = 0
+    try:
+        async for sentence in sentences:
+            pending.append(
+                (
+                    sentence,
+                    asyncio.ensure_future(synthesize(sentence)),
+                )
+            )
+            while len(pending) >= concurrency or (pending and pending[0][1].done()):
+                sentence, task = pending.popleft()
+                yield sequence, sentence, await task
+                sequence += 1
+        while pending:
+            sentence, task = pending.popleft()
+            yield sequence, sentence, await task
+            sequence += 1
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import Interval, bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.api.api_v1.engines import get_engine
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def select_greeting(bot_id: int):
+    return (
+        select(models.Bot.greeting, models.Voice)
+        .join(models.Voice, models.Bot.voice_id == models.Voice.voice_id)
+        .where(models.Bot.bot_id == bot_id)
+    )
+
+
+class TtsCache:
+    """Synthesized audio shared by every request for the same voice and text.
+
+    Audio is uploaded once under a content-addressed blob name and indexed
+    in the tts_cache table, the most recently used entries are also kept in
+    an in-process LRU. Concurrent misses on one key in a worker wait for a
+    single synthesis.
+
+    Greetings are stored on their first synthesis. Bot replies mostly never
+    repeat, so the first time a reply is seen only its key is recorded, with
+    no audio, and the audio is stored the second time.
+
+    Every lookup in the table stamps last_hit_at, and an entry is only
+    served from memory for memory_ttl seconds before it is looked up again,
+    so the stamp of anything a worker still serves is recent. purge() drops
+    the entries and audio not hit for much longer than that.
+    """
+
+    def __init__(self, max_size: int, memory_ttl: float):
+        self.max_size = max_size
+        self.memory_ttl = memory_ttl
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.first_seen = 0
+        self.evictions = 0
+        self.purged = 0
+
+    @staticmethod
+    def get_key(voice: models.Voice, text: str) -> str:
+        raw = json.dumps(
+            [
+                voice.voice_provider,
+                voice.voice_name,
+                voice.voice_endpoint,
+                voice.style,
+                normalize_text(text),
+            ]
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def remember(self, key: str, audio_url: str):
+        self.entries[key] = (audio_url, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_audio_url(
+        self, voice: models.Voice, text: str, message_id: Optional[int] = None
+    ) -> Optional[str]:
+        """Returns the URL of the audio of `text`, synthesizing it on a miss.
+
+        With a `message_id`, text seen for the first time is synthesized as
+        the audio of that message and not stored.
+        """
+        key = self.get_key(voice, text)
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.memory_ttl:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        # The audio of a message is never shared with another request
+        inflight_key = (key, message_id)
+        if inflight_key not in self.inflight:
+            task = asyncio.ensure_future(
+                self.load(key, voice, normalize_text(text), message_id)
+            )
+            task.add_done_callback(lambda _: self.inflight.pop(inflight_key, None))
+            self.inflight[inflight_key] = task
+        # A waiter going away must not cancel the synthesis for the others
+        return await asyncio.shield(self.inflight[inflight_key])
+
+    async def load(
+        self, key: str, voice: models.Voice, text: str, message_id: Optional[int]
+    ) -> Optional[str]:
+        entry = models.TtsCacheEntry
+        async with AsyncSessionLocal() as db:
+            row = (
+                await db.execute(
+                    update(entry)
+                    .where(entry.cache_key == key)
+                    .values(last_hit_at=func.now())
+                    .returning(entry.audio_url)
+                )
+            ).first()
+            await db.commit()
+            if row is not None and row.audio_url is not None:
+                self.hits += 1
+                audio_url = row.audio_url
+            elif row is None and message_id is not None:
+                self.first_seen += 1
+                await db.execute(
+                    insert(entry).values(cache_key=key).on_conflict_do_nothing()
+                )
+                await db.commit()
+                VoiceEngine = get_engine("voice")
+                return await VoiceEngine(text, voice, message_id).get_audio_response()
+            else:
+                self.misses += 1
+                audio_url = await self.synthesize(key, voice, text)
+                if audio_url is None:
+                    return None
+                stored = insert(entry).values(cache_key=key, audio_url=audio_url)
+                await db.execute(
+                    stored.on_conflict_do_update(
+                        index_elements=[entry.cache_key],
+                        set_={"audio_url": stored.excluded.audio_url},
+                        where=entry.audio_url.is_(None),
+                    )
+                )
+                await db.commit()
+
+        self.remember(key, audio_url)
+        return audio_url
+
+    async def synthesize(
+        self, key: str, voice: models.Voice, text: str
+    ) -> Optional[str]:
+        VoiceEngine = get_engine("voice")
+        audio = await VoiceEngine(text, voice).get_audio()
+        if not audio:
+            return None
+
+        # The name is derived from the content, a worker racing to write the
+        # same key writes the same audio
+        name = f"cache/{key}"
+        if not await run_in_threadpool(
+            VoiceEngine.upload_message_audio, name, audio, True
+        ):
+            return None
+        return VoiceEngine.get_audio_url(name)
+
+    async def warm_greeting(self, bot_id: int):
+        """Synthesizes the greeting of a bot ahead of its first chat."""
+        try:
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(select_greeting(bot_id))).first()
+            if row is not None:
+                await self.get_audio_url(row.Voice, row.greeting)
+        except Exception as e:
+            print(f"Warming the greeting of bot {bot_id} failed: {e}")
+
+    async def purge(self, retention: timedelta, batch_size: int = 100) -> int:
+        """Deletes entries not hit within `retention`, returns how many."""
+        VoiceEngine = get_engine("voice")
+        stale = (
+            select(models.TtsCacheEntry.cache_key)
+            .where(
+                models.TtsCacheEntry.last_hit_at
+                < func.now() - bindparam("retention", retention, type_=Interval)
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    delete(models.TtsCacheEntry)
+                    .where(models.TtsCacheEntry.cache_key.in_(stale))
+                    .returning(
+                        models.TtsCacheEntry.cache_key, models.TtsCacheEntry.audio_url
+                    )
+                )
+            ).all()
+            # The blobs go before the rows are committed: a worker missing
+            # on one of the keys waits on the row locks, and only uploads
+            # the audio again once this is done
+            for key, audio_url in rows:
+                self.entries.pop(key, None)
+                if audio_url is not None:
+                    await run_in_threadpool(
+                        VoiceEngine.delete_message_audio, f"cache/{key}"
+                    )
+            await db.commit()
+        self.purged += len(rows)
+        return len(rows)
+
+    async def purge_forever(self, interval: float, retention: timedelta):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                while await self.purge(retention):
+                    pass
+            except Exception as e:
+                print(f"Purging the TTS cache failed: {e}")
+
+    def snapshot(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "inflight": len(self.inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "first_seen": self.first_seen,
+            "evictions": self.evictions,
+            "purged": self.purged,
+        }
+
+
+tts_cache = TtsCache(settings.tts_cache_size, settings.tts_cache_memory_ttl)
+
+
+async def synthesize_reply(
+    voice: models.Voice, text: str, message_id: int
+) -> Optional[str]:
+    """Returns the audio URL of a bot reply, short replies go through tts_cache."""
+    if len(text) <= settings.tts_cache_max_chars:
+        return await tts_cache.get_audio_url(voice, text, message_id)
+    return await get_engine("voice")(text, voice, message_id).get_audio_response()
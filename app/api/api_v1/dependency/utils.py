@@ -1,15 +1,15 @@
 from app.config import settings
-from typing import List
-import requests
-from pydub import AudioSegment
-from PIL import Image, ImageDraw, ImageFilter, ImageOps
+from typing import List, Optional
 import requests
 from io import BytesIO
 import os
 import wave
 import asyncio
 import base64
+import json
 from app.models import Message
+from app.api.api_v1.engines.resilience import get_guard
+from app.api.api_v1.engines.voice.clients import get_speech_client
 
 
 def decode_base64(base64_string):
@@ -17,6 +17,8 @@ def decode_base64(base64_string):
 
 
 def convert_m4a_to_wav(input_file, output_file):
+    from pydub import AudioSegment
+
     audio = AudioSegment.from_file(input_file, format="m4a")
     audio.export(output_file, format="wav")
 
@@ -29,21 +31,23 @@ def save_wav(input, output):
             output_file.write(audio)
 
 
-def azure_speech_to_text(audio_path):
-    try:
-        headers = {
-            "Ocp-Apim-Subscription-Key": settings.speech_key,
-            "Content-Type": "audio/wav",
-        }
-
-        url = f"https://{settings.speech_region}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1?language=en-US&format=detailed"
-        audio_file = open(audio_path, "rb")
-        response = requests.post(url, headers=headers, data=audio_file)
-
-        response.raise_for_status()
+async def azure_speech_to_text(audio_data: bytes) -> Optional[str]:
+    """Transcribes a short wav recording with the Azure speech REST API."""
+    headers = {
+        "Ocp-Apim-Subscription-Key": settings.speech_key,
+        "Content-Type": "audio/wav",
+    }
 
+    url = f"https://{settings.speech_region}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1?language=en-US&format=detailed"
+    try:
+        guard = get_guard("stt:azure")
+        async with guard.aguard():
+            response = await get_speech_client().post(
+                url, headers=headers, content=audio_data, timeout=guard.timeout
+            )
+            response.raise_for_status()
         return response.json().get("DisplayText")
-    except requests.exceptions.RequestException as e:
+    except Exception as e:
         print(f"An error occurred: {e}")
         return None
 
@@ -116,7 +120,26 @@ def make_message_lists(message_list: List[Message]) -> list:
     return messages
 
 
+def format_sse(data, event: str = None) -> str:
+    """Formats a payload as a single Server-Sent Events frame."""
+    frame = ""
+    if event:
+        frame += f"event: {event}\n"
+    frame += f"data: {json.dumps(data, default=str)}\n\n"
+    return frame
+
+
+def save_webp(image_bytes: bytes, image_path: str):
+    """Saves an uploaded or downloaded image as WEBP."""
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes))
+    image.save(image_path, "WEBP")
+
+
 def create_group_profile_picture(avatar_paths, output_size=(1024, 1024)):
+    from PIL import Image, ImageDraw, ImageFilter, ImageOps
+
     def mask_circle_transparent(im, blur_radius, offset=0):
         offset = blur_radius * 2 + offset
         mask = Image.new("L", im.size, 0)
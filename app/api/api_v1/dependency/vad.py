@@ -4,11 +4,12 @@ import sys
 import wave
 import re
 import webrtcvad
-import librosa
-import soundfile as sf
 
 
 def resample_audio(audio_path, target_sample_rate):
+    import librosa
+    import soundfile as sf
+
     audio, sample_rate = librosa.load(audio_path, sr=target_sample_rate)
     print
     sf.write(audio_path, audio, target_sample_rate)
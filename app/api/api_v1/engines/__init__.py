@@ -0,0 +1,24 @@
+import importlib
+
+# Engine modules pull in heavy provider SDKs, so they are only imported the
+# first time a route asks for them. A worker that never synthesizes speech
+# never loads the speech SDK.
+ENGINES = {
+    "text": "app.api.api_v1.engines.text.base:TextEngine",
+    "group_text": "app.api.api_v1.engines.text.base:GroupChatTextEngine",
+    "utils": "app.api.api_v1.engines.text.utils:UtilsEngine",
+    "voice": "app.api.api_v1.engines.voice.base:VoiceEngine",
+    "stt": "app.api.api_v1.engines.stt.base:SpeechToTextEngine",
+    "image": "app.api.api_v1.engines.image.base:ImageEngine",
+}
+
+loaded_engines = {}
+
+
+def get_engine(name: str):
+    """Returns the engine class registered under `name`, importing it once."""
+    if name not in loaded_engines:
+        module_name, class_name = ENGINES[name].split(":")
+        module = importlib.import_module(module_name)
+        loaded_engines[name] = getattr(module, class_name)
+    return loaded_engines[name]
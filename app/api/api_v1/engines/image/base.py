@@ -1,6 +1,7 @@
 from openai import AzureOpenAI
 import json
 from app.config import settings, configs, server_config
+from app.api.api_v1.engines.resilience import get_guard
 
 
 class ImageEngine:
@@ -13,15 +14,20 @@ class ImageEngine:
             self.responseEngine = self.AzureEngine()
 
     def AzureEngine(self):
+        guard = get_guard(f"image:{configs.IMAGE_PROVIDER_1}")
         client = AzureOpenAI(
             api_version="2024-02-01",
             azure_endpoint=settings.azure_img_endpoint,
             api_key=self.api_key_token,
+            timeout=guard.timeout,
         )
         try:
-            result = client.images.generate(
-                model=server_config.IMAGE_ENDPOINT_NAME, prompt=self.image_prompt, n=1
-            )
+            with guard.guard():
+                result = client.images.generate(
+                    model=server_config.IMAGE_ENDPOINT_NAME,
+                    prompt=self.image_prompt,
+                    n=1,
+                )
         except Exception as e:
             print(f"Error: {e}")
             return None
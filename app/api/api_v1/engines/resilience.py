@@ -0,0 +1,253 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+import httpx
+from app.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class ProviderBusyError(Exception):
+    """Raised when no concurrency slot frees up for a provider in time."""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over the last `window` calls to a provider.
+
+    The breaker opens once at least `min_calls` calls were seen and the share
+    of failures reaches `error_rate`. After `reset_timeout` seconds a single
+    probe is let through (half-open): success closes the breaker, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 50,
+        reset_timeout: float = 30,
+    ):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.outcomes = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.outcomes.append(True)
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.outcomes.append(False)
+            failures = self.outcomes.count(False)
+            if self.state == self.HALF_OPEN or (
+                len(self.outcomes) >= self.min_calls
+                and failures / len(self.outcomes) >= self.error_rate
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def record_abandoned(self):
+        # The call was cancelled or never started, so it gives no verdict
+        with self.lock:
+            self.probing = False
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "state": self.state,
+                "calls": len(self.outcomes),
+                "failures": self.outcomes.count(False),
+            }
+
+
+class ProviderGuard:
+    """Concurrency limit, timeouts and circuit breaker for one provider.
+
+    Sync engines (running in the threadpool) use guard(), async engines use
+    aguard(). Each flavour gets its own semaphore of `max_concurrency` slots.
+    The counters are shared by both, so they are only changed under `lock`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        queue_timeout: float,
+        connect_timeout: float,
+        read_timeout: float,
+        breaker: CircuitBreaker,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.async_semaphore = None
+        self.waiting = 0
+        self.active = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def count(self, waiting: int = 0, active: int = 0, rejected: int = 0):
+        with self.lock:
+            self.waiting += waiting
+            self.active += active
+            self.rejected += rejected
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    @property
+    def requests_timeout(self) -> tuple:
+        return (self.connect_timeout, self.read_timeout)
+
+    def check_breaker(self):
+        if not self.breaker.allow_request():
+            self.count(rejected=1)
+            raise CircuitOpenError(f"Circuit breaker for {self.name} is open")
+
+    @contextmanager
+    def guard(self):
+        self.check_breaker()
+        self.count(waiting=1)
+        acquired = self.semaphore.acquire(timeout=self.queue_timeout)
+        self.count(waiting=-1)
+        if not acquired:
+            self.count(rejected=1)
+            self.breaker.record_abandoned()
+            raise ProviderBusyError(f"No free slot for {self.name}")
+
+        self.count(active=1)
+        try:
+            yield self
+        except (CircuitOpenError, ProviderBusyError):
+            # Rejected by a nested limit, e.g. a pool, not by the provider
+            self.breaker.record_abandoned()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self.count(active=-1)
+            self.semaphore.release()
+
+    @asynccontextmanager
+    async def aguard(self):
+        self.check_breaker()
+        if self.async_semaphore is None:
+            self.async_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.count(waiting=1)
+        try:
+            await asyncio.wait_for(
+                self.async_semaphore.acquire(), timeout=self.queue_timeout
+            )
+        except asyncio.TimeoutError:
+            self.count(rejected=1)
+            self.breaker.record_abandoned()
+            raise ProviderBusyError(f"No free slot for {self.name}")
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        finally:
+            self.count(waiting=-1)
+
+        self.count(active=1)
+        try:
+            yield self
+        except (CircuitOpenError, ProviderBusyError):
+            # Rejected by a nested limit, e.g. a pool, not by the provider
+            self.breaker.record_abandoned()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self.count(active=-1)
+            self.async_semaphore.release()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counters = {
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "rejected": self.rejected,
+            }
+        return {
+            "breaker": self.breaker.snapshot(),
+            "max_concurrency": self.max_concurrency,
+            **counters,
+        }
+
+
+guards: Dict[str, ProviderGuard] = {}
+guards_lock = threading.Lock()
+
+
+def get_guard(name: str) -> ProviderGuard:
+    """Returns the process wide guard for a provider, e.g. "text:together"."""
+    with guards_lock:
+        if name not in guards:
+            guards[name] = ProviderGuard(
+                name,
+                max_concurrency=settings.provider_max_concurrency,
+                queue_timeout=settings.provider_queue_timeout,
+                connect_timeout=settings.provider_connect_timeout,
+                read_timeout=settings.provider_read_timeout,
+                breaker=CircuitBreaker(
+                    error_rate=settings.breaker_error_rate,
+                    min_calls=settings.breaker_min_calls,
+                    reset_timeout=settings.breaker_reset_timeout,
+                ),
+            )
+        return guards[name]
+
+
+def guards_snapshot() -> dict:
+    return {name: guard.snapshot() for name, guard in guards.items()}
@@ -1,4 +1,3 @@
-from azure.storage.blob import BlobClient
 from app.config import settings
 
 
@@ -7,20 +6,39 @@ class AzureEngine:
         self.connection_string = connection_string
 
     def upload_blob(self, file_path, container_name, blob_name):
+        with open(file_path, "rb") as data:
+            return self.upload_blob_data(data, container_name, blob_name)
+
+    def upload_blob_data(
+        self, data, container_name, blob_name, content_type=None, overwrite=False
+    ):
+        """Uploads bytes, a file object or an iterable of byte chunks.
+
+        Chunks are staged as blocks while they are read, so a stream can be
+        uploaded as it arrives without being held in memory or on disk.
+        """
+        from azure.storage.blob import BlobClient, ContentSettings
+
         try:
             blob = BlobClient.from_connection_string(
                 conn_str=self.connection_string,
                 container_name=container_name,
                 blob_name=blob_name,
             )
-            with open(file_path, "rb") as data:
-                blob.upload_blob(data)
+            content_settings = (
+                ContentSettings(content_type=content_type) if content_type else None
+            )
+            blob.upload_blob(
+                data, content_settings=content_settings, overwrite=overwrite
+            )
             return True
         except Exception as e:
             print(f"An error occurred: {e}")
             return False
 
     def delete_blob(self, container_name, blob_name):
+        from azure.storage.blob import BlobClient
+
         try:
             blob = BlobClient.from_connection_string(
                 conn_str=self.connection_string,
@@ -0,0 +1,120 @@
+import asyncio
+import sys
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Tuple
+from starlette.concurrency import run_in_threadpool
+import azure.cognitiveservices.speech as speechsdk
+from app.config import settings
+from app.api.api_v1.engines.resilience import get_guard
+
+# Clients stream raw 16 kHz, 16-bit mono PCM
+AUDIO_FORMAT = dict(samples_per_second=16000, bits_per_sample=16, channels=1)
+
+
+class SpeechToTextEngine:
+    """Continuous Azure speech recognition of audio pushed while it is recorded.
+
+    write() forwards a chunk to the recognizer as soon as it arrives, and
+    results() yields ("partial", text) while a phrase is being spoken and
+    ("final", text) once it is recognized. After end_audio() the remaining
+    audio is recognized and results() ends. The SDK fires its events on
+    its own threads, they are handed to the event loop through a queue.
+
+    A session holds a slot of the stt:azure guard from start() until
+    stop(), so the guard bounds concurrent recognitions, not just their
+    start.
+    """
+
+    def __init__(self, language: str = "en-US"):
+        self.language = language
+        self.queue = None
+        self.loop = None
+        self.push_stream = None
+        self.recognizer = None
+        self.session = None
+        self.error = None
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def on_recognized(self, event):
+        # Silence is reported as an empty phrase
+        if event.result.text:
+            self.put(("final", event.result.text))
+
+    def on_canceled(self, event):
+        details = event.cancellation_details
+        if details.reason == speechsdk.CancellationReason.Error:
+            self.error = details.error_details
+            self.put(("error", details.error_details))
+        self.put(None)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.session = AsyncExitStack()
+        await self.session.enter_async_context(get_guard("stt:azure").aguard())
+        try:
+            await self.start_recognition()
+        except BaseException:
+            await self.release(*sys.exc_info())
+            raise
+
+    async def start_recognition(self):
+        speech_config = speechsdk.SpeechConfig(
+            subscription=settings.speech_key, region=settings.speech_region
+        )
+        speech_config.speech_recognition_language = self.language
+        self.push_stream = speechsdk.audio.PushAudioInputStream(
+            stream_format=speechsdk.audio.AudioStreamFormat(**AUDIO_FORMAT)
+        )
+        self.recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=speechsdk.audio.AudioConfig(stream=self.push_stream),
+        )
+
+        self.recognizer.recognizing.connect(
+            lambda event: self.put(("partial", event.result.text))
+        )
+        self.recognizer.recognized.connect(self.on_recognized)
+        self.recognizer.canceled.connect(self.on_canceled)
+        self.recognizer.session_stopped.connect(lambda event: self.put(None))
+
+        await run_in_threadpool(
+            lambda: self.recognizer.start_continuous_recognition_async().get()
+        )
+
+    async def release(self, *exc_info):
+        # Frees the guard slot once, an error is counted against the breaker
+        session, self.session = self.session, None
+        if session is not None:
+            await session.__aexit__(*exc_info)
+
+    def write(self, chunk: bytes):
+        self.push_stream.write(chunk)
+
+    def end_audio(self):
+        if self.push_stream is not None:
+            self.push_stream.close()
+
+    async def results(self) -> AsyncIterator[Tuple[str, str]]:
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            yield item
+
+    async def stop(self):
+        try:
+            if self.recognizer is not None:
+                await run_in_threadpool(
+                    lambda: self.recognizer.stop_continuous_recognition_async().get()
+                )
+        except BaseException:
+            await self.release(*sys.exc_info())
+            raise
+        if self.error is not None:
+            error = RuntimeError(self.error)
+            await self.release(RuntimeError, error, None)
+        else:
+            await self.release(None, None, None)
@@ -1,43 +1,57 @@
-from typing import List, Optional
-import openai
-from openai import AzureOpenAI
-import google.generativeai as genai
+from typing import AsyncIterator, List, Optional
 from app import models
-from app.config import settings, server_config, configs
-
-
-class TextEngine:
-    def __init__(
-        self,
-        message_list: str,
-        character_name: str,
-        character_description: str,
-        temperature: float = 1,
-        max_tokens: int = 128,
-    ):
-        self.api_key_token = ""
-        provider = server_config.TEXT_PROVIDER
-        self.system_prompt = f"Embody the specified character, complete with their background, core traits, relationships, and goals. Use a distinct speaking style reflective of their unique personality and environment. Responses should be very short and natural, as if you were having actual and realistic conversation. Avoid lengthy introductions or explanations. Remember, you are in an ongoing conversation, so your responses should be contextually aware and maintain the flow of the dialogue. Sometime you may ask questions to the user to keep the conversation going, and keep the user engaged. Do not always answer the user's questions directly, but keep the conversation interesting and engaging. {configs.PROMPT_OPTIMIZATION}\n"
-        message_list.reverse()
-
-        joined_messages = "\n".join(message_list)
-        self.prompt = f"""{self.system_prompt}\nCharacter name: {character_name}\nCharacter Definition: {character_description}\n\n\n{joined_messages}\nCharacter:"""
-
+from app.config import configs
+from app.api.api_v1.engines.text.clients import (
+    configure_google,
+    get_azure_client,
+    get_together_client,
+)
+from app.api.api_v1.engines.text.router import text_router
+from app.api.api_v1.engines.resilience import get_guard
+
+GOOGLE_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_ONLY_HIGH",
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_ONLY_HIGH",
+    },
+]
+
+
+class BaseTextEngine:
+    """Sends the prompt built by a subclass to the configured text provider.
+
+    Nothing is sent until get_response() is awaited or stream_response() is
+    iterated. Both go through text_router, which picks the provider and fails
+    over to the next one when it errors or times out.
+    """
+
+    system_prompt: str
+    prompt: str
+
+    def __init__(self, temperature: float = 1, max_tokens: int = 128):
         self.temperature = temperature
         self.max_tokens = max_tokens
 
-        if provider == "together":
-            self.api_key_token = settings.together_api_key
-            self.responseEngine = self.TogetherEngine()
-        elif provider == "google":
-            self.api_key_token = settings.google_api_key
-            self.responseEngine = self.GoogleEngine()
-        elif provider == "azure":
-            self.api_key_token = settings.azure_text_api_key
-            self.responseEngine = self.AzureEngine()
+    def get_messages(self):
+        return [
+            {
+                "role": "system",
+                "content": self.system_prompt,
+            },
+            {
+                "role": "user",
+                "content": self.prompt,
+            },
+        ]
 
-    def GoogleEngine(self):
-        genai.configure(api_key=self.api_key_token)
+    def get_google_model(self):
+        genai = configure_google()
 
         generation_config = {
             "temperature": self.temperature,
@@ -46,45 +60,22 @@ class TextEngine:
             "max_output_tokens": self.max_tokens,
         }
 
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_ONLY_HIGH",
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_ONLY_HIGH",
-            },
-        ]
-
-        model = genai.GenerativeModel(
+        return genai.GenerativeModel(
             model_name="gemini-2.5-flash-lite",
             generation_config=generation_config,
-            safety_settings=safety_settings,
+            safety_settings=GOOGLE_SAFETY_SETTINGS,
         )
 
-        responses = model.generate_content(self.prompt)
-        return responses.text
-
-    def TogetherEngine(self):
-        client = openai.OpenAI(
-            api_key=self.api_key_token,
-            base_url="https://api.together.xyz/v1",
+    async def GoogleEngine(self) -> str:
+        responses = await self.get_google_model().generate_content_async(
+            self.prompt,
+            request_options={"timeout": get_guard("text:google").read_timeout},
         )
+        return responses.text
 
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": self.system_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                },
-            ],
+    async def TogetherEngine(self) -> str:
+        chat_completion = await get_together_client().chat.completions.create(
+            messages=self.get_messages(),
             max_tokens=self.max_tokens,
             temperature=self.temperature,
             model="mistralai/Mixtral-8x7B-Instruct-v0.1",
@@ -92,42 +83,104 @@ class TextEngine:
 
         return chat_completion.choices[0].message.content
 
-    def get_response(self):
-        return self.responseEngine
+    async def AzureEngine(self) -> str:
+        completion = await get_azure_client().chat.completions.create(
+            model="ttl-gpt",
+            messages=self.get_messages(),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            top_p=0.95,
+            frequency_penalty=0,
+            presence_penalty=0,
+            stop=None,
+        )
+
+        return completion.choices[0].message.content
 
-    def AzureEngine(self):
-        client = AzureOpenAI(
-            azure_endpoint=settings.azure_text_endpoint,
-            api_key=self.api_key_token,
-            api_version="2024-02-15-preview",
+    async def GoogleStreamEngine(self) -> AsyncIterator[str]:
+        responses = await self.get_google_model().generate_content_async(
+            self.prompt,
+            stream=True,
+            request_options={"timeout": get_guard("text:google").read_timeout},
         )
+        async for chunk in responses:
+            if chunk.text:
+                yield chunk.text
 
-        messages = [
-            {
-                "role": "system",
-                "content": self.system_prompt,
-            },
-            {
-                "role": "user",
-                "content": self.prompt,
-            },
-        ]
+    async def TogetherStreamEngine(self) -> AsyncIterator[str]:
+        chat_completion = await get_together_client().chat.completions.create(
+            messages=self.get_messages(),
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            model="mistralai/Mixtral-8x7B-Instruct-v0.1",
+            stream=True,
+        )
+
+        async for chunk in chat_completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-        completion = client.chat.completions.create(
+    async def AzureStreamEngine(self) -> AsyncIterator[str]:
+        completion = await get_azure_client().chat.completions.create(
             model="ttl-gpt",
-            messages=messages,
+            messages=self.get_messages(),
             temperature=self.temperature,
             max_tokens=self.max_tokens,
             top_p=0.95,
             frequency_penalty=0,
             presence_penalty=0,
             stop=None,
+            stream=True,
         )
 
-        return completion.choices[0].message.content
+        # Azure sends a first chunk with the content filter results and no choices
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def call_provider(self, provider: str) -> str:
+        if provider == "together":
+            return await self.TogetherEngine()
+        elif provider == "google":
+            return await self.GoogleEngine()
+        elif provider == "azure":
+            return await self.AzureEngine()
+        raise ValueError(f"Unknown text provider: {provider}")
+
+    def stream_provider(self, provider: str) -> AsyncIterator[str]:
+        if provider == "together":
+            return self.TogetherStreamEngine()
+        elif provider == "google":
+            return self.GoogleStreamEngine()
+        elif provider == "azure":
+            return self.AzureStreamEngine()
+        raise ValueError(f"Unknown text provider: {provider}")
 
+    async def get_response(self) -> str:
+        return await text_router.complete(self)
 
-class GroupChatTextEngine:
+    def stream_response(self) -> AsyncIterator[str]:
+        return text_router.stream(self)
+
+
+class TextEngine(BaseTextEngine):
+    def __init__(
+        self,
+        message_list: str,
+        character_name: str,
+        character_description: str,
+        temperature: float = 1,
+        max_tokens: int = 128,
+    ):
+        super().__init__(temperature=temperature, max_tokens=max_tokens)
+        self.system_prompt = f"Embody the specified character, complete with their background, core traits, relationships, and goals. Use a distinct speaking style reflective of their unique personality and environment. Responses should be very short and natural, as if you were having actual and realistic conversation. Avoid lengthy introductions or explanations. Remember, you are in an ongoing conversation, so your responses should be contextually aware and maintain the flow of the dialogue. Sometime you may ask questions to the user to keep the conversation going, and keep the user engaged. Do not always answer the user's questions directly, but keep the conversation interesting and engaging. {configs.PROMPT_OPTIMIZATION}\n"
+        message_list.reverse()
+
+        joined_messages = "\n".join(message_list)
+        self.prompt = f"""{self.system_prompt}\nCharacter name: {character_name}\nCharacter Definition: {character_description}\n\n\n{joined_messages}\nCharacter:"""
+
+
+class GroupChatTextEngine(BaseTextEngine):
     def __init__(
         self,
         message_list: List[dict],
@@ -136,8 +189,7 @@ class GroupChatTextEngine:
         temperature: float = 1,
         max_tokens: int = 128,
     ):
-        self.api_key_token = ""
-        provider = server_config.TEXT_PROVIDER
+        super().__init__(temperature=temperature, max_tokens=max_tokens)
         self.system_prompt = f"Embody the specified character, complete with their background, core traits, relationships, and goals. Use a distinct speaking style reflective of their unique personality and environment. Responses should be very short and natural, as if you were having actual and realistic conversation. Avoid lengthy introductions or explanations. Remember, you are in an ongoing conversation, so your responses should be contextually aware and maintain the flow of the dialogue. Sometime you may ask questions to the user to keep the conversation going, and keep the user engaged. Do not always answer the user's questions directly, but keep the conversation interesting and engaging. {configs.PROMPT_OPTIMIZATION}. Embody the character specified at the end of this prompt. Continue the conversation from the perspective of this character. This turn the character is {random_bot_name}\n"
         message_list.reverse()
 
@@ -156,106 +208,3 @@ class GroupChatTextEngine:
                 self.prompt += f"User: {message_object['message']}\n"
 
         self.prompt += f"\n{random_bot_name}: "
-
-        self.temperature = temperature
-        self.max_tokens = max_tokens
-
-        if provider == "together":
-            self.api_key_token = settings.together_api_key
-            self.responseEngine = self.TogetherEngine()
-        elif provider == "google":
-            self.api_key_token = settings.google_api_key
-            self.responseEngine = self.GoogleEngine()
-        elif provider == "azure":
-            self.api_key_token = settings.azure_text_api_key
-            self.responseEngine = self.AzureEngine()
-
-    def get_response(self):
-        return self.responseEngine
-
-    def GoogleEngine(self):
-        genai.configure(api_key=self.api_key_token)
-
-        generation_config = {
-            "temperature": self.temperature,
-            "top_p": 1,
-            "top_k": 50,
-            "max_output_tokens": self.max_tokens,
-        }
-
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_ONLY_HIGH",
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_ONLY_HIGH",
-            },
-        ]
-
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash-lite",
-            generation_config=generation_config,
-            safety_settings=safety_settings,
-        )
-
-        responses = model.generate_content(self.prompt)
-        return responses.text
-
-    def TogetherEngine(self):
-        client = openai.OpenAI(
-            api_key=self.api_key_token,
-            base_url="https://api.together.xyz/v1",
-        )
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": self.system_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                },
-            ],
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-        )
-
-        return chat_completion.choices[0].message.content
-
-    def AzureEngine(self):
-        client = AzureOpenAI(
-            azure_endpoint=settings.azure_text_endpoint,
-            api_key=self.api_key_token,
-            api_version="2024-02-15-preview",
-        )
-
-        messages = [
-            {
-                "role": "system",
-                "content": self.system_prompt,
-            },
-            {
-                "role": "user",
-                "content": self.prompt,
-            },
-        ]
-
-        completion = client.chat.completions.create(
-            model="ttl-gpt",
-            messages=messages,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0,
-            stop=None,
-        )
-
-        return completion.choices[0].message.content
@@ -0,0 +1,65 @@
+import httpx
+from app.config import settings
+from app.api.api_v1.engines.resilience import get_guard
+
+# Provider clients are created once per process and reused by every request,
+# so the keep-alive connections in their HTTP pools survive between calls.
+# The SDKs themselves are imported on first use, a worker that only talks
+# to one provider never loads the others
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=30
+)
+
+_together_client = None
+_azure_client = None
+_google_configured = False
+
+
+def get_together_client():
+    global _together_client
+    if _together_client is None:
+        from openai import AsyncOpenAI
+
+        _together_client = AsyncOpenAI(
+            api_key=settings.together_api_key,
+            base_url="https://api.together.xyz/v1",
+            timeout=get_guard("text:together").timeout,
+            http_client=httpx.AsyncClient(limits=HTTP_LIMITS),
+        )
+    return _together_client
+
+
+def get_azure_client():
+    global _azure_client
+    if _azure_client is None:
+        from openai import AsyncAzureOpenAI
+
+        _azure_client = AsyncAzureOpenAI(
+            azure_endpoint=settings.azure_text_endpoint,
+            api_key=settings.azure_text_api_key,
+            api_version="2024-02-15-preview",
+            timeout=get_guard("text:azure").timeout,
+            http_client=httpx.AsyncClient(limits=HTTP_LIMITS),
+        )
+    return _azure_client
+
+
+def configure_google():
+    # genai.configure drops the cached sync and async Gemini clients, so it
+    # must only run once per process
+    global _google_configured
+    import google.generativeai as genai
+
+    if not _google_configured:
+        genai.configure(api_key=settings.google_api_key)
+        _google_configured = True
+    return genai
+
+
+async def close_clients():
+    global _together_client, _azure_client
+    for client in (_together_client, _azure_client):
+        if client is not None:
+            await client.close()
+    _together_client = None
+    _azure_client = None
@@ -0,0 +1,210 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import settings, server_config
+from app.api.api_v1.engines.resilience import (
+    CircuitOpenError,
+    ProviderBusyError,
+    get_guard,
+)
+
+
+class ProviderStats:
+    """Rolling latency windows and outcome counters for one text provider.
+
+    Completions and streams are timed apart: p95() of completions sets the
+    hedge deadline, streams only record their time to first token.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.successes += 1
+
+    def record_stream_success(self, first_token_latency: float):
+        self.first_token_latencies.append(first_token_latency)
+        self.successes += 1
+
+    def record_failure(self):
+        self.failures += 1
+
+    def record_skipped(self):
+        # Rejected by the guard without reaching the provider
+        self.skipped += 1
+
+    def p95(self, latencies: deque = None) -> Optional[float]:
+        latencies = self.latencies if latencies is None else latencies
+        if len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def snapshot(self) -> dict:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "p95_latency": self.p95(),
+            "samples": len(self.latencies),
+            "p95_first_token_latency": self.p95(self.first_token_latencies),
+            "stream_samples": len(self.first_token_latencies),
+        }
+
+
+class TextProviderRouter:
+    """Routes completions across an ordered list of text providers.
+
+    A provider that errors or passes the timeout is skipped for the next one
+    in the list. With hedging on, a second request is sent to the next
+    provider once the first one runs past its p95 latency, and whichever
+    answers first wins. A provider is never tried twice for one reply.
+    """
+
+    def __init__(
+        self,
+        providers: List[str],
+        timeout: float,
+        hedging: bool = False,
+        hedge_delay: float = 3,
+    ):
+        self.providers = providers
+        self.timeout = timeout
+        self.hedging = hedging
+        self.hedge_delay = hedge_delay
+        self.stats: Dict[str, ProviderStats] = {
+            provider: ProviderStats() for provider in providers
+        }
+
+    def get_hedge_delay(self, provider: str) -> float:
+        p95 = self.stats[provider].p95()
+        return p95 if p95 is not None else self.hedge_delay
+
+    async def call(self, engine, provider: str) -> str:
+        start = time.monotonic()
+        try:
+            async with get_guard(f"text:{provider}").aguard():
+                response = await asyncio.wait_for(
+                    engine.call_provider(provider), timeout=self.timeout
+                )
+        except (CircuitOpenError, ProviderBusyError):
+            self.stats[provider].record_skipped()
+            raise
+        except Exception:
+            self.stats[provider].record_failure()
+            raise
+        self.stats[provider].record_success(time.monotonic() - start)
+        return response
+
+    async def hedged_call(self, engine, provider: str, backup: str, tried: set) -> str:
+        tried.add(provider)
+        primary = asyncio.ensure_future(self.call(engine, provider))
+        try:
+            done, _ = await asyncio.wait(
+                {primary}, timeout=self.get_hedge_delay(provider)
+            )
+        except BaseException:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        tried.add(backup)
+        pending = {primary, asyncio.ensure_future(self.call(engine, backup))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, engine) -> str:
+        error = None
+        tried = set()
+        for index, provider in enumerate(self.providers):
+            if provider in tried:
+                continue
+            backup = (
+                self.providers[index + 1]
+                if self.hedging and index + 1 < len(self.providers)
+                else None
+            )
+            try:
+                if backup:
+                    return await self.hedged_call(engine, provider, backup, tried)
+                tried.add(provider)
+                return await self.call(engine, provider)
+            except Exception as e:
+                print(f"Text provider {provider} failed: {e!r}")
+                error = e
+        raise error
+
+    async def stream(self, engine) -> AsyncIterator[str]:
+        # Fail over only until the first token arrives, after that the reply
+        # is committed to the provider that produced it
+        error = None
+        for provider in self.providers:
+            start = time.monotonic()
+            token_stream = engine.stream_provider(provider)
+            started = False
+            try:
+                async with get_guard(f"text:{provider}").aguard():
+                    try:
+                        first_token = await asyncio.wait_for(
+                            token_stream.__anext__(), timeout=self.timeout
+                        )
+                    except StopAsyncIteration:
+                        first_token = None
+
+                    first_token_latency = time.monotonic() - start
+                    if first_token is not None:
+                        started = True
+                        yield first_token
+                        async for token in token_stream:
+                            yield token
+            except (CircuitOpenError, ProviderBusyError) as e:
+                self.stats[provider].record_skipped()
+                print(f"Text provider {provider} skipped: {e!r}")
+                error = e
+                continue
+            except Exception as e:
+                self.stats[provider].record_failure()
+                if started:
+                    raise
+                print(f"Text provider {provider} failed: {e!r}")
+                error = e
+                continue
+            finally:
+                # Also runs when the client goes away mid-reply, which closes
+                # the upstream request and frees the slot right away
+                await token_stream.aclose()
+
+            self.stats[provider].record_stream_success(first_token_latency)
+            return
+        raise error
+
+    def snapshot(self) -> dict:
+        return {provider: stats.snapshot() for provider, stats in self.stats.items()}
+
+
+text_router = TextProviderRouter(
+    server_config.TEXT_PROVIDERS,
+    timeout=settings.text_provider_timeout,
+    hedging=settings.text_provider_hedging,
+    hedge_delay=settings.text_provider_hedge_delay,
+)
@@ -1,6 +1,6 @@
-import openai
-import google.generativeai as genai
 from app.config import settings, server_config, configs
+from app.api.api_v1.engines.text.clients import configure_google
+from app.api.api_v1.engines.resilience import get_guard
 
 
 UTILS = [
@@ -38,7 +38,7 @@ class UtilsEngine:
             self.responseEngine = self.GoogleEngine()
 
     def GoogleEngine(self):
-        genai.configure(api_key=self.api_key_token)
+        genai = configure_google()
 
         generation_config = {
             "temperature": self.temperature,
@@ -66,7 +66,11 @@ class UtilsEngine:
             safety_settings=safety_settings,
         )
 
-        responses = model.generate_content(self.prompt)
+        guard = get_guard("text:google")
+        with guard.guard():
+            responses = model.generate_content(
+                self.prompt, request_options={"timeout": guard.read_timeout}
+            )
         return responses.text
 
     def get_response(self):
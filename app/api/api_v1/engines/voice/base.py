@@ -1,14 +1,26 @@
+from typing import Optional
 from app.config import settings
-import requests
-import os
+from starlette.concurrency import run_in_threadpool
 import azure.cognitiveservices.speech as speechsdk
 from app.api.api_v1.engines.storage.azure import azure_storage
+from app.api.api_v1.engines.resilience import get_guard
+from app.api.api_v1.engines.voice.clients import get_speech_client
+from app.api.api_v1.engines.voice.pool import synthesizer_pool
 from app.config import configs
 from app.models import Voice
 
+AZURE_OUTPUT_FORMAT = speechsdk.SpeechSynthesisOutputFormat.Audio16Khz128KBitRateMonoMp3
+
 
 class VoiceEngine:
-    def __init__(self, text: str, voiceObject: Voice, message_id: int):
+    """Synthesizes `text` with the provider of the voice.
+
+    get_audio() returns the mp3 bytes, get_audio_response() uploads them as
+    the audio of message_id and returns its URL. Both return None when
+    synthesis failed.
+    """
+
+    def __init__(self, text: str, voiceObject: Voice, message_id: Optional[int] = None):
         self.text = text
         self.message_id = message_id
         self.voice_name = voiceObject.voice_name
@@ -16,14 +28,25 @@ class VoiceEngine:
         self.voice_provider = voiceObject.voice_provider
         self.style = voiceObject.style
 
+    async def get_audio(self) -> Optional[bytes]:
         if self.voice_provider == configs.VOICE_PROVIDER_1:
-            self.responseEngine = self.ElventLabsEngine()
+            return await self.ElventLabsEngine()
         elif self.voice_provider == configs.VOICE_PROVIDER_2:
-            self.responseEngine = self.AzureEngine()
+            # The speech SDK blocks until the audio is ready
+            return await run_in_threadpool(self.AzureEngine)
+        return None
 
-    def ElventLabsEngine(
+    async def get_audio_response(self) -> Optional[str]:
+        audio = await self.get_audio()
+        if not audio:
+            return None
+        # The blob client is sync, the upload runs in the threadpool
+        uploaded = await run_in_threadpool(self.upload_audio, audio)
+        return self.audio_url if uploaded else None
+
+    async def ElventLabsEngine(
         self, stability=0.7, similarity_boost=0.5, style=0.2, use_speaker_boost=True
-    ):
+    ) -> Optional[bytes]:
         voice_id = self.voice_endpoint.split("/")[-1]
         url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
 
@@ -38,32 +61,19 @@ class VoiceEngine:
         }
 
         try:
-            response = requests.request("POST", url, json=payload, headers=headers)
-
-            audio_file_path = f"app/api/api_v1/dependency/temp_audio/{self.message_id}output_audio.mp3"
-
-            with open(audio_file_path, "wb") as f:
-                f.write(response.content)
-
-            azure_storage.upload_blob(
-                audio_file_path, "audio-messages", f"{self.message_id}.mp3"
-            )
-
-            os.remove(audio_file_path)
-
-            return f"{settings.azure_db_endpoint}/audio-messages/{self.message_id}.mp3"
+            guard = get_guard(f"voice:{configs.VOICE_PROVIDER_1}")
+            async with guard.aguard():
+                response = await get_speech_client().post(
+                    url, json=payload, headers=headers, timeout=guard.timeout
+                )
+                response.raise_for_status()
+            return response.content
         except Exception as e:
-            return e
+            print("Speech synthesis failed: {}".format(e))
+            return None
 
-    def AzureEngine(self):
+    def AzureEngine(self) -> Optional[bytes]:
         self.voice_name = f"en-US-{self.voice_name.split()[0]}Neural"
-        speech_config = speechsdk.SpeechConfig(
-            subscription=settings.speech_key, region=settings.speech_region
-        )
-        speech_config.speech_synthesis_voice_name = self.voice_name
-        speech_config.set_speech_synthesis_output_format(
-            speechsdk.SpeechSynthesisOutputFormat.Audio16Khz128KBitRateMonoMp3
-        )
 
         ssml_text = f"""
         <speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xmlns:mstts='http://www.w3.org/2001/mstts' xml:lang='en-US'>
@@ -77,32 +87,29 @@ class VoiceEngine:
 
         text = self.text
 
-        audio_config = speechsdk.audio.AudioOutputConfig(use_default_speaker=True)
-
-        speech_synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=speech_config, audio_config=audio_config
-        )
-
-        speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
-
-        result = speech_synthesizer.speak_ssml_async(ssml_text).get()
+        try:
+            # Guard first: a rejected call must neither open a connection to
+            # the provider nor cost the pool a healthy synthesizer
+            with get_guard(f"voice:{configs.VOICE_PROVIDER_2}").guard():
+                with synthesizer_pool.synthesizer(
+                    self.voice_name, AZURE_OUTPUT_FORMAT
+                ) as speech_synthesizer:
+                    result = speech_synthesizer.speak_ssml_async(ssml_text).get()
+                    if (
+                        result.reason == speechsdk.ResultReason.Canceled
+                        and result.cancellation_details.reason
+                        == speechsdk.CancellationReason.Error
+                    ):
+                        # Count service errors against the breaker
+                        raise RuntimeError(result.cancellation_details.error_details)
+        except Exception as e:
+            print("Speech synthesis failed: {}".format(e))
+            return None
 
         # Check result
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
             print("Speech synthesized for text [{}]".format(text))
-            # Save the synthesized audio to file
-            stream = speechsdk.AudioDataStream(result)
-            audio_file_path = f"app/api/api_v1/dependency/temp_audio/{self.message_id}output_audio.mp3"
-
-            stream.save_to_wav_file(audio_file_path)
-
-            azure_storage.upload_blob(
-                audio_file_path, "audio-messages", f"{self.message_id}.mp3"
-            )
-
-            os.remove(audio_file_path)
-
-            return f"{settings.azure_db_endpoint}/audio-messages/{self.message_id}.mp3"
+            return result.audio_data
 
         elif result.reason == speechsdk.ResultReason.Canceled:
             cancellation_details = result.cancellation_details
@@ -112,5 +119,29 @@ class VoiceEngine:
 
             return None
 
-    def get_audio_response(self):
-        return self.responseEngine
+    @property
+    def audio_url(self) -> str:
+        return self.get_audio_url(self.message_id)
+
+    def upload_audio(self, data) -> bool:
+        return self.upload_message_audio(self.message_id, data)
+
+    # Audio blobs are named after their message id, or cache/<key> for the
+    # shared TTS cache, whose content never changes once written
+    @staticmethod
+    def get_audio_url(name) -> str:
+        return f"{settings.azure_db_endpoint}/audio-messages/{name}.mp3"
+
+    @staticmethod
+    def upload_message_audio(name, data, overwrite: bool = False) -> bool:
+        return azure_storage.upload_blob_data(
+            data,
+            "audio-messages",
+            f"{name}.mp3",
+            content_type="audio/mpeg",
+            overwrite=overwrite,
+        )
+
+    @staticmethod
+    def delete_message_audio(name) -> bool:
+        return azure_storage.delete_blob("audio-messages", f"{name}.mp3")
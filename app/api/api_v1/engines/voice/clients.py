@@ -0,0 +1,28 @@
+import httpx
+from app.config import settings
+from app.api.api_v1.engines.text.clients import HTTP_LIMITS
+
+# One HTTP/2 client per process for the ElevenLabs and speech-to-text calls,
+# requests to the same host share one multiplexed keep-alive connection
+_speech_client = None
+
+
+def get_speech_client() -> httpx.AsyncClient:
+    global _speech_client
+    if _speech_client is None:
+        _speech_client = httpx.AsyncClient(
+            http2=True,
+            limits=HTTP_LIMITS,
+            timeout=httpx.Timeout(
+                settings.provider_read_timeout,
+                connect=settings.provider_connect_timeout,
+            ),
+        )
+    return _speech_client
+
+
+async def close_speech_client():
+    global _speech_client
+    if _speech_client is not None:
+        await _speech_client.aclose()
+    _speech_client = None
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from app.config import settings
+from app.api.api_v1.engines.resilience import ProviderBusyError
+
+
+class SynthesizerPool:
+    """Azure SpeechSynthesizers reused across requests.
+
+    Building a synthesizer and opening its connection costs a TLS handshake
+    and a round trip to the service, so released synthesizers are kept per
+    (voice, output format) with their connection open. At most max_size
+    exist in the process. When they are all busy a caller either recycles
+    an idle synthesizer of another voice or waits, up to queue_timeout.
+    Synthesis itself still blocks, engines run in the threadpool.
+
+    The speech SDK is only imported when the first synthesizer is built.
+    """
+
+    def __init__(self, max_size: int, window: int = 1000):
+        self.max_size = max_size
+        self.idle = {}
+        self.size = 0
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.waits = deque(maxlen=window)
+        self.acquisitions = 0
+        self.created = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def create(voice_name: str, output_format):
+        import azure.cognitiveservices.speech as speechsdk
+
+        speech_config = speechsdk.SpeechConfig(
+            subscription=settings.speech_key, region=settings.speech_region
+        )
+        speech_config.speech_synthesis_voice_name = voice_name
+        speech_config.set_speech_synthesis_output_format(output_format)
+
+        # Without an audio config the SDK plays to the default speaker, None
+        # keeps the audio in the result only
+        synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=speech_config, audio_config=None
+        )
+        connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connection.open(True)
+        return synthesizer, connection
+
+    @staticmethod
+    def discard(entry):
+        try:
+            entry[1].close()
+        except Exception as e:
+            print(f"Closing a speech synthesizer connection failed: {e}")
+
+    def take(self, key, timeout: float):
+        """Returns an idle entry for key, or None when the caller may create one."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.idle.get(key):
+                    entry, recycled = self.idle[key].pop(), None
+                    break
+                if self.size < self.max_size:
+                    entry, recycled = None, None
+                    self.size += 1
+                    break
+                other = next(
+                    (entries for entries in self.idle.values() if entries), None
+                )
+                if other:
+                    entry, recycled = None, other.pop(0)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise ProviderBusyError("No speech synthesizer available")
+                self.condition.wait(remaining)
+            self.in_use += 1
+        if recycled is not None:
+            self.discard(recycled)
+        return entry
+
+    @contextmanager
+    def synthesizer(self, voice_name: str, output_format):
+        key = (voice_name, output_format)
+        start = time.perf_counter()
+        entry = self.take(key, settings.provider_queue_timeout)
+        created = entry is None
+        healthy = False
+        try:
+            if created:
+                entry = self.create(voice_name, output_format)
+            with self.condition:
+                self.created += created
+                self.waits.append(time.perf_counter() - start)
+                self.acquisitions += 1
+            yield entry[0]
+            healthy = True
+        finally:
+            with self.condition:
+                self.in_use -= 1
+                if healthy:
+                    self.idle.setdefault(key, []).append(entry)
+                else:
+                    # Never hand out a synthesizer that just failed
+                    self.size -= 1
+                self.condition.notify()
+            if not healthy and entry is not None:
+                self.discard(entry)
+
+    def close(self):
+        with self.condition:
+            entries = [entry for idle in self.idle.values() for entry in idle]
+            self.idle = {}
+            self.size -= len(entries)
+        for entry in entries:
+            self.discard(entry)
+
+    def snapshot(self) -> dict:
+        with self.condition:
+            waits = sorted(self.waits)
+            return {
+                "size": self.size,
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "idle": sum(len(entries) for entries in self.idle.values()),
+                "voices": sum(1 for entries in self.idle.values() if entries),
+                "acquisitions": self.acquisitions,
+                "created": self.created,
+                "timeouts": self.timeouts,
+                "wait_p50": waits[len(waits) // 2] if waits else None,
+                "wait_p99": waits[int(0.99 * (len(waits) - 1))] if waits else None,
+                "wait_max": waits[-1] if waits else None,
+            }
+
+
+synthesizer_pool = SynthesizerPool(settings.azure_synthesizer_pool_size)
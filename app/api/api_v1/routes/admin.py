@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends
+
+from app.auth import get_current_admin, token_cache
+from app.database import pool_metrics, async_pool_metrics
+from app.middleware import blocked_ips
+from app.api.api_v1.dependency.sampling import public_bots, public_group_chats
+from app.api.api_v1.dependency.ranking import ranked_feeds
+from app.api.api_v1.dependency.counters import pending_deltas, reconcile_counters
+from app.api.api_v1.dependency.tts_cache import tts_cache
+from app.api.api_v1.engines.resilience import guards_snapshot
+from app.api.api_v1.engines.text.router import text_router
+from app.api.api_v1.engines.voice.pool import synthesizer_pool
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get(
+    "/providers",
+    summary="Get outbound provider status",
+    description="Get circuit breaker state, concurrency and queue depth of every outbound provider, plus text provider latency",
+)
+def get_provider_status(current_admin: str = Depends(get_current_admin)):
+    return {"guards": guards_snapshot(), "text_router": text_router.snapshot()}
+
+
+@router.post(
+    "/block_ips/reload",
+    summary="Reload blocked IPs",
+    description="Reload the blocked IP list of this worker from the database right away instead of waiting for the next periodic refresh",
+)
+async def reload_block_ips(current_admin: str = Depends(get_current_admin)):
+    count = await blocked_ips.reload()
+    return {"blocked_entries": count}
+
+
+@router.post(
+    "/explore/reload",
+    summary="Rebuild the explore catalog and feeds",
+    description="Reshuffle the explore bot and groupchat order and rebuild the ranked feeds of this worker right away instead of waiting for the next periodic refresh",
+)
+async def reload_explore(current_admin: str = Depends(get_current_admin)):
+    return {
+        "bots": await public_bots.reload(),
+        "group_chats": await public_group_chats.reload(),
+        "feeds": await ranked_feeds.reload(),
+    }
+
+
+@router.post(
+    "/counters/reconcile",
+    summary="Reconcile bot counters",
+    description="Recompute likes and chat counts of every bot from their source tables, dropping the pending chat count deltas they already cover",
+)
+async def reconcile_bot_counters(current_admin: str = Depends(get_current_admin)):
+    return {"fixed": await reconcile_counters(), "pending": await pending_deltas()}
+
+
+@router.get(
+    "/auth_cache",
+    summary="Get ID token cache stats",
+    description="Get size, hit, miss and eviction counters of the verified ID token cache of this worker",
+)
+def get_auth_cache_status(current_admin: str = Depends(get_current_admin)):
+    return token_cache.snapshot()
+
+
+@router.get(
+    "/tts_cache",
+    summary="Get TTS cache stats",
+    description="Get size, hit, miss and eviction counters of the in-memory TTS cache index of this worker",
+)
+def get_tts_cache_status(current_admin: str = Depends(get_current_admin)):
+    return tts_cache.snapshot()
+
+
+@router.get(
+    "/speech_pool",
+    summary="Get speech synthesizer pool stats",
+    description="Get size, usage and wait time of the pooled Azure speech synthesizers of this worker",
+)
+def get_speech_pool_status(current_admin: str = Depends(get_current_admin)):
+    return synthesizer_pool.snapshot()
+
+
+@router.get(
+    "/db_pool",
+    summary="Get database pool stats",
+    description="Get size, saturation and connection checkout latency of the sync and async database pools of this worker",
+)
+def get_db_pool_status(current_admin: str = Depends(get_current_admin)):
+    return {"sync": pool_metrics.snapshot(), "async": async_pool_metrics.snapshot()}
@@ -1,21 +1,37 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
+from fastapi import (
+    FastAPI,
+    Response,
+    status,
+    HTTPException,
+    Depends,
+    APIRouter,
+    Query,
+    BackgroundTasks,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import requests
-from PIL import Image
-import io
 import os
 
 from sqlalchemy import func
 from app import models
 from app.schemas import bot
-from app.database import get_db
+from app.schemas.page import Page
+from app.database import get_db, get_async_db
 from app.auth import get_current_user
+from app.api.api_v1.dependency.pagination import keyset, make_page
+from app.api.api_v1.dependency.tts_cache import select_greeting, tts_cache
+from app.api.api_v1.dependency.likes import (
+    like_statement,
+    liked_statement,
+    unlike_statement,
+)
 from app.config import configs, settings
-from app.api.api_v1.dependency.utils import decode_base64
+from app.api.api_v1.dependency.utils import decode_base64, save_webp
 from app.api.api_v1.engines.storage.azure import azure_storage
-from app.api.api_v1.engines.text.utils import UTILS, UtilsEngine
-from app.api.api_v1.engines.image.base import ImageEngine
+from app.api.api_v1.engines import get_engine
+from app.api.api_v1.engines.text.utils import UTILS
 
 import time
 
@@ -39,35 +55,49 @@ def get_bots_editting(
 @router.get(
     "/created_bot",
     summary="Get all bots created by user",
-    description="Get all bots created by an user",
-    response_model=List[bot.BotGet],
+    description="Get all bots created by an user, newest first. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[bot.BotGet],
 )
 def get_bots(
-    db: Session = Depends(get_db), current_user: str = Depends(get_current_user)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
 ):
-    return (
-        db.query(models.Bot)
-        .filter(models.Bot.created_by == current_user)
-        .order_by(models.Bot.created_at.desc())
-        .all()
-    )
+    bots = keyset(
+        db.query(models.Bot).filter(models.Bot.created_by == current_user),
+        models.Bot.created_at,
+        models.Bot.bot_id,
+        cursor,
+        limit,
+    ).all()
+    return make_page(bots, limit, lambda bot: (bot.created_at, bot.bot_id))
 
 
 @router.get(
     "/liked_bot",
     summary="Get all bots liked by user",
-    description="Get all bots liked by an user",
-    response_model=List[bot.BotGet],
+    description="Get all bots liked by an user, most recently liked first. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[bot.BotGet],
 )
 def get_liked_bots(
-    db: Session = Depends(get_db), current_user: str = Depends(get_current_user)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
 ):
-    return (
-        db.query(models.Bot)
+    # Paged on when the bot was liked, not when it was created
+    rows = keyset(
+        db.query(models.Bot, models.user_likes_bots.c.created_at.label("liked_at"))
         .join(models.user_likes_bots)
-        .filter(models.user_likes_bots.c.user_id == current_user)
-        .order_by(models.user_likes_bots.c.created_at.desc())
-        .all()
+        .filter(models.user_likes_bots.c.user_id == current_user),
+        models.user_likes_bots.c.created_at,
+        models.user_likes_bots.c.bot_id,
+        cursor,
+        limit,
+    ).all()
+    return make_page(
+        rows, limit, lambda row: (row.liked_at, row.Bot.bot_id), lambda row: row.Bot
     )
 
 
@@ -80,6 +110,7 @@ def get_liked_bots(
 )
 def create_bot(
     bot_create: bot.BotCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
@@ -95,13 +126,11 @@ def create_bot(
     if image_url.startswith("https"):
         # when image is generated by AI
         generated_image = requests.get(image_url).content
-        image = Image.open(io.BytesIO(generated_image))
-        image.save(image_path, "WEBP")
+        save_webp(generated_image, image_path)
     else:
         # when image is uploaded by user
         image_data = decode_base64(image_url)
-        image = Image.open(io.BytesIO(image_data))
-        image.save(image_path, "WEBP")
+        save_webp(image_data, image_path)
 
     image_upload = f"{bot_id}.webp"
 
@@ -113,9 +142,35 @@ def create_bot(
 
     os.remove(image_path)
 
+    # Every chat with the bot opens with its greeting
+    background_tasks.add_task(tts_cache.warm_greeting, bot_id)
+
     return db_bot
 
 
+@router.get(
+    "/{bot_id}/greeting_audio",
+    summary="Get the spoken greeting of a bot",
+    description="Get the URL of the greeting of a bot spoken in its voice. The audio is shared by every chat and only synthesized once",
+)
+async def get_greeting_audio(
+    bot_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    row = (await db.execute(select_greeting(bot_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Bot not found")
+
+    audio_url = await tts_cache.get_audio_url(row.Voice, row.greeting)
+    if audio_url is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Speech synthesis failed",
+        )
+    return {"audio_url": audio_url}
+
+
 @router.post(
     "/create_bot/generate",
     summary="Generate greeting and short description",
@@ -125,7 +180,7 @@ def create_bot(
 def generate_bot(
     bot_create: bot.BotGenerate, current_user: str = Depends(get_current_user)
 ):
-    engine = UtilsEngine(
+    engine = get_engine("utils")(
         character_name=bot_create.bot_name,
         character_description=bot_create.description,
         util=UTILS[0],
@@ -145,7 +200,7 @@ def generate_bot(
 def optimize_bot(
     bot_optimize: bot.BotGenerate, current_user: str = Depends(get_current_user)
 ):
-    engine = UtilsEngine(
+    engine = get_engine("utils")(
         character_name=bot_optimize.bot_name,
         character_description=bot_optimize.description,
         util=UTILS[1],
@@ -165,7 +220,7 @@ def optimize_bot(
 def generate_img_prompt(
     bot_optimize: bot.BotGenerate, current_user: str = Depends(get_current_user)
 ):
-    engine = UtilsEngine(
+    engine = get_engine("utils")(
         character_name=bot_optimize.bot_name,
         character_description=bot_optimize.description,
         util=UTILS[2],
@@ -185,7 +240,7 @@ def generate_img_prompt(
 def optimize_img_prompt(
     image_prompt: bot.ImagePrompt, current_user: str = Depends(get_current_user)
 ):
-    engine = UtilsEngine(image_prompt=image_prompt.image_prompt, util=UTILS[3])
+    engine = get_engine("utils")(image_prompt=image_prompt.image_prompt, util=UTILS[3])
 
     optimized_prompt = engine.get_response()
 
@@ -201,7 +256,7 @@ def optimize_img_prompt(
 def generate_avatar(
     image_prompt: bot.ImagePrompt, current_user: str = Depends(get_current_user)
 ):
-    engine = ImageEngine(
+    engine = get_engine("image")(
         image_prompt=image_prompt.image_prompt, provider=configs.IMAGE_PROVIDER_1
     )
 
@@ -220,6 +275,7 @@ def generate_avatar(
 def update_bot(
     id: int,
     bot_update: bot.BotUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
@@ -230,9 +286,12 @@ def update_bot(
             status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found"
         )
 
+    spoken = (db_bot.greeting, db_bot.voice_id)
     for var, value in bot_update.dict().items():
         if value is not None and var != "profile_picture":
             setattr(db_bot, var, value)
+    if (db_bot.greeting, db_bot.voice_id) != spoken:
+        background_tasks.add_task(tts_cache.warm_greeting, id)
 
     if bot_update.profile_picture:
         image_path = f"app/api/api_v1/dependency/temp_img_{id}.webp"
@@ -240,13 +299,11 @@ def update_bot(
         if image_url.startswith("https"):
             # when image is generated by AI
             generated_image = requests.get(image_url).content
-            image = Image.open(io.BytesIO(generated_image))
-            image.save(image_path, "WEBP")
+            save_webp(generated_image, image_path)
         else:
             # when image is uploaded by user
             image_data = decode_base64(image_url)
-            image = Image.open(io.BytesIO(image_data))
-            image.save(image_path, "WEBP")
+            save_webp(image_data, image_path)
 
         image_upload = f"{id}.webp"
 
@@ -265,10 +322,28 @@ def update_bot(
     return db_bot
 
 
+@router.get(
+    "/like_state",
+    summary="Get which bots the user likes",
+    description="Get which of the given bot ids (at most 100) the user has liked, in one call",
+    response_model=bot.LikeState,
+)
+def get_like_state(
+    bot_ids: List[int] = Query(...),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    if len(bot_ids) > 100:
+        raise HTTPException(status_code=400, detail="Too many bot ids")
+
+    liked = db.scalars(liked_statement(current_user, bot_ids)).all()
+    return bot.LikeState(liked_bot_ids=sorted(liked))
+
+
 @router.post(
     "/like/{bot_id}",
     summary="User likes a bot",
-    description="User likes a bot by bot id",
+    description="User likes a bot by bot id. Liking a bot twice is a no-op",
     status_code=status.HTTP_200_OK,
 )
 def likes_bot(
@@ -276,33 +351,19 @@ def likes_bot(
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
+    result = db.execute(like_statement(current_user, bot_id)).one()
+    db.commit()
 
-    bot_to_like = db.query(models.Bot).filter(models.Bot.bot_id == bot_id).first()
-
-    if not bot_to_like:
+    if not result.found:
         raise HTTPException(status_code=404, detail="Bot not found")
 
-    existing_like = (
-        db.query(models.user_likes_bots)
-        .filter_by(user_id=current_user, bot_id=bot_id)
-        .first()
-    )
-
-    if existing_like:
-        return Response(status_code=status.HTTP_200_OK)
-
-    db.execute(
-        models.user_likes_bots.insert().values(user_id=current_user, bot_id=bot_id)
-    )
-    db.commit()
-
     return Response(status_code=status.HTTP_200_OK)
 
 
 @router.delete(
     "/unlike/{bot_id}",
     summary="User unlikes a bot",
-    description="User unlikes a bot by bot id",
+    description="User unlikes a bot by bot id. Unliking a bot that is not liked is a no-op",
     status_code=status.HTTP_200_OK,
 )
 def unlike_bot(
@@ -310,29 +371,12 @@ def unlike_bot(
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
+    result = db.execute(unlike_statement(current_user, bot_id)).one()
+    db.commit()
 
-    bot_to_unlike = db.query(models.Bot).filter(models.Bot.bot_id == bot_id).first()
-
-    if not bot_to_unlike:
+    if not result.found:
         raise HTTPException(status_code=404, detail="Bot not found")
 
-    existing_like = (
-        db.query(models.user_likes_bots)
-        .filter_by(user_id=current_user, bot_id=bot_id)
-        .first()
-    )
-
-    if not existing_like:
-        raise HTTPException(status_code=404, detail="Like not found")
-
-    db.execute(
-        models.user_likes_bots.delete().where(
-            models.user_likes_bots.c.user_id == current_user,
-            models.user_likes_bots.c.bot_id == bot_id,
-        )
-    )
-    db.commit()
-
     return Response(status_code=status.HTTP_200_OK)
 
 
@@ -1,73 +1,108 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter, Body
-from sqlalchemy.orm import Session
+from fastapi import (
+    FastAPI,
+    Response,
+    status,
+    HTTPException,
+    Depends,
+    APIRouter,
+    Body,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+import asyncio
+import base64
 import os
-from sqlalchemy import func
+from sqlalchemy import func, select
 from app import models
-from app.config import configs
+from app.config import configs, settings
 from app.schemas import chat, message
-from app.database import get_db
+from app.schemas.page import Page
+from app.database import get_async_db, AsyncSessionLocal
 from app.auth import get_current_user
 from app.api.api_v1.dependency.utils import *
-from app.api.api_v1.dependency.vad import isSpeaking
-from app.api.api_v1.engines.text.base import TextEngine
-from app.api.api_v1.engines.voice.base import VoiceEngine
+from app.api.api_v1.dependency.messages import add_message, remove_message
+from app.api.api_v1.dependency.counters import uncount_chat
+from app.api.api_v1.dependency.pagination import encode_cursor, keyset, make_page
+from app.api.api_v1.dependency.speech import iter_sentences, synthesize_sentences
+from app.api.api_v1.dependency.tts_cache import synthesize_reply
+from app.api.api_v1.engines import get_engine
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
+def select_chat_messages(chat_id: int):
+    return (
+        select(
+            models.Message.message_id,
+            models.Message.chat_id,
+            models.Message.message,
+            models.Message.created_at,
+            models.Message.created_by_user,
+            models.Message.created_by_bot,
+            models.Message.is_bot,
+            models.Chat.user_id,
+            models.Chat.bot_id1.label("bot_id"),
+        )
+        .join(models.Chat, models.Message.chat_id == models.Chat.chat_id)
+        .where(models.Message.chat_id == chat_id)
+    )
+
+
+def get_message_key(msg):
+    return msg.created_at, msg.message_id
+
+
+def to_message_get(msg) -> message.MessageGet:
+    return message.MessageGet(
+        message_id=msg.message_id,
+        chat_id=msg.chat_id,
+        group_chat_id=None,
+        message=msg.message,
+        created_at=msg.created_at,
+        created_by_user=msg.created_by_user,
+        created_by_bot=msg.created_by_bot,
+        is_bot=msg.is_bot,
+        user_id=msg.user_id,
+        bot_id=msg.bot_id,
+    )
+
+
 @router.get(
     "/{user_id}",
     summary="Get all chats of an user",
     description="Get all chats of an user by user_id",
     response_model=List[chat.ChatGet],
 )
-def get_chats(
+async def get_chats(
     user_id,
     skip: int = 0,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    LatestMessageSubquery = (
-        db.query(
-            models.Message.chat_id,
-            func.max(models.Message.created_at).label("latest_message_time"),
-            func.max(models.Message.message_id).label("latest_message_id"),
-        )
-        .group_by(models.Message.chat_id)
-        .subquery("latest_message_subquery")
-    )
-
-    MessageContentSubquery = db.query(
-        models.Message.message_id,
-        models.Message.message.label("latest_message_content"),
-    ).subquery("message_content_subquery")
-
     chats_query = (
-        db.query(
+        select(
             models.Chat.chat_id,
             models.Chat.user_id,
             models.Chat.bot_id1,
             models.Bot.bot_name,
             models.Bot.profile_picture,
-            LatestMessageSubquery.c.latest_message_time,
-            MessageContentSubquery.c.latest_message_content,
+            models.Chat.last_message_time.label("latest_message_time"),
+            models.Message.message.label("latest_message_content"),
         )
         .join(models.Bot, models.Bot.bot_id == models.Chat.bot_id1)
-        .join(
-            LatestMessageSubquery,
-            LatestMessageSubquery.c.chat_id == models.Chat.chat_id,
-        )
-        .join(
-            MessageContentSubquery,
-            MessageContentSubquery.c.message_id
-            == LatestMessageSubquery.c.latest_message_id,
+        .outerjoin(
+            models.Message, models.Message.message_id == models.Chat.last_message
         )
-        .filter(models.Chat.user_id == user_id)
-        .order_by(LatestMessageSubquery.c.latest_message_time.desc())
+        .where(models.Chat.user_id == user_id)
+        .order_by(models.Chat.last_message_time.desc().nulls_last())
     )
 
-    chats = chats_query.all()
+    chats = (await db.execute(chats_query)).all()
 
     chats_list = [
         {
@@ -92,9 +127,9 @@ def get_chats(
     response_model=chat.ChatGet,
     status_code=status.HTTP_201_CREATED,
 )
-def create_chat(
+async def create_chat(
     chat_obj: chat.ChatCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
 
@@ -105,10 +140,9 @@ def create_chat(
             new_chat.__setattr__(f"bot_id{i}", None)
 
     db.add(new_chat)
-    db.commit()
-    db.refresh(new_chat)
+    await db.commit()
 
-    bot_db = db.query(models.Bot).filter(models.Bot.bot_id == new_chat.bot_id1).first()
+    bot_db = await db.get(models.Bot, new_chat.bot_id1)
 
     new_message = models.Message(
         chat_id=new_chat.chat_id,
@@ -116,8 +150,8 @@ def create_chat(
         created_by_bot=new_chat.bot_id1,
         is_bot=True,
     )
-    db.add(new_message)
-    db.commit()
+    await add_message(db, new_message)
+    await db.commit()
 
     return chat.ChatGet(
         chat_id=new_chat.chat_id,
@@ -136,18 +170,19 @@ def create_chat(
     description="Delete a chat by chat_id",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_chat(
+async def delete_chat(
     chat_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    chat = db.query(models.Chat).filter(models.Chat.chat_id == chat_id).first()
+    chat = await db.get(models.Chat, chat_id)
     if not chat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
         )
-    db.delete(chat)
-    db.commit()
+    await uncount_chat(db, chat_id)
+    await db.delete(chat)
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -161,11 +196,11 @@ def delete_chat(
 async def create_message(
     chat_id: int,
     message_obj: message.MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
 
-    db_chat = db.query(models.Chat).filter(models.Chat.chat_id == chat_id).first()
+    db_chat = await db.get(models.Chat, chat_id)
 
     if not db_chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -174,41 +209,33 @@ async def create_message(
     new_message_data["chat_id"] = chat_id
     new_message = models.Message(**new_message_data)
 
-    db.add(new_message)
-    db.commit()
+    await add_message(db, new_message)
+    await db.commit()
 
     bot_id = db_chat.bot_id1
-    db_bot = db.query(models.Bot).filter(models.Bot.bot_id == bot_id).first()
+    db_bot = await db.get(models.Bot, bot_id)
 
     last_chats = (
-        db.query(models.Message)
-        .filter(models.Message.chat_id == chat_id)
-        .order_by(models.Message.created_at.desc())
-        .limit(6)
-        .all()
-    )
+        await db.scalars(
+            select(models.Message)
+            .where(models.Message.chat_id == chat_id)
+            .order_by(models.Message.created_at.desc())
+            .limit(6)
+        )
+    ).all()
 
     message_lists = make_message_lists(last_chats)
 
-    textEngine = TextEngine(message_lists, db_bot.bot_name, db_bot.description)
-    ml_response = textEngine.get_response()
+    textEngine = get_engine("text")(message_lists, db_bot.bot_name, db_bot.description)
+    ml_response = await textEngine.get_response()
     # job_id = get_ml_response(bot_description, new_message.message)
     # if job_id:
     #     ml_response = await check_ml_response(job_id)
     bot_response = models.Message(
         chat_id=chat_id, message=ml_response, is_bot=True, created_by_bot=bot_id
     )
-    db.add(bot_response)
-
-    # Update last message in the chat
-    db_chat.last_message = bot_response.message_id
-
-    # Update number of interations with bots
-    db_bot.num_chats += 1
-    db.commit()
-
-    db.refresh(db_chat)
-    db.refresh(db_bot)
+    await add_message(db, bot_response)
+    await db.commit()
 
     return message.MessageGet(
         message_id=bot_response.message_id,
@@ -224,133 +251,180 @@ async def create_message(
     )
 
 
+async def save_bot_reply(chat_id: int, bot_id: int, user_id: str, ml_response: str):
+    # The request scoped session is already closed once the response starts
+    # streaming, so the reply is saved with a session of its own
+    async with AsyncSessionLocal() as db:
+        bot_response = models.Message(
+            chat_id=chat_id, message=ml_response, is_bot=True, created_by_bot=bot_id
+        )
+        await add_message(db, bot_response)
+        await db.commit()
+
+        return message.MessageGet(
+            message_id=bot_response.message_id,
+            chat_id=bot_response.chat_id,
+            group_chat_id=None,
+            user_id=user_id,
+            bot_id=bot_id,
+            message=bot_response.message,
+            created_at=bot_response.created_at,
+            created_by_user=bot_response.created_by_user,
+            created_by_bot=bot_response.created_by_bot,
+            is_bot=bot_response.is_bot,
+        )
+
+
+async def stream_bot_reply(token_stream, chat_id: int, bot_id: int, user_id: str):
+    """Relays the reply tokens as SSE frames, then saves the full reply."""
+    ml_response = ""
+    try:
+        async for token in token_stream:
+            ml_response += token
+            yield format_sse({"token": token}, event="token")
+    except Exception as e:
+        yield format_sse({"detail": str(e)}, event="error")
+        return
+
+    bot_response = await save_bot_reply(chat_id, bot_id, user_id, ml_response)
+    yield format_sse(bot_response.model_dump(), event="done")
+
+
+@router.post(
+    "/{chat_id}/message/stream",
+    summary="Create a new message for a chat and stream the reply",
+    description="Create a new message and stream the bot reply token by token as Server-Sent Events. Emits `token` events while the reply is generated, then a `done` event with the saved message",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def create_message_stream(
+    chat_id: int,
+    message_obj: message.MessageCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    db_chat = await db.get(models.Chat, chat_id)
+
+    if not db_chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    new_message_data = message_obj.dict()
+    new_message_data["chat_id"] = chat_id
+    new_message = models.Message(**new_message_data)
+
+    await add_message(db, new_message)
+    await db.commit()
+
+    bot_id = db_chat.bot_id1
+    db_bot = await db.get(models.Bot, bot_id)
+
+    last_chats = (
+        await db.scalars(
+            select(models.Message)
+            .where(models.Message.chat_id == chat_id)
+            .order_by(models.Message.created_at.desc())
+            .limit(6)
+        )
+    ).all()
+
+    message_lists = make_message_lists(last_chats)
+
+    textEngine = get_engine("text")(message_lists, db_bot.bot_name, db_bot.description)
+
+    return StreamingResponse(
+        stream_bot_reply(
+            textEngine.stream_response(), chat_id, bot_id, db_chat.user_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/{chat_id}/message",
     summary="Get all messages of a chat",
-    description="Get all messages of a chat by chat_id",
-    response_model=List[message.MessageGet],
+    description="Get the messages of a chat by chat_id, newest first. Pass the `next_cursor` of a page as `cursor` to get the next, older page",
+    response_model=Page[message.MessageGet],
 )
-def get_messages(
+async def get_messages(
     chat_id: int,
-    limit: int = 20,
-    skip: int = 0,
-    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
     messages = (
-        db.query(
-            models.Message.message_id,
-            models.Message.chat_id,
-            models.Message.message,
-            models.Message.created_at,
-            models.Message.created_by_user,
-            models.Message.created_by_bot,
-            models.Message.is_bot,
-            models.Chat.user_id,
-            models.Chat.bot_id1.label("bot_id"),
+        await db.execute(
+            keyset(
+                select_chat_messages(chat_id),
+                models.Message.created_at,
+                models.Message.message_id,
+                cursor,
+                limit,
+            )
         )
-        .join(models.Chat, models.Message.chat_id == models.Chat.chat_id)
-        .filter(models.Message.chat_id == chat_id)
-        .order_by(models.Message.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .yield_per(30)
-        .all()
-    )
+    ).all()
 
-    return [
-        message.MessageGet(
-            message_id=msg.message_id,
-            chat_id=msg.chat_id,
-            group_chat_id=None,
-            message=msg.message,
-            created_at=msg.created_at,
-            created_by_user=msg.created_by_user,
-            created_by_bot=msg.created_by_bot,
-            is_bot=msg.is_bot,
-            user_id=msg.user_id,
-            bot_id=msg.bot_id,
-        )
-        for msg in messages
-    ]
+    return make_page(messages, limit, get_message_key, to_message_get)
 
 
 @router.get(
-    "/{chat_id}/{message_id}",
-    summary="Get a specific message in a chat",
-    description="Get a specific message in a chat",
-    response_model=message.MessageGet,
+    "/{chat_id}/messages",
+    summary="Get older messages in a chat",
+    description="Get the messages of a chat older than the message `before`, newest first. Pass the `next_cursor` of a page as `cursor` to get the next, older page",
+    response_model=Page[message.MessageGet],
 )
-def get_message(
+async def get_older_messages(
     chat_id: int,
-    message_id: int,
-    db: Session = Depends(get_db),
+    before: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    message = (
-        db.query(models.Message)
-        .filter(models.Message.chat_id == chat_id)
-        .filter(models.Message.message_id == message_id)
-        .first()
-    )
+    if cursor is None:
+        anchor = await db.get(models.Message, before)
+        if anchor is None or anchor.chat_id != chat_id:
+            raise HTTPException(status_code=404, detail="Message not found")
+        cursor = encode_cursor(anchor.created_at, anchor.message_id)
 
-    if message is None:
-        raise HTTPException(status_code=404, detail="Message not found")
+    messages = (
+        await db.execute(
+            keyset(
+                select_chat_messages(chat_id),
+                models.Message.created_at,
+                models.Message.message_id,
+                cursor,
+                limit,
+            )
+        )
+    ).all()
 
-    return message
+    return make_page(messages, limit, get_message_key, to_message_get)
 
 
 @router.get(
     "/{chat_id}/{message_id}",
-    summary="Get older messages in a chat",
-    description="Get messages older than a specific message in a chat",
-    response_model=List[message.MessageGet],
+    summary="Get a specific message in a chat",
+    description="Get a specific message in a chat",
+    response_model=message.MessageGet,
 )
-def get_older_messages(
+async def get_message(
     chat_id: int,
     message_id: int,
-    limit: int = 20,
-    skip: int = 0,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    messages = (
-        db.query(
-            models.Message.message_id,
-            models.Message.chat_id,
-            models.Message.message,
-            models.Message.created_at,
-            models.Message.created_by_user,
-            models.Message.created_by_bot,
-            models.Message.is_bot,
-            models.Chat.user_id,
-            models.Chat.bot_id1.label("bot_id"),
-        )
-        .join(models.Chat, models.Message.chat_id == models.Chat.chat_id)
-        .filter(
-            models.Message.chat_id == chat_id, models.Message.message_id < message_id
-        )
-        .order_by(models.Message.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    message = await db.scalar(
+        select(models.Message)
+        .where(models.Message.chat_id == chat_id)
+        .where(models.Message.message_id == message_id)
     )
 
-    return [
-        message.MessageGet(
-            message_id=msg.message_id,
-            chat_id=msg.chat_id,
-            group_chat_id=None,
-            message=msg.message,
-            created_at=msg.created_at,
-            created_by_user=msg.created_by_user,
-            created_by_bot=msg.created_by_bot,
-            is_bot=msg.is_bot,
-            user_id=msg.user_id,
-            bot_id=msg.bot_id,
-        )
-        for msg in messages
-    ]
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    return message
 
 
 @router.delete(
@@ -359,22 +433,20 @@ def get_older_messages(
     description="Delete a message by message_id",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_message(
+async def delete_message(
     chat_id: int,
     message_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    message = (
-        db.query(models.Message).filter(models.Message.message_id == message_id).first()
-    )
+    message = await db.get(models.Message, message_id)
 
     if not message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
         )
-    db.delete(message)
-    db.commit()
+    await remove_message(db, message)
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -386,7 +458,7 @@ def delete_message(
 )
 async def process_audio(
     voice_chat: chat.VoiceChat = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
 
@@ -399,43 +471,203 @@ async def process_audio(
             chat_id=chat_id, message=audio, created_by_user=current_user, is_bot=False
         )
 
-        db.add(new_message)
-        db.commit()
+        await add_message(db, new_message)
+        await db.commit()
 
-        voice = (
-            db.query(models.Voice)
+        voice = await db.scalar(
+            select(models.Voice)
             .join(models.Bot, models.Bot.voice_id == models.Voice.voice_id)
-            .filter(models.Bot.bot_id == bot_id)
-            .first()
+            .where(models.Bot.bot_id == bot_id)
         )
 
         last_chats = (
-            db.query(models.Message)
-            .filter(models.Message.chat_id == chat_id)
-            .order_by(models.Message.created_at.desc())
-            .limit(6)
-            .all()
-        )
+            await db.scalars(
+                select(models.Message)
+                .where(models.Message.chat_id == chat_id)
+                .order_by(models.Message.created_at.desc())
+                .limit(6)
+            )
+        ).all()
 
         message_lists = make_message_lists(last_chats)
-        bot = db.query(models.Bot).filter(models.Bot.bot_id == bot_id).first()
+        bot = await db.get(models.Bot, bot_id)
 
-        textEngine = TextEngine(message_lists, bot.bot_name, bot.description)
-        ml_response = textEngine.get_response()
+        textEngine = get_engine("text")(message_lists, bot.bot_name, bot.description)
+        ml_response = await textEngine.get_response()
 
         new_message = models.Message(
             chat_id=chat_id, message=ml_response, created_by_bot=bot_id, is_bot=True
         )
 
-        db.add(new_message)
-        db.commit()
-
-        voice_service = VoiceEngine(ml_response, voice, new_message.message_id)
-        output_audio = voice_service.get_audio_response()
+        await add_message(db, new_message)
+        await db.commit()
 
-        return output_audio
+        return await synthesize_reply(voice, ml_response, new_message.message_id)
 
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+
+
+async def stream_voice_reply(
+    token_stream, voice, chat_id: int, bot_id: int, user_id: str
+):
+    """Relays the reply as one SSE `audio` frame per synthesized sentence.
+
+    Once the reply is complete it is saved, and the concatenated mp3 of all
+    sentences is archived as the audio of the saved message.
+    """
+    VoiceEngine = get_engine("voice")
+    tokens = []
+    segments = []
+
+    async def collect_tokens():
+        async for token in token_stream:
+            tokens.append(token)
+            yield token
+
+    async def synthesize(sentence: str):
+        return await VoiceEngine(sentence, voice).get_audio()
+
+    try:
+        async for sequence, sentence, audio in synthesize_sentences(
+            iter_sentences(collect_tokens()),
+            synthesize,
+            settings.tts_pipeline_concurrency,
+        ):
+            if audio:
+                segments.append(audio)
+            yield format_sse(
+                {
+                    "sequence": sequence,
+                    "text": sentence,
+                    "audio": base64.b64encode(audio).decode() if audio else None,
+                },
+                event="audio",
+            )
+    except Exception as e:
+        yield format_sse({"detail": str(e)}, event="error")
+        return
+
+    bot_response = await save_bot_reply(chat_id, bot_id, user_id, "".join(tokens))
+
+    # mp3 frames are self-contained, the segments play back to back
+    audio_url = None
+    if segments and await run_in_threadpool(
+        VoiceEngine.upload_message_audio, bot_response.message_id, b"".join(segments)
+    ):
+        audio_url = VoiceEngine.get_audio_url(bot_response.message_id)
+
+    yield format_sse(
+        {**bot_response.model_dump(), "audio_url": audio_url}, event="done"
+    )
+
+
+@router.post(
+    "/process_audio/{chat_id}/stream",
+    summary="Process audio and stream the spoken reply",
+    description="Create a new message and stream the spoken bot reply sentence by sentence as Server-Sent Events. Emits an `audio` event per sentence with its `sequence`, `text` and base64 mp3 `audio` as soon as it is synthesized, then a `done` event with the saved message and the `audio_url` of the whole reply",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def process_audio_stream(
+    voice_chat: chat.VoiceChat = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    chat_id = voice_chat.chat_id
+    bot_id = voice_chat.bot_id
+
+    voice = await db.scalar(
+        select(models.Voice)
+        .join(models.Bot, models.Bot.voice_id == models.Voice.voice_id)
+        .where(models.Bot.bot_id == bot_id)
+    )
+    if voice is None:
+        raise HTTPException(status_code=404, detail="Voice not found")
+
+    new_message = models.Message(
+        chat_id=chat_id,
+        message=voice_chat.text,
+        created_by_user=current_user,
+        is_bot=False,
+    )
+
+    await add_message(db, new_message)
+    await db.commit()
+
+    last_chats = (
+        await db.scalars(
+            select(models.Message)
+            .where(models.Message.chat_id == chat_id)
+            .order_by(models.Message.created_at.desc())
+            .limit(6)
+        )
+    ).all()
+
+    message_lists = make_message_lists(last_chats)
+    bot = await db.get(models.Bot, bot_id)
+
+    textEngine = get_engine("text")(message_lists, bot.bot_name, bot.description)
+
+    return StreamingResponse(
+        stream_voice_reply(
+            textEngine.stream_response(), voice, chat_id, bot_id, current_user
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def relay_transcripts(websocket: WebSocket, recognizer):
+    """Sends every transcript event, then the full transcript as `done`."""
+    phrases = []
+    try:
+        async for event, text in recognizer.results():
+            if event == "final":
+                phrases.append(text)
+            await websocket.send_json({"event": event, "text": text})
+        await websocket.send_json({"event": "done", "text": " ".join(phrases)})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away, recognition is stopped by the caller
+        pass
+
+
+@router.websocket("/speech_to_text")
+async def speech_to_text(
+    websocket: WebSocket,
+    current_user: str = Depends(get_current_user),
+):
+    """Transcribes audio while it is recorded.
+
+    The client sends 16 kHz 16-bit mono PCM as binary frames and the text
+    frame `end` when it stops recording. The server sends `partial` and
+    `final` transcript events as they are recognized, then a `done` event
+    with the full transcript and closes the connection.
+    """
+    await websocket.accept()
+
+    recognizer = get_engine("stt")()
+    try:
+        await recognizer.start()
+    except Exception as e:
+        await websocket.send_json({"event": "error", "text": str(e)})
+        await websocket.close()
+        return
+
+    relay = asyncio.ensure_future(relay_transcripts(websocket, recognizer))
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect" or frame.get("text") == "end":
+                break
+            if frame.get("bytes"):
+                recognizer.write(frame["bytes"])
+    finally:
+        recognizer.end_audio()
+        try:
+            await relay
+        finally:
+            await recognizer.stop()
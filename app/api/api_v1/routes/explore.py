@@ -1,131 +1,189 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from app import models
 from app.config import settings
 from app.schemas import explore, groupchat
-from app.schemas.bot import BotGet
-from app.database import get_db
+from app.schemas.page import Page
+from app.database import get_async_db
 from app.auth import get_current_user
-
+from app.api.api_v1.dependency.pagination import keyset, make_page
+from app.api.api_v1.dependency.sampling import public_bots, public_group_chats
+from app.api.api_v1.dependency.search import build_tsquery, search_condition
+from app.api.api_v1.dependency.ranking import Feed, ranked_feeds
 
 router = APIRouter(prefix="/explore", tags=["Explore"])
 
 
+async def get_in_order(db: AsyncSession, query, id_column, ids: List[int]) -> list:
+    """Loads the rows with the given ids by primary key, in the order given.
+
+    Rows that stopped matching `query` since the ids were sampled are left
+    out.
+    """
+    if not ids:
+        return []
+    rows = {
+        getattr(row, id_column.key): row
+        for row in await db.scalars(query.where(id_column.in_(ids)))
+    }
+    return [rows[id] for id in ids if id in rows]
+
+
 @router.get(
     "/",
     summary="Get all bots",
-    description="Get all bots in the database",
-    response_model=List[explore.ExploreBots],
+    description="Get all bots in the database, newest first. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[explore.ExploreBots],
 )
-def get_bots(
-    limit: int = 20,
-    skip: int = 0,
+async def get_bots(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    bots = db.query(models.Bot).offset(skip).limit(limit).all()
-    return bots
+    bots = (
+        await db.scalars(
+            keyset(
+                select(models.Bot),
+                models.Bot.created_at,
+                models.Bot.bot_id,
+                cursor,
+                limit,
+            )
+        )
+    ).all()
+    return make_page(bots, limit, lambda bot: (bot.created_at, bot.bot_id))
 
 
 @router.get(
     "/groupchat",
     summary="Get all groupchat bots",
-    description="Get all groupchat bots in the database",
-    response_model=List[groupchat.GroupChatGet],
+    description="Get public groupchats in a shuffled order. Pass the `next_cursor` of a page as `cursor` to get the next page, or a `seed` to get a reproducible order",
+    response_model=Page[groupchat.GroupChatGet],
 )
-def get_groupchats(
-    limit: int = 20,
-    skip: int = 0,
-    db: Session = Depends(get_db),
+async def get_groupchats(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    seed: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user),
 ):
-    db_groupchats = (
-        db.query(models.GroupChat)
-        .filter(
+    ids, next_cursor = await public_group_chats.get_page(None, limit, cursor, seed)
+    db_groupchats = await get_in_order(
+        db,
+        select(models.GroupChat)
+        .where(
             models.GroupChat.privacy == "public",
             models.GroupChat.user_id == settings.admin_id,
         )
-        .order_by(func.random())
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .options(selectinload(models.GroupChat.bots)),
+        models.GroupChat.group_chat_id,
+        ids,
     )
 
     response = []
     for chat in db_groupchats:
-        chat_bots = [
-            BotGet.model_validate(bot)
-            for bot in db.query(models.Bot)
-            .join(
-                models.GroupChatBots, models.Bot.bot_id == models.GroupChatBots.bot_id
-            )
-            .filter(models.GroupChatBots.group_chat_id == chat.group_chat_id)
-            .all()
-        ]
-
         chat_response = groupchat.GroupChatGet(
             group_chat_id=chat.group_chat_id,
             group_chat_name=chat.group_chat_name,
-            group_bots=chat_bots,
+            group_bots=chat.bots,
             group_chat_profile_picture=chat.group_chat_profile_picture,
             privacy=chat.privacy,
         )
         response.append(chat_response)
 
-    return response
+    return Page(items=response, next_cursor=next_cursor)
 
 
 @router.get(
     "/search",
-    summary="Search bots by name",
-    description="Search bots by name in the database",
-    response_model=List[explore.ExploreBots],
+    summary="Search bots",
+    description="Search public bots by name, short description, category and description, best matches first. Matches word prefixes and tolerates typos in names. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[explore.ExploreBots],
 )
-def search_bots(
+async def search_bots(
     search: str,
-    limit: int = 20,
-    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    bots = (
-        db.query(models.Bot)
-        .filter(models.Bot.bot_name.contains(search), models.Bot.privacy == "public")
-        .offset(skip)
-        .limit(limit)
-        .all()
+    if build_tsquery(search) is None:
+        return Page(items=[])
+
+    condition, rank = search_condition(
+        models.Bot.search_vector, models.Bot.bot_name, search
+    )
+    rank = rank.label("rank")
+    rows = (
+        await db.execute(
+            keyset(
+                select(models.Bot, rank).where(
+                    models.Bot.privacy == "public", condition
+                ),
+                rank,
+                models.Bot.bot_id,
+                cursor,
+                limit,
+            )
+        )
+    ).all()
+    return make_page(
+        rows, limit, lambda row: (row.rank, row.Bot.bot_id), lambda row: row.Bot
     )
-    return bots
 
 
 @router.get(
     "/category",
     summary="Get bots by category",
-    description="Get bots by category in the database",
-    response_model=List[explore.ExploreBots],
+    description="Get public bots of a category in a shuffled order. Pass the `next_cursor` of a page as `cursor` to get the next page, or a `seed` to get a reproducible order",
+    response_model=Page[explore.ExploreBots],
 )
-def get_bots_by_category(
+async def get_bots_by_category(
     category: str,
-    limit: int = 20,
-    skip: int = 0,
-    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    seed: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user),
 ):
-    bots = (
-        db.query(models.Bot)
-        .filter(
-            models.Bot.category == category,
-            models.Bot.privacy == "public",
-        )
-        .order_by(func.random())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    ids, next_cursor = await public_bots.get_page(category, limit, cursor, seed)
+    bots = await get_in_order(
+        db,
+        select(models.Bot).where(
+            models.Bot.category == category, models.Bot.privacy == "public"
+        ),
+        models.Bot.bot_id,
+        ids,
+    )
+    return Page(items=bots, next_cursor=next_cursor)
+
+
+@router.get(
+    "/feed/{feed}",
+    summary="Get a ranked feed of bots",
+    description="Get public bots ranked by recent activity (`trending`), chats (`most_chatted`), likes (`most_liked`) or creation time (`new`). Feeds are rebuilt in the background. Pass the `next_cursor` of a page as `cursor` to get the next page of the same build, a cursor older than two rebuilds gets a 400",
+    response_model=Page[explore.ExploreBots],
+)
+async def get_feed(
+    feed: Feed,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user),
+):
+    ids, next_cursor = await ranked_feeds.get_page(db, feed, limit, cursor)
+    bots = await get_in_order(
+        db,
+        select(models.Bot).where(models.Bot.privacy == "public"),
+        models.Bot.bot_id,
+        ids,
     )
-    return bots
+    return Page(items=bots, next_cursor=next_cursor)
 
 
 @router.get(
@@ -134,27 +192,25 @@ def get_bots_by_category(
     description="Get a bot randomly in the database",
     response_model=explore.ExploreBots,
 )
-def get_bots_random(
-    db: Session = Depends(get_db),
+async def get_bots_random(
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user),
 ):
-    bots = (
-        db.query(models.Bot)
-        .filter(models.Bot.privacy == "public")
-        .order_by(func.random())
-        .limit(1)
-        .first()
-    )
-    return bots
+    bot_id = await public_bots.choice()
+    if bot_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found"
+        )
+    return await db.get(models.Bot, bot_id)
 
 
 @router.get("/{id}", response_model=explore.ExploreBots)
-def get_bot_by_id(
+async def get_bot_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user),
 ):
-    bot = db.query(models.Bot).filter(models.Bot.bot_id == id).first()
+    bot = await db.get(models.Bot, id)
 
     if not bot:
         raise HTTPException(
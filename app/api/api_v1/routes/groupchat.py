@@ -1,90 +1,122 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter, Body
-from sqlalchemy.orm import Session
+from fastapi import (
+    FastAPI,
+    Response,
+    status,
+    HTTPException,
+    Depends,
+    APIRouter,
+    Body,
+    Query,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import os
 import random
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import selectinload
 from app import models
 from app.config import configs, settings
 from app.schemas import chat, bot, message, groupchat
 from app.schemas.bot import BotGet
+from app.schemas.page import Page
 from app.api.api_v1.engines.storage.azure import azure_storage
-from app.database import get_db
+from app.database import get_async_db
 from app.auth import get_current_user
 from app.api.api_v1.dependency.utils import *
-from app.api.api_v1.engines.text.base import TextEngine, GroupChatTextEngine
-from app.api.api_v1.engines.voice.base import VoiceEngine
+from app.api.api_v1.dependency.messages import add_message
+from app.api.api_v1.dependency.pagination import keyset, make_page
+from app.api.api_v1.dependency.tts_cache import synthesize_reply
+from app.api.api_v1.engines import get_engine
 
 router = APIRouter(prefix="/groupchat", tags=["GroupChat"])
 
 
+async def get_group_context(db: AsyncSession, group_chat_id: int):
+    """Loads the bots of a group and its last messages for the text engine.
+
+    Bot authors are resolved from the group's bots already in hand, so the
+    number of queries does not grow with the number of messages. Authors
+    that have since left the group are fetched together in one query.
+    """
+    all_bots = (
+        await db.scalars(
+            select(models.Bot)
+            .join(models.GroupChatBots)
+            .where(models.GroupChatBots.group_chat_id == group_chat_id)
+        )
+    ).all()
+
+    last_chats = (
+        await db.scalars(
+            select(models.Message)
+            .where(models.Message.group_chat_id == group_chat_id)
+            .order_by(models.Message.created_at.desc())
+            .limit(6)
+        )
+    ).all()
+
+    bots_by_id = {bot.bot_id: bot for bot in all_bots}
+    missing_bot_ids = {
+        last_chat.created_by_bot for last_chat in last_chats if last_chat.is_bot
+    } - bots_by_id.keys()
+    if missing_bot_ids:
+        for bot in await db.scalars(
+            select(models.Bot).where(models.Bot.bot_id.in_(missing_bot_ids))
+        ):
+            bots_by_id[bot.bot_id] = bot
+
+    message_list = []
+    for last_chat in last_chats:
+        query_bot = (
+            bots_by_id.get(last_chat.created_by_bot) if last_chat.is_bot else None
+        )
+        message_list.append(
+            {
+                "bot_name": query_bot.bot_name if query_bot else None,
+                "bot_description": query_bot.description if query_bot else None,
+                "message": last_chat.message,
+            }
+        )
+    return all_bots, message_list
+
+
 @router.get(
     "/{user_id}",
     summary="Get all GroupChats of an user",
     description="Get all GroupChats of an user by user_id",
     response_model=List[groupchat.GroupChatGet],
 )
-def get_chats(
+async def get_chats(
     user_id,
     skip: int = 0,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    LatestMessageSubquery = (
-        db.query(
-            models.Message.group_chat_id,
-            func.max(models.Message.created_at).label("latest_message_time"),
-            func.max(models.Message.message_id).label("latest_message_id"),
-        )
-        .group_by(models.Message.group_chat_id)
-        .subquery("latest_message_subquery")
-    )
-
-    MessageContentSubquery = db.query(
-        models.Message.message_id.label("latest_message_id"),
-        models.Message.message.label("latest_message_content"),
-    ).subquery("message_content_subquery")
-
     chats = (
-        db.query(
-            models.GroupChat,
-            MessageContentSubquery.c.latest_message_content,
-            LatestMessageSubquery.c.latest_message_time,
-        )
-        .outerjoin(
-            LatestMessageSubquery,
-            models.GroupChat.group_chat_id == LatestMessageSubquery.c.group_chat_id,
-        )
-        .outerjoin(
-            MessageContentSubquery,
-            LatestMessageSubquery.c.latest_message_id
-            == MessageContentSubquery.c.latest_message_id,
-        )
-        .filter(models.GroupChat.user_id == user_id)
-        .order_by(LatestMessageSubquery.c.latest_message_time.desc())
-        .offset(skip)
-        .all()
-    )
-
-    chat_bots = {
-        chat.group_chat_id: [
-            BotGet.model_validate(bot)
-            for bot in db.query(models.Bot)
-            .join(
-                models.GroupChatBots, models.Bot.bot_id == models.GroupChatBots.bot_id
+        await db.execute(
+            select(
+                models.GroupChat,
+                models.Message.message.label("latest_message_content"),
+                models.GroupChat.last_message_time.label("latest_message_time"),
+            )
+            .outerjoin(
+                models.Message,
+                models.Message.message_id == models.GroupChat.last_message,
             )
-            .filter(models.GroupChatBots.group_chat_id == chat.group_chat_id)
-            .all()
-        ]
-        for chat, _, _ in chats
-    }
+            .where(models.GroupChat.user_id == user_id)
+            .order_by(models.GroupChat.last_message_time.desc().nulls_last())
+            .offset(skip)
+            .options(selectinload(models.GroupChat.bots))
+        )
+    ).all()
 
     results = []
     for chat, latest_message_content, latest_message_time in chats:
         chat_data = groupchat.GroupChatGet(
             group_chat_id=chat.group_chat_id,
             group_chat_name=chat.group_chat_name,
-            group_bots=chat_bots[chat.group_chat_id],
+            group_bots=chat.bots,
             group_chat_profile_picture=chat.group_chat_profile_picture,
             privacy=chat.privacy,
             last_message_content=latest_message_content,
@@ -101,31 +133,23 @@ def get_chats(
     description="Get a GroupChat by group_chat_id",
     response_model=groupchat.GroupChatGet,
 )
-def get_chat_by_id(
-    group_chat_id,
-    db: Session = Depends(get_db),
+async def get_chat_by_id(
+    group_chat_id: int,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    chat = (
-        db.query(models.GroupChat)
-        .filter(models.GroupChat.group_chat_id == group_chat_id)
-        .first()
+    chat = await db.get(
+        models.GroupChat,
+        group_chat_id,
+        options=[selectinload(models.GroupChat.bots)],
     )
     if not chat:
         raise HTTPException(status_code=404, detail="GroupChat not found")
 
-    chat_bots = [
-        BotGet.model_validate(bot)
-        for bot in db.query(models.Bot)
-        .join(models.GroupChatBots, models.Bot.bot_id == models.GroupChatBots.bot_id)
-        .filter(models.GroupChatBots.group_chat_id == group_chat_id)
-        .all()
-    ]
-
     response = groupchat.GroupChatGet(
         group_chat_id=chat.group_chat_id,
         group_chat_name=chat.group_chat_name,
-        group_bots=chat_bots,
+        group_bots=chat.bots,
         group_chat_profile_picture=chat.group_chat_profile_picture,
         privacy=chat.privacy,
     )
@@ -138,9 +162,9 @@ def get_chat_by_id(
     description="Create a GroupChat",
     response_model=groupchat.GroupChatGet,
 )
-def create_chat(
+async def create_chat(
     chat_data: groupchat.GroupChatCreate = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
     new_group_chat = models.GroupChat(
@@ -149,8 +173,7 @@ def create_chat(
         privacy=chat_data.privacy,
     )
     db.add(new_group_chat)
-    db.commit()
-    db.refresh(new_group_chat)
+    await db.commit()
 
     if chat_data.group_bots:
         for bot_id in chat_data.group_bots:
@@ -159,46 +182,41 @@ def create_chat(
                     group_chat_id=new_group_chat.group_chat_id, bot_id=bot_id
                 )
             )
-        db.commit()
+        await db.commit()
 
     # Add a bot message to the group chat
     all_bots = (
-        db.query(models.Bot)
-        .join(models.GroupChatBots)
-        .filter(models.GroupChatBots.group_chat_id == new_group_chat.group_chat_id)
-        .all()
-    )
+        await db.scalars(
+            select(models.Bot)
+            .join(models.GroupChatBots)
+            .where(models.GroupChatBots.group_chat_id == new_group_chat.group_chat_id)
+        )
+    ).all()
     random_bot = random.choice(all_bots)
-    text_engine = GroupChatTextEngine(
+    text_engine = get_engine("group_text")(
         message_list=[], all_bots=all_bots, random_bot_name=random_bot.bot_name
     )
-    text_response = text_engine.get_response()
+    text_response = await text_engine.get_response()
     new_bot_message = models.Message(
         group_chat_id=new_group_chat.group_chat_id,
         message=text_response,
         is_bot=True,
         created_by_bot=random_bot.bot_id,
     )
-    db.add(new_bot_message)
-    db.commit()
-
-    new_group_chat.last_message = new_bot_message.message_id
-    db.commit()
+    await add_message(db, new_bot_message)
+    await db.commit()
 
-    new_profile_picture = create_group_profile_picture(
-        [
-            bot.profile_picture
-            for bot in db.query(models.Bot)
-            .join(models.GroupChatBots)
-            .filter(models.GroupChatBots.group_chat_id == new_group_chat.group_chat_id)
-            .limit(4)
-            .all()
-        ]
+    # Downloading and compositing the avatars blocks, keep it off the event loop
+    new_profile_picture = await run_in_threadpool(
+        create_group_profile_picture,
+        [bot.profile_picture for bot in all_bots[:4]],
     )
-    new_profile_picture.save(
-        f"app/api/api_v1/dependency/temp_image/group_chat_{new_group_chat.group_chat_id}.webp"
+    await run_in_threadpool(
+        new_profile_picture.save,
+        f"app/api/api_v1/dependency/temp_image/group_chat_{new_group_chat.group_chat_id}.webp",
     )
-    azure_storage.upload_blob(
+    await run_in_threadpool(
+        azure_storage.upload_blob,
         f"app/api/api_v1/dependency/temp_image/group_chat_{new_group_chat.group_chat_id}.webp",
         "group-chat-images",
         f"{new_group_chat.group_chat_id}.webp",
@@ -207,8 +225,7 @@ def create_chat(
         f"app/api/api_v1/dependency/temp_image/group_chat_{new_group_chat.group_chat_id}.webp"
     )
     new_group_chat.group_chat_profile_picture = f"{settings.azure_db_endpoint}/group-chat-images/{new_group_chat.group_chat_id}.webp"
-    db.commit()
-    db.refresh(new_group_chat)
+    await db.commit()
 
     response = groupchat.GroupChatGet(
         group_chat_id=new_group_chat.group_chat_id,
@@ -225,35 +242,35 @@ def create_chat(
 @router.get(
     "/{group_chat_id}/messages",
     summary="Get all Messages of a GroupChat",
-    description="Get all Messages of a GroupChat by group_chat_id",
-    response_model=List[message.MessageGet],
+    description="Get the Messages of a GroupChat by group_chat_id, newest first. Pass the `next_cursor` of a page as `cursor` to get the next, older page",
+    response_model=Page[message.MessageGet],
 )
-def get_messages(
-    group_chat_id,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+async def get_messages(
+    group_chat_id: int,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
     messages = (
-        db.query(models.Message)
-        .join(
-            models.User,
-            models.Message.created_by_user == models.User.user_id,
-            isouter=True,
-        )
-        .join(
-            models.Bot, models.Message.created_by_bot == models.Bot.bot_id, isouter=True
+        await db.scalars(
+            keyset(
+                select(models.Message).where(
+                    models.Message.group_chat_id == group_chat_id
+                ),
+                models.Message.created_at,
+                models.Message.message_id,
+                cursor,
+                limit,
+            )
         )
-        .filter(models.Message.group_chat_id == group_chat_id)
-        .order_by(models.Message.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    ).all()
 
-    result = [
-        message.MessageGet(
+    return make_page(
+        messages,
+        limit,
+        lambda msg: (msg.created_at, msg.message_id),
+        lambda msg: message.MessageGet(
             message_id=msg.message_id,
             chat_id=None,
             group_chat_id=msg.group_chat_id,
@@ -264,11 +281,8 @@ def get_messages(
             created_by_bot=msg.created_by_bot,
             is_bot=msg.is_bot,
             created_at=msg.created_at,
-        )
-        for msg in messages
-    ]
-
-    return result
+        ),
+    )
 
 
 @router.post(
@@ -278,17 +292,13 @@ def get_messages(
     response_model=message.MessageGet,
     status_code=status.HTTP_201_CREATED,
 )
-def create_message(
-    group_chat_id,
+async def create_message(
+    group_chat_id: int,
     message_obj: message.MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    db_chat = (
-        db.query(models.GroupChat)
-        .filter(models.GroupChat.group_chat_id == group_chat_id)
-        .first()
-    )
+    db_chat = await db.get(models.GroupChat, group_chat_id)
 
     if not db_chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -297,52 +307,18 @@ def create_message(
     new_message_data["group_chat_id"] = group_chat_id
     new_message = models.Message(**new_message_data)
 
-    db.add(new_message)
-    db.commit()
+    await add_message(db, new_message)
+    await db.commit()
 
-    last_chats = (
-        db.query(models.Message)
-        .filter(models.Message.group_chat_id == group_chat_id)
-        .order_by(models.Message.created_at.desc())
-        .limit(6)
-        .all()
-    )
-
-    all_bots = (
-        db.query(models.Bot)
-        .join(models.GroupChatBots)
-        .filter(models.GroupChatBots.group_chat_id == group_chat_id)
-        .all()
-    )
+    all_bots, message_list = await get_group_context(db, group_chat_id)
     random_bot = random.choice(all_bots)
 
-    message_list = []
-    for last_chat in last_chats:
-        if last_chat.is_bot:
-            query_bot = (
-                db.query(models.Bot)
-                .filter(models.Bot.bot_id == last_chat.created_by_bot)
-                .first()
-            )
-            new_message_obj = {
-                "bot_name": query_bot.bot_name,
-                "bot_description": query_bot.description,
-                "message": last_chat.message,
-            }
-        else:
-            new_message_obj = {
-                "bot_name": None,
-                "bot_description": None,
-                "message": last_chat.message,
-            }
-        message_list.append(new_message_obj)
-
-    text_engine = GroupChatTextEngine(
+    text_engine = get_engine("group_text")(
         message_list=message_list,
         all_bots=all_bots,
         random_bot_name=random_bot.bot_name,
     )
-    text_response = text_engine.get_response()
+    text_response = await text_engine.get_response()
 
     new_bot_message = models.Message(
         group_chat_id=group_chat_id,
@@ -351,13 +327,8 @@ def create_message(
         created_by_bot=random_bot.bot_id,
     )
 
-    db.add(new_bot_message)
-    db.commit()
-
-    db_chat.last_message = new_bot_message.message_id
-
-    db.commit()
-    db.refresh(db_chat)
+    await add_message(db, new_bot_message)
+    await db.commit()
     response = message.MessageGet(
         message_id=new_bot_message.message_id,
         chat_id=new_bot_message.chat_id,
@@ -379,17 +350,13 @@ def create_message(
     description="Update a GroupChat by group_chat_id",
     response_model=groupchat.GroupChatGet,
 )
-def update_chat(
+async def update_chat(
     group_chat_id: int,
     chat_data: groupchat.GroupChatUpdate = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    db_group_chat = (
-        db.query(models.GroupChat)
-        .filter(models.GroupChat.group_chat_id == group_chat_id)
-        .first()
-    )
+    db_group_chat = await db.get(models.GroupChat, group_chat_id)
 
     if not db_group_chat:
         raise HTTPException(status_code=404, detail="GroupChat not found")
@@ -398,21 +365,25 @@ def update_chat(
         db_group_chat.group_chat_name = chat_data.group_chat_name
 
     if chat_data.group_bots:
-        db.query(models.GroupChatBots).filter(
-            models.GroupChatBots.group_chat_id == group_chat_id
-        ).delete()
+        await db.execute(
+            delete(models.GroupChatBots).where(
+                models.GroupChatBots.group_chat_id == group_chat_id
+            )
+        )
         for bot_id in chat_data.group_bots:
             db.add(models.GroupChatBots(group_chat_id=group_chat_id, bot_id=bot_id))
 
-    db.commit()
-    db.refresh(db_group_chat)
+    await db.commit()
 
     chat_bots = [
         BotGet.model_validate(bot)
-        for bot in db.query(models.Bot)
-        .join(models.GroupChatBots, models.Bot.bot_id == models.GroupChatBots.bot_id)
-        .filter(models.GroupChatBots.group_chat_id == group_chat_id)
-        .all()
+        for bot in await db.scalars(
+            select(models.Bot)
+            .join(
+                models.GroupChatBots, models.Bot.bot_id == models.GroupChatBots.bot_id
+            )
+            .where(models.GroupChatBots.group_chat_id == group_chat_id)
+        )
     ]
 
     response = groupchat.GroupChatGet(
@@ -431,20 +402,16 @@ def update_chat(
     description="Delete a GroupChat by group_chat_id",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_chat(
-    group_chat_id,
-    db: Session = Depends(get_db),
+async def delete_chat(
+    group_chat_id: int,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
-    chat = (
-        db.query(models.GroupChat)
-        .filter(models.GroupChat.group_chat_id == group_chat_id)
-        .first()
-    )
+    chat = await db.get(models.GroupChat, group_chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="GroupChat not found")
-    db.delete(chat)
-    db.commit()
+    await db.delete(chat)
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -457,7 +424,7 @@ def delete_chat(
 async def process_audio(
     group_chat_id: int,
     voice_chat: groupchat.VoiceGroupChat = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
     try:
@@ -470,52 +437,18 @@ async def process_audio(
             is_bot=False,
         )
 
-        db.add(new_message)
-        db.commit()
+        await add_message(db, new_message)
+        await db.commit()
 
-        all_bots = (
-            db.query(models.Bot)
-            .join(models.GroupChatBots)
-            .filter(models.GroupChatBots.group_chat_id == group_chat_id)
-            .all()
-        )
+        all_bots, message_list = await get_group_context(db, group_chat_id)
         random_bot = random.choice(all_bots)
 
-        last_chats = (
-            db.query(models.Message)
-            .filter(models.Message.group_chat_id == group_chat_id)
-            .order_by(models.Message.created_at.desc())
-            .limit(6)
-            .all()
-        )
-
-        message_list = []
-        for last_chat in last_chats:
-            if last_chat.is_bot:
-                query_bot = (
-                    db.query(models.Bot)
-                    .filter(models.Bot.bot_id == last_chat.created_by_bot)
-                    .first()
-                )
-                new_message_obj = {
-                    "bot_name": query_bot.bot_name,
-                    "bot_description": query_bot.description,
-                    "message": last_chat.message,
-                }
-            else:
-                new_message_obj = {
-                    "bot_name": None,
-                    "bot_description": None,
-                    "message": last_chat.message,
-                }
-            message_list.append(new_message_obj)
-
-        text_engine = GroupChatTextEngine(
+        text_engine = get_engine("group_text")(
             message_list=message_list,
             all_bots=all_bots,
             random_bot_name=random_bot.bot_name,
         )
-        text_response = text_engine.get_response()
+        text_response = await text_engine.get_response()
 
         new_bot_message = models.Message(
             group_chat_id=group_chat_id,
@@ -524,18 +457,14 @@ async def process_audio(
             created_by_bot=random_bot.bot_id,
         )
 
-        db.add(new_bot_message)
-        db.commit()
+        await add_message(db, new_bot_message)
+        await db.commit()
 
-        voice = (
-            db.query(models.Voice)
-            .join(models.Bot, models.Bot.voice_id == models.Voice.voice_id)
-            .filter(models.Bot.bot_id == random_bot.bot_id)
-            .first()
-        )
+        voice = await db.get(models.Voice, random_bot.voice_id)
 
-        voice_service = VoiceEngine(text_response, voice, new_bot_message.message_id)
-        output_audio = voice_service.get_audio_response()
+        output_audio = await synthesize_reply(
+            voice, text_response, new_bot_message.message_id
+        )
 
         return {
             "audio": output_audio,
@@ -1,20 +1,20 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
+from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from PIL import Image
-import io
 import os
 import uuid
 
 from sqlalchemy import func
 from app import models
 from app.schemas import user, bot
+from app.schemas.page import Page
 from app.database import get_db
 import app.utils as utils
 from app.config import settings
 from app.auth import get_current_user
 from app.api.api_v1.engines.storage.azure import azure_storage
-from app.api.api_v1.dependency.utils import decode_base64
+from app.api.api_v1.dependency.utils import decode_base64, save_webp
+from app.api.api_v1.dependency.pagination import keyset, make_page
 
 router = APIRouter(prefix="/user", tags=["User"])
 
@@ -57,6 +57,28 @@ def check_user_exists(
     return user is not None
 
 
+@router.get(
+    "/created_bots",
+    summary="Get all bots created by users",
+    description="Get all bots created by users by user_id, newest first. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[bot.BotGet],
+)
+def get_created_bots(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_current_user),
+):
+    bots = keyset(
+        db.query(models.Bot).filter(models.Bot.created_by == user_id),
+        models.Bot.created_at,
+        models.Bot.bot_id,
+        cursor,
+        limit,
+    ).all()
+    return make_page(bots, limit, lambda bot: (bot.created_at, bot.bot_id))
+
+
 @router.get(
     "/{id}",
     summary="Get user information",
@@ -110,8 +132,7 @@ def update_user(
         image_path = f"app/api/api_v1/dependency/temp_img_{user_id}.webp"
         image_url = user_update.profile_picture
         image_data = decode_base64(image_url)
-        image = Image.open(io.BytesIO(image_data))
-        image.save(image_path, "WEBP")
+        save_webp(image_data, image_path)
 
         image_upload = f"{user_id}.webp"
 
@@ -169,19 +190,6 @@ def check_username(
     return user is not None
 
 
-@router.get(
-    "/created_bots",
-    summary="Get all bots created by users",
-    description="Get all bots created by users by user_id",
-    response_model=bot.BotGet,
-)
-def get_created_bots(
-    db: Session = Depends(get_db), user_id: Optional[str] = Depends(get_current_user)
-):
-    bots = db.query(models.Bot).filter(models.Bot.created_by == user_id).all()
-    return bots
-
-
 @router.post(
     "/feedback_report",
     summary="Send feedback or report",
@@ -200,8 +208,7 @@ def send_fr(
             image_path = f"app/api/api_v1/dependency/temp_img_rf_{temporary_id}.webp"
             image_url = FeedbackReportObj.pictures[i]
             image_data = decode_base64(image_url)
-            image = Image.open(io.BytesIO(image_data))
-            image.save(image_path, "WEBP")
+            save_webp(image_data, image_path)
 
             image_upload = f"{temporary_id}.webp"
 
@@ -1,12 +1,15 @@
-from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter
+from fastapi import FastAPI, Response, status, HTTPException, Depends, APIRouter, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from sqlalchemy import func
 from app import models
 from app.schemas import voice
+from app.schemas.page import Page
 from app.database import get_db
 from app.auth import get_current_user
+from app.api.api_v1.dependency.pagination import keyset, make_page
+from app.api.api_v1.dependency.search import build_tsquery, search_condition
 
 router = APIRouter(prefix="/voice", tags=["Voice"])
 
@@ -14,23 +17,45 @@ router = APIRouter(prefix="/voice", tags=["Voice"])
 @router.get(
     "/",
     summary="Get all voices",
-    description="Get all voices",
-    response_model=List[voice.VoiceGet],
+    description="Get all voices, newest first, or the voices matching `search` by name, description, style and gender, best matches first. Pass the `next_cursor` of a page as `cursor` to get the next page",
+    response_model=Page[voice.VoiceGet],
 )
 def get_voice(
-    skip: int = 0,
-    limit: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     search: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
-    query = db.query(models.Voice)
-
-    if search:
-        query = query.filter(models.Voice.voice_name.contains(search))
+    if not search:
+        voices = keyset(
+            db.query(models.Voice),
+            models.Voice.created_at,
+            models.Voice.voice_id,
+            cursor,
+            limit,
+        ).all()
+        return make_page(
+            voices, limit, lambda voice: (voice.created_at, voice.voice_id)
+        )
 
-    voice = query.offset(skip).limit(limit).all()
-    return voice
+    if build_tsquery(search) is None:
+        return Page(items=[])
+
+    condition, rank = search_condition(
+        models.Voice.search_vector, models.Voice.voice_name, search
+    )
+    rank = rank.label("rank")
+    rows = keyset(
+        db.query(models.Voice, rank).filter(condition),
+        rank,
+        models.Voice.voice_id,
+        cursor,
+        limit,
+    ).all()
+    return make_page(
+        rows, limit, lambda row: (row.rank, row.Voice.voice_id), lambda row: row.Voice
+    )
 
 
 @router.get(
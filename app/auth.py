@@ -1,6 +1,11 @@
-import firebase_admin
-from firebase_admin import credentials, auth
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
+import requests
+from google.auth import jwt
 from fastapi import Depends, HTTPException, status, Header
 from app.config import settings
 
@@ -18,8 +23,154 @@ fb_credentials = {
     "universe_domain": settings.fb_universe_domain,
 }
 
-cred = credentials.Certificate(fb_credentials)
-default_app = firebase_admin.initialize_app(cred)
+firebase_app = None
+firebase_lock = threading.Lock()
+
+
+def get_firebase_app():
+    # The Admin SDK is only needed when the signing keys are not loaded yet,
+    # so it is initialized on first use instead of at import
+    global firebase_app
+    with firebase_lock:
+        if firebase_app is None:
+            import firebase_admin
+            from firebase_admin import credentials
+
+            firebase_app = firebase_admin.initialize_app(
+                credentials.Certificate(fb_credentials)
+            )
+    return firebase_app
+
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER = f"https://securetoken.google.com/{settings.fb_project_id}"
+
+
+class TokenCache:
+    """Bounded LRU cache of verified ID tokens.
+
+    Entries are keyed by the SHA-256 of the token, so raw tokens are never
+    kept in memory, and expire at the token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self.get_key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            uid, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return uid
+
+    def set(self, token: str, uid: str, expires_at: float):
+        key = self.get_key(token)
+        with self.lock:
+            self.entries[key] = (uid, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class PublicKeyStore:
+    """Google's token signing certificates, refreshed by a background thread.
+
+    The certificates are re-fetched a few minutes before the max-age Google
+    sends with them runs out, so verification never waits on the network.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.certs = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.refresh_thread = None
+
+    def refresh(self):
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        with self.lock:
+            self.certs = response.json()
+            self.expires_at = time.time() + (int(max_age.group(1)) if max_age else 3600)
+
+    def refresh_forever(self):
+        while True:
+            try:
+                self.refresh()
+                delay = max(60, self.expires_at - time.time() - 300)
+            except Exception as e:
+                print(f"Refreshing Google public keys failed: {e}")
+                delay = 30
+            time.sleep(delay)
+
+    def start(self):
+        with self.lock:
+            if self.refresh_thread is not None:
+                return
+            self.refresh_thread = threading.Thread(
+                target=self.refresh_forever, name="public-key-refresh", daemon=True
+            )
+        self.refresh_thread.start()
+
+    def get_certs(self) -> Optional[dict]:
+        self.start()
+        with self.lock:
+            if self.certs is not None and self.expires_at > time.time():
+                return self.certs
+        return None
+
+
+token_cache = TokenCache(max_size=settings.auth_token_cache_size)
+public_keys = PublicKeyStore(GOOGLE_CERTS_URL)
+
+
+def verify_token(token: str) -> dict:
+    certs = public_keys.get_certs()
+    if certs is not None and jwt.decode_header(token).get("kid") not in certs:
+        # Signed with a key published after the last refresh
+        certs = None
+    if certs is None:
+        # Keys are not loaded yet (cold start), went stale or lack the kid
+        from firebase_admin import auth
+
+        decoded_token = auth.verify_id_token(token, app=get_firebase_app())
+    else:
+        decoded_token = jwt.decode(token, certs=certs, audience=settings.fb_project_id)
+        if decoded_token.get("iss") != FIREBASE_ISSUER or not decoded_token.get("sub"):
+            raise ValueError("Invalid token issuer or subject")
+        decoded_token["uid"] = decoded_token["sub"]
+    return decoded_token
 
 
 def get_current_user(authorization: Optional[str] = Header(None)):
@@ -28,10 +179,24 @@ def get_current_user(authorization: Optional[str] = Header(None)):
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
         )
     token = authorization.split("Bearer ")[1]
+
+    uid = token_cache.get(token)
+    if uid is not None:
+        return uid
+
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token["uid"]
+        decoded_token = verify_token(token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
+    token_cache.set(token, decoded_token["uid"], decoded_token["exp"])
+    return decoded_token["uid"]
+
+
+def get_current_admin(current_user: str = Depends(get_current_user)):
+    if current_user != settings.admin_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return current_user
@@ -9,6 +9,18 @@ class Settings(BaseSettings):
     database_name: str
     database_username: str
 
+    # Connection pool, per engine and per worker process
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # Database readiness checks at startup, with exponential backoff
+    db_startup_attempts: int = 5
+    db_startup_backoff: float = 0.5
+    db_startup_max_backoff: float = 5
+
     API_VERSION: str = "/api/v1"
 
     developer_email: str
@@ -16,6 +28,40 @@ class Settings(BaseSettings):
 
     admin_id: str
 
+    # Seconds between reloads of the in-memory blocked IP list
+    block_ip_refresh_interval: float = 60
+
+    # Seconds between refreshes of the ids behind the shuffled explore listings
+    explore_shuffle_interval: float = 600
+
+    # Ranked explore feeds: seconds between rebuilds, bots kept per feed, and
+    # how fast trending activity fades and how much a like counts vs a message
+    explore_feed_refresh_interval: float = 300
+    explore_feed_size: int = 1000
+    trending_half_life_hours: float = 24
+    trending_like_weight: float = 5
+
+    # Seconds between folds of pending bot counter deltas, and between
+    # reconciliations of the counters with their source tables
+    counter_flush_interval: float = 5
+    counter_reconcile_interval: float = 3600
+
+    # Sentences of a pipelined voice reply synthesized at the same time
+    tts_pipeline_concurrency: int = 3
+
+    # Shared TTS cache: entries kept in memory, and the longest reply that is
+    # cached once it repeats (longer replies are unlikely to). Entries in memory are
+    # checked against the table again after tts_cache_memory_ttl seconds,
+    # entries not hit for tts_cache_retention_days are purged with their audio
+    tts_cache_size: int = 10000
+    tts_cache_max_chars: int = 200
+    tts_cache_memory_ttl: float = 3600
+    tts_cache_retention_days: float = 30
+    tts_cache_purge_interval: float = 3600
+
+    # Azure speech synthesizers kept open per worker, across all voices
+    azure_synthesizer_pool_size: int = 8
+
     # Firebase credentials
     fb_type: str
     fb_project_id: str
@@ -29,6 +75,9 @@ class Settings(BaseSettings):
     fb_client_x509_cert_url: str
     fb_universe_domain: str
 
+    # Maximum number of verified ID tokens kept in memory
+    auth_token_cache_size: int = 10000
+
     # Azure credentials
     speech_key: str
     speech_region: str
@@ -50,6 +99,20 @@ class Settings(BaseSettings):
     together_api_key: str
     google_api_key: str
 
+    # Text provider routing
+    text_provider_timeout: float = 20
+    text_provider_hedging: bool = False
+    text_provider_hedge_delay: float = 3
+
+    # Outbound provider calls (text, voice and image)
+    provider_max_concurrency: int = 16
+    provider_queue_timeout: float = 10
+    provider_connect_timeout: float = 5
+    provider_read_timeout: float = 30
+    breaker_error_rate: float = 0.5
+    breaker_min_calls: int = 10
+    breaker_reset_timeout: float = 30
+
     class Config:
         env_file = ".env"
 
@@ -96,5 +159,17 @@ class ServerConfig:
         TEXT_PROVIDER = configs.TEXT_PROVIDER_3
         IMAGE_ENDPOINT_NAME = configs.IMAGE_ENDPOINT_NAME_2
 
+    # The server's own provider is tried first, the others are fallbacks
+    TEXT_PROVIDERS = list(
+        dict.fromkeys(
+            [
+                TEXT_PROVIDER,
+                configs.TEXT_PROVIDER_3,
+                configs.TEXT_PROVIDER_2,
+                configs.TEXT_PROVIDER_1,
+            ]
+        )
+    )
+
 
 server_config = ServerConfig()
@@ -1,42 +1,122 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
 import time
+from collections import deque
 
 from app.config import settings
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+pool_options = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **pool_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 
+class PoolMetrics:
+    """Connection checkout latency and saturation of one engine's pool."""
+
+    def __init__(self, pool, window: int = 1000):
+        self.pool = pool
+        self.latencies = deque(maxlen=window)
+        self.checkouts = 0
+        self.lock = threading.Lock()
+
+    def record_checkout(self, latency: float):
+        with self.lock:
+            self.latencies.append(latency)
+            self.checkouts += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            checkouts = self.checkouts
+        capacity = self.pool.size() + settings.db_max_overflow
+        checked_out = self.pool.checkedout()
+        return {
+            "pool_size": self.pool.size(),
+            "max_overflow": settings.db_max_overflow,
+            "checked_out": checked_out,
+            "overflow": self.pool.overflow(),
+            "saturation": checked_out / capacity if capacity else None,
+            "checkouts": checkouts,
+            "checkout_latency_p50": (
+                latencies[len(latencies) // 2] if latencies else None
+            ),
+            "checkout_latency_p99": (
+                latencies[int(0.99 * (len(latencies) - 1))] if latencies else None
+            ),
+            "checkout_latency_max": latencies[-1] if latencies else None,
+        }
+
+
+pool_metrics = PoolMetrics(engine.pool)
+async_pool_metrics = PoolMetrics(async_engine.pool)
+
+
 def get_db():
     db = SessionLocal()
     try:
+        start = time.perf_counter()
+        db.connection()
+        pool_metrics.record_checkout(time.perf_counter() - start)
         yield db
     finally:
         db.close()
 
 
-while True:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        await db.connection()
+        async_pool_metrics.record_checkout(time.perf_counter() - start)
+        yield db
+
+
+async def ping_database():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def check_database(timeout: float = 2) -> bool:
     try:
-        conn = psycopg2.connect(
-            host=settings.database_hostname,
-            database=settings.database_name,
-            user=settings.database_username,
-            password=settings.database_password,
-            cursor_factory=RealDictCursor,
-        )
-        cursor = conn.cursor()
-        print("Database connection was succesfull!")
-        break
+        await asyncio.wait_for(ping_database(), timeout=timeout)
+        return True
     except Exception as error:
-        print("Connecting to database failed")
-        print("Error: ", error)
-        time.sleep(2)
+        print(f"Database check failed: {error!r}")
+        return False
+
+
+async def wait_for_database(attempts: int, backoff: float, max_backoff: float) -> bool:
+    """Checks the database up to `attempts` times with exponential backoff."""
+    delay = backoff
+    for attempt in range(1, attempts + 1):
+        if await check_database():
+            return True
+        if attempt < attempts:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_backoff)
+    return False
+
+
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
@@ -1,19 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from . import models
-from .database import engine
+from .database import check_database, dispose_engines, wait_for_database
 from app.api.api_v1.api import api_router
+from app.auth import public_keys
 from app.config import settings, server_config
-from app.middleware import BlockIPMiddleware
+from app.middleware import BlockIPMiddleware, blocked_ips
+from app.api.api_v1.engines.text.clients import close_clients
+from app.api.api_v1.engines.voice.clients import close_speech_client
+from app.api.api_v1.engines.voice.pool import synthesizer_pool
+from app.api.api_v1.dependency.counters import fold_forever, reconcile_forever
+from app.api.api_v1.dependency.tts_cache import tts_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is managed by alembic, startup only waits (boundedly) for
+    # the database so a worker never hangs when it is unreachable
+    app.state.ready = await wait_for_database(
+        attempts=settings.db_startup_attempts,
+        backoff=settings.db_startup_backoff,
+        max_backoff=settings.db_startup_max_backoff,
+    )
+    if not app.state.ready:
+        print("Database is not reachable, starting as not ready")
+    public_keys.start()
+    # Loaded before the first request, see BlockIPList
+    await blocked_ips.start(settings.block_ip_refresh_interval)
+    fold_task = asyncio.ensure_future(fold_forever(settings.counter_flush_interval))
+    reconcile_task = asyncio.ensure_future(
+        reconcile_forever(settings.counter_reconcile_interval)
+    )
+    purge_task = asyncio.ensure_future(
+        tts_cache.purge_forever(
+            settings.tts_cache_purge_interval,
+            timedelta(days=settings.tts_cache_retention_days),
+        )
+    )
+
+    yield
+
+    fold_task.cancel()
+    reconcile_task.cancel()
+    purge_task.cancel()
+    blocked_ips.stop()
+    await close_clients()
+    await close_speech_client()
+    synthesizer_pool.close()
+    await dispose_engines()
 
-models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Talk To Listen",
-    version="1.0.0",
+    version="2.0.0",
     description="Talk To Listen API Documentation. Only for showcase purpose.",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 origins = ["*"]
@@ -34,4 +80,20 @@ def talk_to_listen():
     return {"message": f"Talk To Listen BackEnd. Server: {server_config.server}"}
 
 
+@app.get("/health/live", include_in_schema=False)
+def liveness():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    app.state.ready = await check_database() and blocked_ips.loaded
+    if not app.state.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "not ready"},
+        )
+    return {"status": "ready"}
+
+
 app.include_router(api_router, prefix=settings.API_VERSION)
@@ -1,9 +1,12 @@
-from fastapi import Request, status, Depends
-from starlette.middleware.base import BaseHTTPMiddleware
+import asyncio
+import ipaddress
+from typing import Iterable
+from fastapi import status
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
-from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketClose
 from app.models import BlockIP
-from app.database import get_db
+from app.database import SessionLocal
 from app.config import settings
 
 allowed_paths = [
@@ -14,24 +17,122 @@ allowed_paths = [
     "/favicon.ico",
     "/robots.txt",
     "/sitemap.xml",
+    "/health/live",
+    "/health/ready",
 ]
 
 
-class BlockIPMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        db = next(get_db())
+class BlockIPList:
+    """In-memory copy of the block_ips table.
+
+    Entries may be single addresses or CIDR ranges. Lookups never touch the
+    database; the sets are rebuilt by reload() and swapped in atomically.
+
+    The list fails open: until the first load succeeds nothing is blocked,
+    and a failed reload keeps the previous list. Blocking is abuse
+    mitigation rather than access control, and every route past it needs
+    the database anyway, so an outage should not also turn away every
+    client. start() runs the first load in lifespan, before requests are
+    served, and the readiness probe stays down until it succeeded.
+    """
+
+    def __init__(self):
+        self.addresses = frozenset()
+        self.networks = ()
+        self.loaded = False
+        self.refresh_task = None
+
+    def is_blocked(self, ip: str) -> bool:
+        if ip in self.addresses:
+            return True
+        if not self.networks:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+
+    def set_entries(self, entries: Iterable[str]):
+        addresses = set()
+        networks = []
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry.strip(), strict=False)
+            except ValueError:
+                print(f"Skipping invalid blocked IP entry: {entry}")
+                continue
+            if network.num_addresses == 1:
+                addresses.add(str(network.network_address))
+            else:
+                networks.append(network)
+
+        self.addresses, self.networks = frozenset(addresses), tuple(networks)
+        self.loaded = True
+
+    def load(self) -> int:
+        db = SessionLocal()
+        try:
+            entries = [entry for (entry,) in db.query(BlockIP.ip).all()]
+        finally:
+            db.close()
+
+        self.set_entries(entries)
+        return len(entries)
+
+    async def reload(self) -> int:
+        return await run_in_threadpool(self.load)
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            # Retry sooner while the list was never loaded
+            await asyncio.sleep(interval if self.loaded else min(interval, 5))
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"Refreshing blocked IPs failed: {e}")
+
+    async def start(self, interval: float):
+        if self.refresh_task is not None:
+            return
         try:
-            blocked_ip = db.query(BlockIP).filter(BlockIP.ip == client_ip).first()
-            if blocked_ip or not (
-                request.url.path in allowed_paths
-                or request.url.path.startswith(settings.API_VERSION)
-            ):
-                return JSONResponse(
+            await self.reload()
+        except Exception as e:
+            print(f"Loading blocked IPs failed: {e}")
+        self.refresh_task = asyncio.ensure_future(self.refresh_forever(interval))
+
+    def stop(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+
+
+blocked_ips = BlockIPList()
+
+
+class BlockIPMiddleware:
+    def __init__(self, app, block_list: BlockIPList = blocked_ips):
+        self.app = app
+        self.block_list = block_list
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        path = scope["path"]
+        if (client and self.block_list.is_blocked(client[0])) or not (
+            path in allowed_paths or path.startswith(settings.API_VERSION)
+        ):
+            if scope["type"] == "websocket":
+                response = WebSocketClose(code=1008)
+            else:
+                response = JSONResponse(
                     status_code=status.HTTP_403_FORBIDDEN,
                     content={"message": "Access denied"},
                 )
-        finally:
-            db.close()
+            await response(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
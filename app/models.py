@@ -1,5 +1,6 @@
 from sqlalchemy.schema import Column
 from sqlalchemy import (
+    BigInteger,
     Integer,
     String,
     Boolean,
@@ -7,9 +8,11 @@ from sqlalchemy import (
     text,
     Table,
     CheckConstraint,
+    Computed,
+    Index,
 )
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql.sqltypes import TIMESTAMP, Date
 from .database import Base
 
@@ -25,6 +28,12 @@ user_likes_bots = Table(
         server_default=text("now()"),
     ),
 )
+Index(
+    "ix_user_likes_bots_user_id_created_at",
+    user_likes_bots.c.user_id,
+    user_likes_bots.c.created_at.desc(),
+    user_likes_bots.c.bot_id.desc(),
+)
 
 
 class User(Base):
@@ -77,6 +86,31 @@ class Bot(Base):
     liked_by_users = relationship(
         "User", secondary=user_likes_bots, back_populates="liked_bots"
     )
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple'::regconfig, coalesce(bot_name, '')), 'A') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(short_description, '')), 'B') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(category, '')), 'C') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'D')",
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        Index("ix_bots_privacy_category", privacy, category),
+        Index("ix_bots_created_by", created_by),
+        Index("ix_bots_created_at", created_at.desc(), bot_id.desc()),
+        Index("ix_bots_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_bots_bot_name_trgm",
+            bot_name,
+            postgresql_using="gin",
+            postgresql_ops={"bot_name": "gin_trgm_ops"},
+        ),
+    )
 
 
 class Voice(Base):
@@ -99,6 +133,30 @@ class Voice(Base):
         String, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False
     )
     sample_url = Column(String, nullable=False)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple'::regconfig, coalesce(voice_name, '')), 'A') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(voice_description, '')), 'B') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(style, '')), 'C') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(gender, '')), 'C')",
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        Index("ix_voices_created_by", created_by),
+        Index("ix_voices_created_at", created_at.desc(), voice_id.desc()),
+        Index("ix_voices_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_voices_voice_name_trgm",
+            voice_name,
+            postgresql_using="gin",
+            postgresql_ops={"voice_name": "gin_trgm_ops"},
+        ),
+    )
 
 
 class Message(Base):
@@ -127,11 +185,29 @@ class Message(Base):
     )
     is_bot = Column(Boolean, nullable=False, server_default="false")
 
+    # Fetch created_at in the INSERT's RETURNING clause, it is copied to the
+    # chat's last_message_time right after the flush
+    __mapper_args__ = {"eager_defaults": True}
+
     __table_args__ = (
         CheckConstraint(
             "(chat_id IS NOT NULL AND group_chat_id IS NULL) OR (chat_id IS NULL AND group_chat_id IS NOT NULL)",
             name="chat_id_xor_group_chat_id",
         ),
+        # Message history is always read per chat, newest first
+        Index(
+            "ix_messages_chat_id_created_at",
+            chat_id,
+            created_at.desc(),
+            message_id.desc(),
+        ),
+        Index(
+            "ix_messages_group_chat_id_created_at",
+            group_chat_id,
+            created_at.desc(),
+            message_id.desc(),
+        ),
+        Index("ix_messages_created_at_brin", created_at, postgresql_using="brin"),
     )
 
 
@@ -162,8 +238,11 @@ class Chat(Base):
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
     last_message = Column(
-        Integer, ForeignKey("messages.message_id", ondelete="CASCADE"), nullable=True
+        Integer, ForeignKey("messages.message_id", ondelete="SET NULL"), nullable=True
     )
+    last_message_time = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_chats_user_id", user_id),)
 
 
 class GroupChat(Base):
@@ -181,8 +260,13 @@ class GroupChat(Base):
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
     last_message = Column(
-        Integer, ForeignKey("messages.message_id", ondelete="CASCADE"), nullable=True
+        Integer, ForeignKey("messages.message_id", ondelete="SET NULL"), nullable=True
     )
+    last_message_time = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Read side only, membership is written through GroupChatBots
+    bots = relationship("Bot", secondary="group_chat_bots", viewonly=True)
+
+    __table_args__ = (Index("ix_group_chats_user_id", user_id),)
 
 
 class GroupChatBots(Base):
@@ -222,3 +306,40 @@ class BlockIP(Base):
     created_at = Column(
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
+
+
+class BotCounterDelta(Base):
+    __tablename__ = "bot_counter_deltas"
+    # Pending changes to Bot.num_chats, written in the transaction of the
+    # message they count and folded into bots in batches, see counters.py
+    delta_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    bot_id = Column(
+        Integer, ForeignKey("bots.bot_id", ondelete="CASCADE"), nullable=False
+    )
+    num_chats = Column(Integer, nullable=False)
+
+
+class TtsCacheEntry(Base):
+    __tablename__ = "tts_cache"
+    # sha256 of the voice settings and normalized text, see dependency/tts_cache.py
+    cache_key = Column(String(64), primary_key=True, nullable=False)
+    # NULL while the text was only seen once, see TtsCache
+    audio_url = Column(String, nullable=True)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+    last_hit_at = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=text("now()"),
+        index=True,
+    )
+
+
+class ExploreFeedSnapshot(Base):
+    __tablename__ = "explore_feed_snapshots"
+    # One ranked explore feed as built by one refresh, shared by every
+    # worker so cursors page through the same order, see ranking.py
+    version = Column(BigInteger, primary_key=True)
+    feed = Column(String, primary_key=True)
+    bot_ids = Column(ARRAY(Integer), nullable=False)
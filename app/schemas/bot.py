@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 from pydantic.types import conint
 
@@ -66,3 +66,7 @@ class ImagePrompt(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class LikeState(BaseModel):
+    liked_bot_ids: List[int]
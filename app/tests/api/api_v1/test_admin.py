@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.tests.utils.bot import create_random_bot
+
+
+@pytest.fixture(scope="module")
+def current_user() -> str:
+    return settings.admin_id
+
+
+def test_get_provider_status(client: TestClient) -> None:
+    response = client.get(f"{settings.API_VERSION}/admin/providers")
+    content = response.json()
+    assert response.status_code == 200
+    assert "guards" in content, f"'guards' is not in response"
+    assert "text_router" in content, f"'text_router' is not in response"
+    for provider in content["text_router"].values():
+        assert "p95_latency" in provider
+
+
+def test_reload_block_ips(client: TestClient) -> None:
+    response = client.post(f"{settings.API_VERSION}/admin/block_ips/reload")
+    assert response.status_code == 200
+    assert "blocked_entries" in response.json()
+
+
+def test_reload_explore(client: TestClient) -> None:
+    response = client.post(f"{settings.API_VERSION}/admin/explore/reload")
+    assert response.status_code == 200
+    assert "bots" in response.json()
+    assert "group_chats" in response.json()
+    assert "feeds" in response.json()
+
+
+def test_get_auth_cache_status(client: TestClient) -> None:
+    response = client.get(f"{settings.API_VERSION}/admin/auth_cache")
+    content = response.json()
+    assert response.status_code == 200
+    for counter in ("size", "hits", "misses", "evictions"):
+        assert counter in content, f"'{counter}' is not in response"
+
+
+def test_get_tts_cache_status(client: TestClient) -> None:
+    response = client.get(f"{settings.API_VERSION}/admin/tts_cache")
+    content = response.json()
+    assert response.status_code == 200
+    for counter in ("size", "hits", "misses", "evictions"):
+        assert counter in content, f"'{counter}' is not in response"
+
+
+def test_get_speech_pool_status(client: TestClient) -> None:
+    response = client.get(f"{settings.API_VERSION}/admin/speech_pool")
+    content = response.json()
+    assert response.status_code == 200
+    for counter in ("size", "in_use", "idle", "wait_p99"):
+        assert counter in content, f"'{counter}' is not in response"
+
+
+def test_get_db_pool_status(client: TestClient) -> None:
+    response = client.get(f"{settings.API_VERSION}/admin/db_pool")
+    content = response.json()
+    assert response.status_code == 200
+    for pool in ("sync", "async"):
+        assert pool in content, f"'{pool}' is not in response"
+        assert "saturation" in content[pool]
+        assert "checkout_latency_p99" in content[pool]
+
+
+def test_reconcile_bot_counters(client: TestClient, db: Session) -> None:
+    bot = create_random_bot(db)
+    bot.likes = 7
+    bot.num_chats = 9
+    db.commit()
+
+    response = client.post(f"{settings.API_VERSION}/admin/counters/reconcile")
+    assert response.status_code == 200
+    db.refresh(bot)
+    assert bot.likes == 0
+    assert bot.num_chats == 0
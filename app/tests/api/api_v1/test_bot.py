@@ -1,10 +1,19 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.api.api_v1.engines import loaded_engines
 from app.tests.utils.user import create_random_user
 from app.tests.utils.bot import create_random_bot
 from app.tests.utils.voice import create_random_voice
+from app.models import TtsCacheEntry, User, Voice
+from app.tests.utils.utils import random_lower_string
+from app.api.api_v1.dependency.counters import fold_counters, reconcile_counters
+from app.api.api_v1.dependency.tts_cache import synthesize_reply, tts_cache
 
 
 def test_create_bot(client: TestClient, db: Session) -> None:
@@ -159,3 +168,198 @@ def test_delete_bot(client: TestClient, db: Session) -> None:
     )
 
     assert response.status_code == 204
+
+
+def test_like_and_unlike_update_likes(
+    client: TestClient, db: Session, current_user: str
+) -> None:
+    if db.get(User, current_user) is None:
+        create_random_user(db, user_id=current_user)
+    bot = create_random_bot(db)
+    other = create_random_bot(db)
+
+    for _ in range(2):
+        response = client.post(f"{settings.API_VERSION}/bot/like/{bot.bot_id}")
+        assert response.status_code == 200
+    db.refresh(bot)
+    assert bot.likes == 1
+
+    response = client.get(
+        f"{settings.API_VERSION}/bot/like_state",
+        params={"bot_ids": [bot.bot_id, other.bot_id]},
+    )
+    assert response.status_code == 200
+    assert response.json()["liked_bot_ids"] == [bot.bot_id]
+
+    for _ in range(2):
+        response = client.delete(f"{settings.API_VERSION}/bot/unlike/{bot.bot_id}")
+        assert response.status_code == 200
+    db.refresh(bot)
+    assert bot.likes == 0
+
+    response = client.post(f"{settings.API_VERSION}/bot/like/0")
+    assert response.status_code == 404
+
+
+class FakeTextEngine:
+    def __init__(self, message_lists, bot_name, description):
+        pass
+
+    async def get_response(self):
+        return "A reply."
+
+
+def test_chat_count_is_stable_across_folds_and_reconciles(
+    client: TestClient, db: Session, current_user: str, monkeypatch
+) -> None:
+    monkeypatch.setitem(loaded_engines, "text", FakeTextEngine)
+    if db.get(User, current_user) is None:
+        create_random_user(db, user_id=current_user)
+    bot = create_random_bot(db)
+
+    def num_chats_after(*steps):
+        for step in steps:
+            client.portal.call(step)
+        db.refresh(bot)
+        return bot.num_chats
+
+    # The greeting counts as the first bot message of the chat
+    response = client.post(
+        f"{settings.API_VERSION}/chat/",
+        json={"user_id": current_user, "bot_id1": bot.bot_id},
+    )
+    chat_id = response.json()["chat_id"]
+    assert num_chats_after(fold_counters) == 1
+    assert num_chats_after(reconcile_counters, fold_counters) == 1
+
+    # A reconcile with a delta still pending must not count the reply twice
+    response = client.post(
+        f"{settings.API_VERSION}/chat/{chat_id}/message",
+        json={"message": "Hi", "created_by_user": current_user, "is_bot": False},
+    )
+    assert response.status_code == 201
+    assert num_chats_after(reconcile_counters) == 2
+    assert num_chats_after(fold_counters) == 2
+
+    response = client.delete(f"{settings.API_VERSION}/chat/{chat_id}")
+    assert response.status_code == 204
+    assert num_chats_after(fold_counters) == 0
+    assert num_chats_after(reconcile_counters, fold_counters) == 0
+
+
+class FakeVoiceEngine:
+    synthesized = []
+    deleted = []
+
+    def __init__(self, text, voiceObject, message_id=None):
+        self.text = text
+        self.message_id = message_id
+
+    async def get_audio(self):
+        FakeVoiceEngine.synthesized.append(self.text)
+        return self.text.encode()
+
+    async def get_audio_response(self):
+        await self.get_audio()
+        return self.get_audio_url(self.message_id)
+
+    @staticmethod
+    def get_audio_url(name):
+        return f"audio/{name}.mp3"
+
+    @staticmethod
+    def upload_message_audio(name, data, overwrite=False):
+        return True
+
+    @staticmethod
+    def delete_message_audio(name):
+        FakeVoiceEngine.deleted.append(name)
+        return True
+
+
+@pytest.fixture
+def voice_engine(monkeypatch):
+    monkeypatch.setitem(loaded_engines, "voice", FakeVoiceEngine)
+
+
+def test_greeting_audio_is_synthesized_once(
+    client: TestClient, db: Session, voice_engine
+) -> None:
+    bot = create_random_bot(db)
+    bot.greeting = f"Hello,   I am {bot.bot_name}. "
+    db.commit()
+
+    urls = []
+    for _ in range(3):
+        response = client.get(f"{settings.API_VERSION}/bot/{bot.bot_id}/greeting_audio")
+        assert response.status_code == 200
+        urls.append(response.json()["audio_url"])
+
+    assert urls[0].startswith("audio/cache/")
+    assert urls[0] == urls[1] == urls[2]
+    assert FakeVoiceEngine.synthesized.count(f"Hello, I am {bot.bot_name}.") == 1
+
+    response = client.get(f"{settings.API_VERSION}/bot/0/greeting_audio")
+    assert response.status_code == 404
+
+
+def test_tts_cache_hits_misses_and_purges(
+    client: TestClient, db: Session, voice_engine, monkeypatch
+) -> None:
+    bot = create_random_bot(db)
+    bot.greeting = random_lower_string()
+    db.commit()
+
+    def get_greeting_audio() -> str:
+        response = client.get(f"{settings.API_VERSION}/bot/{bot.bot_id}/greeting_audio")
+        assert response.status_code == 200
+        return response.json()["audio_url"]
+
+    hits, misses = tts_cache.hits, tts_cache.misses
+    audio_url = get_greeting_audio()
+    assert (tts_cache.hits, tts_cache.misses) == (hits, misses + 1)
+    assert get_greeting_audio() == audio_url
+    assert (tts_cache.hits, tts_cache.misses) == (hits + 1, misses + 1)
+
+    # Past the memory ttl the entry is found, and stamped, in the table
+    monkeypatch.setattr(tts_cache, "memory_ttl", 0)
+    assert get_greeting_audio() == audio_url
+    assert (tts_cache.hits, tts_cache.misses) == (hits + 2, misses + 1)
+    assert FakeVoiceEngine.synthesized.count(bot.greeting) == 1
+
+    # Not hit within the retention: the row and the audio go
+    db.execute(
+        update(TtsCacheEntry)
+        .where(TtsCacheEntry.audio_url == audio_url)
+        .values(last_hit_at=datetime.now(timezone.utc) - timedelta(days=2))
+    )
+    db.commit()
+    while client.portal.call(tts_cache.purge, timedelta(days=1)):
+        pass
+    assert db.query(TtsCacheEntry).filter_by(audio_url=audio_url).count() == 0
+    assert audio_url in [f"audio/{name}.mp3" for name in FakeVoiceEngine.deleted]
+
+    assert get_greeting_audio() == audio_url
+    assert FakeVoiceEngine.synthesized.count(bot.greeting) == 2
+
+
+def test_reply_audio_is_stored_once_it_repeats(
+    client: TestClient, db: Session, voice_engine
+) -> None:
+    bot = create_random_bot(db)
+    voice = db.get(Voice, bot.voice_id)
+    reply = random_lower_string()
+
+    def get_reply_audio(message_id: int) -> str:
+        return client.portal.call(synthesize_reply, voice, reply, message_id)
+
+    # Seen once: the audio of that message, only the key is recorded
+    assert get_reply_audio(1) == "audio/1.mp3"
+    key = tts_cache.get_key(voice, reply)
+    assert db.get(TtsCacheEntry, key).audio_url is None
+
+    # Seen again: stored, and shared from then on
+    audio_url = get_reply_audio(2)
+    assert audio_url == f"audio/cache/{key}.mp3"
+    assert get_reply_audio(3) == audio_url
+    assert FakeVoiceEngine.synthesized.count(reply) == 2
@@ -1,10 +1,18 @@
+import asyncio
+import base64
+import json
+
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.models import User
+from app.api.api_v1.engines import loaded_engines
 from app.tests.utils.user import create_random_user
 from app.tests.utils.bot import create_random_bot
 from app.tests.utils.voice import create_random_voice
+from app.tests.utils.chat import create_random_chat
 
 
 def test_create_chat(client: TestClient, db: Session) -> None:
@@ -153,12 +161,85 @@ def test_get_messages_by_chat(client: TestClient, db: Session) -> None:
         f"{settings.API_VERSION}/chat/{content['chat_id']}/message",
     )
     assert response.status_code == 200
-    assert len(response.json()) == 1
-    assert response.json()[0]["message"] == "Hello, this is a test message."
-    assert response.json()[0]["created_by_user"] == user.user_id
-    assert response.json()[0]["is_bot"] == False
-    assert "user_id" in response.json()[0], f"'user_id' is not in response"
-    assert "bot_id" in response.json()[0], f"'bot_id' is not in response"
+    messages = response.json()["items"]
+    assert len(messages) == 1
+    assert response.json()["next_cursor"] is None
+    assert messages[0]["message"] == "Hello, this is a test message."
+    assert messages[0]["created_by_user"] == user.user_id
+    assert messages[0]["is_bot"] == False
+    assert "user_id" in messages[0], f"'user_id' is not in response"
+    assert "bot_id" in messages[0], f"'bot_id' is not in response"
+
+
+def test_get_messages_with_cursor(client: TestClient, db: Session) -> None:
+    # Messages inserted in one transaction share created_at, so the pages
+    # also check that ties are broken by message_id
+    chat = create_random_chat(db, num_messages=25)
+
+    message_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(
+            f"{settings.API_VERSION}/chat/{chat.chat_id}/message", params=params
+        )
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 10
+        message_ids += [msg["message_id"] for msg in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(message_ids) == 25
+    assert message_ids == sorted(message_ids, reverse=True)
+
+    response = client.get(
+        f"{settings.API_VERSION}/chat/{chat.chat_id}/message",
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+    for limit in (0, -1, 101):
+        response = client.get(
+            f"{settings.API_VERSION}/chat/{chat.chat_id}/message",
+            params={"limit": limit},
+        )
+        assert response.status_code == 422
+
+
+def test_get_older_messages(client: TestClient, db: Session) -> None:
+    chat = create_random_chat(db, num_messages=12)
+    response = client.get(
+        f"{settings.API_VERSION}/chat/{chat.chat_id}/message", params={"limit": 100}
+    )
+    message_ids = [msg["message_id"] for msg in response.json()["items"]]
+
+    older = []
+    params = {"before": message_ids[4], "limit": 5}
+    while True:
+        response = client.get(
+            f"{settings.API_VERSION}/chat/{chat.chat_id}/messages", params=params
+        )
+        assert response.status_code == 200
+        older += [msg["message_id"] for msg in response.json()["items"]]
+        if response.json()["next_cursor"] is None:
+            break
+        params = {
+            "before": message_ids[4],
+            "limit": 5,
+            "cursor": response.json()["next_cursor"],
+        }
+    assert older == message_ids[5:]
+
+    # A single message is still served by its own route
+    response = client.get(
+        f"{settings.API_VERSION}/chat/{chat.chat_id}/{message_ids[0]}"
+    )
+    assert response.status_code == 200
+    assert response.json()["message_id"] == message_ids[0]
 
 
 def test_delete_message_by_user(client: TestClient, db: Session) -> None:
@@ -197,3 +278,190 @@ def test_delete_message_by_user(client: TestClient, db: Session) -> None:
         f"{settings.API_VERSION}/chat/{content['chat_id']}/{content['message_id']}",
     )
     assert response.status_code == 204
+
+
+def test_create_message_stream(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+    bot = create_random_bot(db, user.user_id)
+
+    response = client.post(
+        f"{settings.API_VERSION}/chat/",
+        json={
+            "user_id": user.user_id,
+            "bot_id1": bot.bot_id,
+            "bot_id2": None,
+            "bot_id3": None,
+            "bot_id4": None,
+            "bot_id5": None,
+        },
+    )
+    content = response.json()
+    assert response.status_code == 201
+    assert "chat_id" in content, f"'chat_id' is not in response"
+
+    response = client.post(
+        f"{settings.API_VERSION}/chat/{content['chat_id']}/message/stream",
+        json={
+            "message": "Hello, this is a test message.",
+            "created_by_user": user.user_id,
+            "is_bot": False,
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: token" in response.text
+    assert "event: done" in response.text
+
+
+class FakeTextEngine:
+    def __init__(self, message_lists, bot_name, description):
+        pass
+
+    async def stream_response(self):
+        for token in ["Hello", " there.", " How are", " you?", " Bye"]:
+            yield token
+
+
+class FakeVoiceEngine:
+    uploads = {}
+
+    def __init__(self, text, voiceObject, message_id=None):
+        self.text = text
+
+    async def get_audio(self):
+        return f"<{self.text}>".encode()
+
+    @staticmethod
+    def get_audio_url(message_id):
+        return f"audio/{message_id}.mp3"
+
+    @staticmethod
+    def upload_message_audio(message_id, data):
+        FakeVoiceEngine.uploads[message_id] = data
+        return True
+
+
+@pytest.fixture
+def speech_engines(monkeypatch):
+    monkeypatch.setitem(loaded_engines, "text", FakeTextEngine)
+    monkeypatch.setitem(loaded_engines, "voice", FakeVoiceEngine)
+
+
+def read_sse(text: str):
+    for frame in text.strip().split("\n\n"):
+        event, data = frame.split("\n")
+        yield event[len("event: ") :], json.loads(data[len("data: ") :])
+
+
+def test_process_audio_stream(
+    client: TestClient, db: Session, current_user: str, speech_engines
+) -> None:
+    db.get(User, current_user) or create_random_user(db, current_user)
+    chat = create_random_chat(db, current_user)
+
+    response = client.post(
+        f"{settings.API_VERSION}/chat/process_audio/{chat.chat_id}/stream",
+        json={"chat_id": chat.chat_id, "bot_id": chat.bot_id1, "text": "Hi"},
+    )
+    assert response.status_code == 200
+    frames = list(read_sse(response.text))
+
+    audio = [data for event, data in frames if event == "audio"]
+    assert [data["sequence"] for data in audio] == [0, 1, 2]
+    assert [data["text"] for data in audio] == ["Hello there.", "How are you?", "Bye"]
+    assert base64.b64decode(audio[0]["audio"]) == b"<Hello there.>"
+
+    event, done = frames[-1]
+    assert event == "done"
+    assert done["message"] == "Hello there. How are you? Bye"
+    assert done["audio_url"] == f"audio/{done['message_id']}.mp3"
+    assert FakeVoiceEngine.uploads[done["message_id"]] == (
+        b"<Hello there.><How are you?><Bye>"
+    )
+
+
+class FakeSpeechToTextEngine:
+    """Recognizes each chunk as one more word, the phrase ends with the audio."""
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.words = []
+
+    def write(self, chunk):
+        self.words.append(chunk.decode())
+        self.queue.put_nowait(("partial", " ".join(self.words)))
+
+    def end_audio(self):
+        self.queue.put_nowait(("final", " ".join(self.words)))
+        self.queue.put_nowait(None)
+
+    async def results(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            yield item
+
+    async def stop(self):
+        pass
+
+
+def test_speech_to_text(client: TestClient, monkeypatch) -> None:
+    monkeypatch.setitem(loaded_engines, "stt", FakeSpeechToTextEngine)
+
+    with client.websocket_connect(
+        f"{settings.API_VERSION}/chat/speech_to_text"
+    ) as websocket:
+        websocket.send_bytes(b"hello")
+        assert websocket.receive_json() == {"event": "partial", "text": "hello"}
+        websocket.send_bytes(b"world")
+        assert websocket.receive_json() == {"event": "partial", "text": "hello world"}
+        websocket.send_text("end")
+        assert websocket.receive_json() == {"event": "final", "text": "hello world"}
+        assert websocket.receive_json() == {"event": "done", "text": "hello world"}
+
+
+def test_last_message_follows_inserts_and_deletes(
+    client: TestClient, db: Session
+) -> None:
+    user = create_random_user(db)
+    bot = create_random_bot(db, user.user_id)
+
+    response = client.post(
+        f"{settings.API_VERSION}/chat/",
+        json={
+            "user_id": user.user_id,
+            "bot_id1": bot.bot_id,
+            "bot_id2": None,
+            "bot_id3": None,
+            "bot_id4": None,
+            "bot_id5": None,
+        },
+    )
+    chat_id = response.json()["chat_id"]
+    assert response.json()["last_message_content"] == bot.greeting
+
+    response = client.post(
+        f"{settings.API_VERSION}/chat/{chat_id}/message",
+        json={
+            "message": "Hello, this is a test message.",
+            "created_by_user": user.user_id,
+            "is_bot": False,
+        },
+    )
+    assert response.status_code == 201
+    bot_reply = response.json()
+
+    response = client.get(f"{settings.API_VERSION}/chat/{user.user_id}")
+    assert response.json()[0]["last_message_content"] == bot_reply["message"]
+
+    response = client.delete(
+        f"{settings.API_VERSION}/chat/{chat_id}/{bot_reply['message_id']}",
+    )
+    assert response.status_code == 204
+
+    response = client.get(f"{settings.API_VERSION}/chat/{user.user_id}")
+    assert len(response.json()) == 1
+    assert (
+        response.json()[0]["last_message_content"] == "Hello, this is a test message."
+    )
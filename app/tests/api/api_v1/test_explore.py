@@ -1,3 +1,6 @@
+import asyncio
+
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
@@ -5,29 +8,258 @@ from app.config import settings
 from app.tests.utils.user import create_random_user
 from app.tests.utils.bot import create_random_bot
 from app.tests.utils.voice import create_random_voice
+from app.tests.utils.groupchat import create_random_group_chat
+from app.tests.utils.chat import create_random_chat
+from app.tests.utils.queries import count_queries
+from app.models import Message, User
+from app.tests.utils.utils import random_lower_string
+from app.api.api_v1.dependency.sampling import (
+    ShuffledCatalog,
+    public_bots,
+    public_group_chats,
+)
+from app.api.api_v1.dependency.ranking import encode_feed_cursor, ranked_feeds
 
 
 def test_get_all_bots(client: TestClient, db: Session) -> None:
     create_random_bot(db)
     response = client.get(f"{settings.API_VERSION}/explore/")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+    assert "next_cursor" in response.json()
+
+
+@pytest.fixture
+def reload_explore(client: TestClient):
+    def reload() -> None:
+        client.portal.call(public_bots.reload)
+        client.portal.call(public_group_chats.reload)
+        client.portal.call(ranked_feeds.reload)
+
+    return reload
 
 
-def test_get_bots_by_category(client: TestClient, db: Session) -> None:
+def test_get_bots_by_category(client: TestClient, db: Session, reload_explore) -> None:
     category = "TV character"
     create_random_bot(db, category=category)
+    reload_explore()
     response = client.get(
         f"{settings.API_VERSION}/explore/category?category={category}"
     )
     assert response.status_code == 200
-    for bot in response.json():
+    assert len(response.json()["items"]) > 0
+    for bot in response.json()["items"]:
         assert bot["category"] == category
 
 
+def test_get_bots_by_category_pages_are_stable(
+    client: TestClient, db: Session, reload_explore
+) -> None:
+    category = random_lower_string()
+    bot_ids = {create_random_bot(db, category=category).bot_id for _ in range(7)}
+    reload_explore()
+
+    def walk(seed: int) -> list:
+        seen = []
+        params = {"category": category, "limit": 3, "seed": seed}
+        while True:
+            response = client.get(
+                f"{settings.API_VERSION}/explore/category", params=params
+            )
+            assert response.status_code == 200
+            seen += [bot["bot_id"] for bot in response.json()["items"]]
+            if response.json()["next_cursor"] is None:
+                return seen
+            params = {
+                "category": category,
+                "limit": 3,
+                "cursor": response.json()["next_cursor"],
+            }
+
+    first = walk(42)
+    assert sorted(first) == sorted(bot_ids)
+    assert walk(42) == first
+
+
+def test_get_bots_by_category_cursor_survives_reload(
+    client: TestClient, db: Session, reload_explore
+) -> None:
+    category = random_lower_string()
+    bots = [create_random_bot(db, category=category) for _ in range(9)]
+    reload_explore()
+
+    params = {"category": category, "limit": 3, "seed": 7}
+    response = client.get(f"{settings.API_VERSION}/explore/category", params=params)
+    seen = [bot["bot_id"] for bot in response.json()["items"]]
+
+    # Another worker, or a refresh, sees a new bot and one that went private
+    hidden = next(bot for bot in bots if bot.bot_id not in seen)
+    hidden.privacy = "private"
+    db.commit()
+    added = create_random_bot(db, category=category)
+    reload_explore()
+
+    cursor = response.json()["next_cursor"]
+    while cursor is not None:
+        response = client.get(
+            f"{settings.API_VERSION}/explore/category",
+            params={"category": category, "limit": 3, "cursor": cursor},
+        )
+        assert response.status_code == 200
+        seen += [bot["bot_id"] for bot in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(
+        bot.bot_id for bot in bots if bot.bot_id != hidden.bot_id
+    )
+    assert added.bot_id not in seen
+
+    response = client.get(
+        f"{settings.API_VERSION}/explore/category",
+        params={"category": category, "cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+
+def get_sparse_page(catalog: ShuffledCatalog, **kwargs):
+    return asyncio.run(catalog.get_page("sparse", 7, **kwargs))
+
+
+def test_shuffled_catalog_pages_are_full_and_seeded() -> None:
+    catalog = ShuffledCatalog(None)
+    # A sparse listing, most ids below the largest one are not members
+    members = set(range(1, 200000, 997))
+    catalog.members, catalog.loaded = {"sparse": members}, True
+
+    def walk(seed: int) -> list:
+        ids, cursor = get_sparse_page(catalog, seed=seed)
+        pages = [ids]
+        while cursor is not None:
+            ids, cursor = get_sparse_page(catalog, cursor=cursor)
+            pages.append(ids)
+        assert all(len(page) == 7 for page in pages[:-1])
+        assert pages[-1]
+        return [id for page in pages for id in page]
+
+    first = walk(0)
+    assert sorted(first) == sorted(members)
+    assert first != sorted(members)
+    assert walk(0) == first
+    assert walk(1) != first
+    # Seeds congruent modulo the largest id are unrelated orders
+    assert walk(max(members)) != first
+
+
 def test_get_bots_by_search(client: TestClient, db: Session) -> None:
     search = "Ammelia"
     create_random_bot(db, bot_name=search)
     response = client.get(f"{settings.API_VERSION}/explore/search?search={search}")
     assert response.status_code == 200
-    assert any(search in bot["bot_name"] for bot in response.json())
+    assert any(search in bot["bot_name"] for bot in response.json()["items"])
+
+
+def test_search_bots_is_ranked_and_tolerant(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    in_name = create_random_bot(db, bot_name=f"{word} the great")
+    in_category = create_random_bot(db, category=word)
+
+    # A prefix in another case still matches, name matches rank first
+    response = client.get(
+        f"{settings.API_VERSION}/explore/search",
+        params={"search": word[:8].upper()},
+    )
+    assert response.status_code == 200
+    bot_ids = [bot["bot_id"] for bot in response.json()["items"]]
+    assert bot_ids.index(in_name.bot_id) < bot_ids.index(in_category.bot_id)
+
+    # One wrong character in the name
+    typo = word[:-1] + ("a" if word[-1] != "a" else "b")
+    response = client.get(
+        f"{settings.API_VERSION}/explore/search", params={"search": typo}
+    )
+    assert in_name.bot_id in [bot["bot_id"] for bot in response.json()["items"]]
+
+
+def test_get_groupchats_query_count_is_flat(
+    client: TestClient, db: Session, reload_explore
+) -> None:
+    if db.get(User, settings.admin_id) is None:
+        create_random_user(db, user_id=settings.admin_id)
+
+    counts = []
+    for _ in range(2):
+        for _ in range(5):
+            create_random_group_chat(db, settings.admin_id, num_bots=3)
+        reload_explore()
+        with count_queries() as statements:
+            response = client.get(f"{settings.API_VERSION}/explore/groupchat")
+        assert response.status_code == 200
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], counts
+
+
+def test_get_feed_trending(client: TestClient, db: Session, reload_explore) -> None:
+    chat = create_random_chat(db)
+    db.add_all(
+        Message(
+            chat_id=chat.chat_id,
+            message=random_lower_string(),
+            created_by_bot=chat.bot_id1,
+            is_bot=True,
+        )
+        for _ in range(50)
+    )
+    db.commit()
+    reload_explore()
+
+    response = client.get(
+        f"{settings.API_VERSION}/explore/feed/trending", params={"limit": 100}
+    )
+    assert response.status_code == 200
+    assert chat.bot_id1 in [bot["bot_id"] for bot in response.json()["items"]]
+
+
+def test_get_feed_most_liked(client: TestClient, reload_explore) -> None:
+    reload_explore()
+    response = client.get(f"{settings.API_VERSION}/explore/feed/most_liked")
+    assert response.status_code == 200
+    likes = [bot["likes"] for bot in response.json()["items"]]
+    assert likes == sorted(likes, reverse=True)
+
+    response = client.get(f"{settings.API_VERSION}/explore/feed/unknown")
+    assert response.status_code == 422
+
+
+def test_get_feed_cursor_survives_rebuild(
+    client: TestClient, db: Session, reload_explore
+) -> None:
+    for _ in range(4):
+        create_random_bot(db)
+    reload_explore()
+
+    response = client.get(
+        f"{settings.API_VERSION}/explore/feed/new", params={"limit": 2}
+    )
+    seen = [bot["bot_id"] for bot in response.json()["items"]]
+
+    # A rebuild, by this or another worker, puts the new bot first
+    added = create_random_bot(db)
+    reload_explore()
+
+    response = client.get(
+        f"{settings.API_VERSION}/explore/feed/new",
+        params={"limit": 2, "cursor": response.json()["next_cursor"]},
+    )
+    assert response.status_code == 200
+    page = [bot["bot_id"] for bot in response.json()["items"]]
+    assert len(page) == 2
+    assert not set(page) & set(seen)
+    assert added.bot_id not in page
+
+    response = client.get(
+        f"{settings.API_VERSION}/explore/feed/new",
+        params={"cursor": encode_feed_cursor(1, 2)},
+    )
+    assert response.status_code == 400
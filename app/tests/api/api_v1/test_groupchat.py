@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.api.api_v1.engines import loaded_engines
+from app.tests.utils.user import create_random_user
+from app.tests.utils.groupchat import create_random_group_chat
+from app.tests.utils.queries import count_queries
+
+
+class FakeGroupTextEngine:
+    def __init__(self, message_list, all_bots, random_bot_name):
+        self.message_list = message_list
+
+    async def get_response(self):
+        return f"reply to {len(self.message_list)} messages"
+
+
+@pytest.fixture
+def group_text_engine(monkeypatch):
+    monkeypatch.setitem(loaded_engines, "group_text", FakeGroupTextEngine)
+
+
+def test_get_chats(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+    group_chat = create_random_group_chat(db, user.user_id, num_bots=3)
+
+    response = client.get(f"{settings.API_VERSION}/groupchat/{user.user_id}")
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content) == 1
+    assert content[0]["group_chat_id"] == group_chat.group_chat_id
+    assert len(content[0]["group_bots"]) == 3
+
+
+def test_get_chats_query_count_is_flat(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+
+    counts = {}
+    num_groups = 0
+    for target in (1, 10, 50):
+        while num_groups < target:
+            create_random_group_chat(db, user.user_id)
+            num_groups += 1
+        with count_queries() as statements:
+            response = client.get(f"{settings.API_VERSION}/groupchat/{user.user_id}")
+        assert len(response.json()) == target
+        counts[target] = len(statements)
+
+    assert counts[1] == counts[10] == counts[50], counts
+
+
+def test_create_message_query_count_is_flat(
+    client: TestClient, db: Session, group_text_engine
+) -> None:
+    # The context holds the last 6 messages, compare 1 bot message with 6
+    counts = []
+    for num_messages in (1, 6):
+        user = create_random_user(db)
+        group_chat = create_random_group_chat(
+            db, user.user_id, num_bots=3, num_messages=num_messages
+        )
+        with count_queries() as statements:
+            response = client.post(
+                f"{settings.API_VERSION}/groupchat/{group_chat.group_chat_id}/message",
+                json={
+                    "message": "Hello group",
+                    "created_by_user": user.user_id,
+                    "is_bot": False,
+                },
+            )
+        assert response.status_code == 201
+        assert response.json()["is_bot"] == True
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
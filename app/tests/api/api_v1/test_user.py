@@ -3,6 +3,9 @@ from app.tests.utils.utils import random_email, random_lower_string
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from app.utils import format_dob_str
+from app.models import User
+from app.tests.utils.user import create_random_user
+from app.tests.utils.bot import create_random_bot
 
 
 def test_create_user(client: TestClient, db: Session) -> None:
@@ -113,3 +116,23 @@ def test_update_user(client: TestClient, db: Session) -> None:
     assert data["bio"] == None
     assert data["status"] == "inactive"
     assert data["theme"] == "light"
+
+
+def test_get_created_bots(client: TestClient, db: Session, current_user: str) -> None:
+    if db.get(User, current_user) is None:
+        create_random_user(db, current_user)
+    bot_ids = [create_random_bot(db, current_user).bot_id for _ in range(3)]
+
+    response = client.get(
+        f"{settings.API_VERSION}/user/created_bots", params={"limit": 2}
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert [bot["bot_id"] for bot in page["items"]] == bot_ids[::-1][:2]
+
+    response = client.get(
+        f"{settings.API_VERSION}/user/created_bots",
+        params={"limit": 2, "cursor": page["next_cursor"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["items"][0]["bot_id"] == bot_ids[0]
@@ -0,0 +1,142 @@
+import datetime
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from fastapi import HTTPException
+from google.auth import crypt, jwt
+
+from app import auth
+from app.auth import FIREBASE_ISSUER, PublicKeyStore, TokenCache
+from app.config import settings
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    """A local RSA key and its self-signed certificate, as Google publishes them."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_token(signing_key, uid: str, kid: str = "known", lifetime: int = 3600):
+    private_pem, _ = signing_key
+    now = int(time.time())
+    payload = {
+        "iss": FIREBASE_ISSUER,
+        "aud": settings.fb_project_id,
+        "sub": uid,
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+    return jwt.encode(signer, payload).decode()
+
+
+@pytest.fixture
+def keys(monkeypatch, signing_key):
+    store = PublicKeyStore("http://keys.invalid")
+    # Loaded as if by the refresh thread, which is never started
+    store.refresh_thread = object()
+    store.certs = {"known": signing_key[1]}
+    store.expires_at = time.time() + 3600
+    monkeypatch.setattr(auth, "public_keys", store)
+    monkeypatch.setattr(auth, "token_cache", TokenCache(max_size=10))
+    return store
+
+
+def test_verified_token_is_cached(keys, signing_key, monkeypatch) -> None:
+    token = make_token(signing_key, "user-1")
+    assert auth.get_current_user(f"Bearer {token}") == "user-1"
+    assert auth.token_cache.snapshot()["misses"] == 1
+
+    # A hit never verifies the signature again
+    def verify_token(token):
+        raise AssertionError("verified again")
+
+    monkeypatch.setattr(auth, "verify_token", verify_token)
+    assert auth.get_current_user(f"Bearer {token}") == "user-1"
+    assert auth.token_cache.snapshot()["hits"] == 1
+    assert token not in str(auth.token_cache.entries)
+
+
+def test_cached_token_expires_with_exp(keys, signing_key, monkeypatch) -> None:
+    token = make_token(signing_key, "user-1", lifetime=60)
+    assert auth.get_current_user(f"Bearer {token}") == "user-1"
+    assert auth.token_cache.get(token) == "user-1"
+
+    real_time = time.time
+
+    class Later:
+        @staticmethod
+        def time():
+            return real_time() + 120
+
+    monkeypatch.setattr(auth, "time", Later)
+    assert auth.token_cache.get(token) is None
+    assert auth.token_cache.snapshot()["evictions"] == 1
+    assert auth.token_cache.snapshot()["size"] == 0
+
+
+def test_token_cache_evicts_least_recently_used() -> None:
+    cache = TokenCache(max_size=2)
+    expires_at = time.time() + 3600
+    cache.set("a", "user-a", expires_at)
+    cache.set("b", "user-b", expires_at)
+    assert cache.get("a") == "user-a"
+    cache.set("c", "user-c", expires_at)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "user-a"
+    assert cache.get("c") == "user-c"
+    assert cache.snapshot()["size"] == 2
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_invalid_token_is_rejected(keys, signing_key) -> None:
+    token = make_token(signing_key, "user-1")
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user(f"Bearer {token[:-4]}abcd")
+    assert error.value.status_code == 401
+    assert auth.token_cache.snapshot()["size"] == 0
+
+
+def test_unknown_kid_falls_back_to_firebase_admin(
+    keys, signing_key, monkeypatch
+) -> None:
+    token = make_token(signing_key, "user-2", kid="rotated")
+    verified = []
+
+    def verify_id_token(id_token, app=None):
+        verified.append(id_token)
+        return {"uid": "user-2", "exp": time.time() + 3600}
+
+    monkeypatch.setattr("firebase_admin.auth.verify_id_token", verify_id_token)
+    monkeypatch.setattr(auth, "get_firebase_app", lambda: None)
+
+    assert auth.get_current_user(f"Bearer {token}") == "user-2"
+    assert verified == [token]
+
+    # Tokens signed with a loaded key never reach the Admin SDK
+    token = make_token(signing_key, "user-1")
+    assert auth.get_current_user(f"Bearer {token}") == "user-1"
+    assert len(verified) == 1
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Cumulative import time budget of app.main, in seconds
+IMPORT_TIME_BUDGET = 3
+
+# Provider SDKs and media libraries that must only load on first use
+LAZY_MODULES = [
+    "librosa",
+    "soundfile",
+    "pydub",
+    "PIL",
+    "azure.cognitiveservices.speech",
+    "azure.storage.blob",
+    "google.generativeai",
+    "openai",
+    "firebase_admin",
+]
+
+
+def get_import_times() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=Path(__file__).resolve().parents[2],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        _, _, fields = line.partition("import time:")
+        parts = [part.strip() for part in fields.split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            import_times[parts[2]] = int(parts[1]) / 1_000_000
+    return import_times
+
+
+def test_app_import_time() -> None:
+    import_times = get_import_times()
+    assert import_times["app.main"] < IMPORT_TIME_BUDGET, (
+        f"Importing app.main took {import_times['app.main']:.2f}s, "
+        f"budget is {IMPORT_TIME_BUDGET}s"
+    )
+    for module in LAZY_MODULES:
+        assert module not in import_times, f"{module} is imported by app.main"
@@ -0,0 +1,58 @@
+import asyncio
+
+from app.config import settings
+from app.middleware import BlockIPList, BlockIPMiddleware
+
+
+def test_block_list_matches_addresses_and_ranges() -> None:
+    block_list = BlockIPList()
+    assert not block_list.loaded
+    block_list.set_entries(
+        ["198.51.100.7", "203.0.113.0/24", " 2001:db8::/32 ", "10.0.0.1/32", "junk"]
+    )
+
+    assert block_list.loaded
+    assert block_list.is_blocked("198.51.100.7")
+    assert block_list.is_blocked("10.0.0.1")
+    assert block_list.is_blocked("203.0.113.0")
+    assert block_list.is_blocked("203.0.113.255")
+    assert block_list.is_blocked("2001:db8::1")
+    assert not block_list.is_blocked("198.51.100.8")
+    assert not block_list.is_blocked("203.0.114.1")
+    assert not block_list.is_blocked("2001:db9::1")
+    assert not block_list.is_blocked("testclient")
+
+
+def call_middleware(block_list: BlockIPList, ip: str, path: str) -> int:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [],
+        "query_string": b"",
+        "client": (ip, 50000),
+    }
+    asyncio.run(BlockIPMiddleware(app, block_list)(scope, receive, send))
+    return messages[0]["status"]
+
+
+def test_blocked_ip_gets_403() -> None:
+    block_list = BlockIPList()
+    block_list.set_entries(["203.0.113.0/24"])
+    path = f"{settings.API_VERSION}/explore/"
+
+    assert call_middleware(block_list, "203.0.113.9", path) == 403
+    assert call_middleware(block_list, "198.51.100.1", path) == 200
+    assert call_middleware(block_list, "198.51.100.1", "/wp-login.php") == 403
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.api.api_v1.engines.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderBusyError,
+    ProviderGuard,
+)
+
+
+def make_guard(
+    breaker: CircuitBreaker = None,
+    max_concurrency: int = 2,
+    queue_timeout: float = 0.1,
+) -> ProviderGuard:
+    return ProviderGuard(
+        "test",
+        max_concurrency=max_concurrency,
+        queue_timeout=queue_timeout,
+        connect_timeout=1,
+        read_timeout=1,
+        breaker=breaker or CircuitBreaker(min_calls=100),
+    )
+
+
+def test_breaker_opens_at_error_rate() -> None:
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, reset_timeout=60)
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    # 1 failure out of 3 calls, and too few calls anyway
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_breaker_half_opens_after_reset_timeout() -> None:
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    # A single probe is let through
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_breaker_half_open_success_closes() -> None:
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.snapshot()["failures"] == 0
+
+
+def test_breaker_half_open_failure_reopens() -> None:
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_guard_records_outcomes_and_checks_breaker() -> None:
+    guard = make_guard(CircuitBreaker(error_rate=0.5, min_calls=3, reset_timeout=60))
+    with guard.guard():
+        pass
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with guard.guard():
+                raise RuntimeError("provider down")
+
+    with pytest.raises(CircuitOpenError):
+        with guard.guard():
+            pass
+    assert guard.snapshot()["rejected"] == 1
+    assert guard.active == 0
+
+
+def test_guard_rejects_callers_past_concurrency_limit() -> None:
+    guard = make_guard(max_concurrency=2, queue_timeout=0.05)
+    release = threading.Event()
+    entered = threading.Barrier(3)
+
+    def hold():
+        with guard.guard():
+            entered.wait()
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in holders:
+        thread.start()
+    entered.wait()
+
+    with pytest.raises(ProviderBusyError):
+        with guard.guard():
+            pass
+    assert guard.rejected == 1
+
+    release.set()
+    for thread in holders:
+        thread.join()
+    # A full queue says nothing about the health of the provider
+    assert guard.breaker.snapshot()["failures"] == 0
+    with guard.guard():
+        pass
+
+
+def test_aguard_queues_excess_callers() -> None:
+    guard = make_guard(max_concurrency=2, queue_timeout=1)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with guard.aguard():
+            peak = max(peak, guard.active)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(5)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert guard.rejected == 0
+    assert guard.active == 0
+    assert guard.waiting == 0
+
+
+def test_aguard_rejects_after_queue_timeout() -> None:
+    guard = make_guard(max_concurrency=1, queue_timeout=0.05)
+
+    async def main():
+        async def hold():
+            async with guard.aguard():
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderBusyError):
+            async with guard.aguard():
+                pass
+        await holder
+
+    asyncio.run(main())
+    assert guard.rejected == 1
+    assert guard.breaker.snapshot()["failures"] == 0
+
+
+def test_nested_rejection_is_not_a_provider_failure() -> None:
+    guard = make_guard(CircuitBreaker(error_rate=0.5, min_calls=1, reset_timeout=60))
+    with pytest.raises(ProviderBusyError):
+        with guard.guard():
+            raise ProviderBusyError("No speech synthesizer available")
+
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.breaker.snapshot()["failures"] == 0
+
+
+def test_guard_counters_are_exact_under_threads() -> None:
+    guard = make_guard(max_concurrency=4, queue_timeout=5)
+
+    def call():
+        for _ in range(200):
+            with guard.guard():
+                pass
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = guard.snapshot()
+    assert (snapshot["active"], snapshot["queue_depth"]) == (0, 0)
+    assert snapshot["rejected"] == 0
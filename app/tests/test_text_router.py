@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+
+from app.api.api_v1.engines import resilience
+from app.api.api_v1.engines.resilience import CircuitBreaker, get_guard
+from app.api.api_v1.engines.text.router import TextProviderRouter
+
+
+class FakeEngine:
+    """Stands in for a text engine, `replies` maps a provider to (delay, reply).
+
+    A reply that is an exception is raised instead of returned.
+    """
+
+    def __init__(self, replies: dict):
+        self.replies = replies
+        self.calls = []
+        self.closed = []
+
+    async def call_provider(self, provider: str) -> str:
+        self.calls.append(provider)
+        delay, reply = self.replies[provider]
+        await asyncio.sleep(delay)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def stream_provider(self, provider: str):
+        return self.stream(provider)
+
+    async def stream(self, provider: str):
+        self.calls.append(provider)
+        delay, reply = self.replies[provider]
+        try:
+            await asyncio.sleep(delay)
+            if isinstance(reply, Exception):
+                raise reply
+            for token in reply:
+                yield token
+                await asyncio.sleep(0)
+        finally:
+            self.closed.append(provider)
+
+
+@pytest.fixture(autouse=True)
+def fresh_guards(monkeypatch):
+    monkeypatch.setattr(resilience, "guards", {})
+
+
+def test_complete_fails_over_to_next_provider() -> None:
+    router = TextProviderRouter(["a", "b"], timeout=1)
+    engine = FakeEngine({"a": (0, RuntimeError("down")), "b": (0, "from b")})
+
+    assert asyncio.run(router.complete(engine)) == "from b"
+    assert engine.calls == ["a", "b"]
+    assert router.stats["a"].failures == 1
+    assert router.stats["b"].successes == 1
+
+
+def test_complete_hedge_wins() -> None:
+    router = TextProviderRouter(["a", "b"], timeout=5, hedging=True, hedge_delay=0.05)
+    engine = FakeEngine({"a": (1, "from a"), "b": (0, "from b")})
+
+    start = time.monotonic()
+    assert asyncio.run(router.complete(engine)) == "from b"
+    assert time.monotonic() - start < 0.5
+    assert engine.calls == ["a", "b"]
+    # The slow primary was cancelled, which is not a failure
+    assert router.stats["a"].failures == 0
+
+
+def test_complete_does_not_retry_a_failed_hedge() -> None:
+    router = TextProviderRouter(
+        ["a", "b", "c"], timeout=5, hedging=True, hedge_delay=0.05
+    )
+    engine = FakeEngine(
+        {
+            "a": (0.1, RuntimeError("a down")),
+            "b": (0.1, RuntimeError("b down")),
+            "c": (0, "from c"),
+        }
+    )
+
+    assert asyncio.run(router.complete(engine)) == "from c"
+    assert engine.calls == ["a", "b", "c"]
+
+
+def test_complete_raises_when_all_providers_fail() -> None:
+    router = TextProviderRouter(["a", "b"], timeout=5, hedging=True, hedge_delay=0.05)
+    engine = FakeEngine(
+        {"a": (0.1, RuntimeError("a down")), "b": (0.1, RuntimeError("b down"))}
+    )
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(router.complete(engine))
+    assert engine.calls == ["a", "b"]
+    assert router.stats["a"].failures == 1
+    assert router.stats["b"].failures == 1
+
+
+def test_open_circuit_is_skipped_not_failed(monkeypatch) -> None:
+    breaker = get_guard("text:a").breaker
+    monkeypatch.setattr(breaker, "state", CircuitBreaker.OPEN)
+    monkeypatch.setattr(breaker, "opened_at", time.monotonic())
+    router = TextProviderRouter(["a", "b"], timeout=1)
+    engine = FakeEngine({"a": (0, "from a"), "b": (0, "from b")})
+
+    assert asyncio.run(router.complete(engine)) == "from b"
+    assert engine.calls == ["b"]
+    assert router.stats["a"].failures == 0
+    assert router.stats["a"].skipped == 1
+
+
+def test_stream_fails_over_before_first_token() -> None:
+    router = TextProviderRouter(["a", "b"], timeout=1)
+    engine = FakeEngine({"a": (0, RuntimeError("down")), "b": (0, ["Hi", " there"])})
+
+    async def collect():
+        return [token async for token in router.stream(engine)]
+
+    assert asyncio.run(collect()) == ["Hi", " there"]
+    assert engine.closed == ["a", "b"]
+    assert router.stats["a"].failures == 1
+    assert router.stats["b"].successes == 1
+
+
+def test_stream_closes_upstream_when_client_goes_away() -> None:
+    router = TextProviderRouter(["a", "b"], timeout=1)
+    engine = FakeEngine({"a": (0, ["one", " two", " three"]), "b": (0, ["b"])})
+
+    async def read_one_token():
+        stream = router.stream(engine)
+        token = await stream.__anext__()
+        await stream.aclose()
+        # Closed right away, not when the loop collects leftover generators
+        assert engine.closed == ["a"]
+        assert get_guard("text:a").active == 0
+        return token
+
+    assert asyncio.run(read_one_token()) == "one"
+    assert engine.calls == ["a"]
+    assert router.stats["a"].failures == 0
+
+
+def test_stream_times_only_the_first_token() -> None:
+    router = TextProviderRouter(["a"], timeout=1)
+    engine = FakeEngine({"a": (0, ["slow"] * 3)})
+
+    async def collect():
+        tokens = []
+        async for token in router.stream(engine):
+            tokens.append(token)
+            # A long reply, read slowly by the client
+            await asyncio.sleep(0.05)
+        return tokens
+
+    assert asyncio.run(collect()) == ["slow"] * 3
+    stats = router.stats["a"]
+    assert list(stats.latencies) == []
+    assert stats.first_token_latencies[0] < 0.05
@@ -21,11 +21,11 @@ def create_random_bot(
 
     voice = create_random_voice(db, owner_id)
 
-    bot_name = random_lower_string()
+    bot_name = bot_name or random_lower_string()
     short_description = random_lower_string()
     description = random_lower_string()
     profile_picture = random_lower_string()
-    category = random_lower_string()
+    category = category or random_lower_string()
     voice_id = voice.voice_id
     created_by = owner_id
     bot_in = BotCreate(
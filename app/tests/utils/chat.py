@@ -0,0 +1,35 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.models import Chat, Message
+from app.tests.utils.utils import random_lower_string
+from app.tests.utils.user import create_random_user
+from app.tests.utils.bot import create_random_bot
+
+
+def create_random_chat(
+    db: Session,
+    owner_id: Optional[str] = None,
+    num_messages: int = 0,
+) -> Chat:
+    if owner_id is None:
+        user = create_random_user(db)
+        owner_id = user.user_id
+
+    bot = create_random_bot(db, owner_id)
+    chat = Chat(user_id=owner_id, bot_id1=bot.bot_id)
+    db.add(chat)
+    db.commit()
+    db.refresh(chat)
+
+    db.add_all(
+        Message(
+            chat_id=chat.chat_id,
+            message=random_lower_string(),
+            created_by_user=owner_id,
+            is_bot=False,
+        )
+        for _ in range(num_messages)
+    )
+    db.commit()
+    return chat
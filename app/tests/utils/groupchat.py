@@ -0,0 +1,40 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.models import GroupChat, GroupChatBots, Message
+from app.tests.utils.utils import random_lower_string
+from app.tests.utils.user import create_random_user
+from app.tests.utils.bot import create_random_bot
+
+
+def create_random_group_chat(
+    db: Session,
+    owner_id: Optional[str] = None,
+    num_bots: int = 2,
+    num_messages: int = 0,
+) -> GroupChat:
+    if owner_id is None:
+        user = create_random_user(db)
+        owner_id = user.user_id
+
+    group_chat = GroupChat(user_id=owner_id, group_chat_name=random_lower_string())
+    db.add(group_chat)
+    db.commit()
+    db.refresh(group_chat)
+
+    bots = [create_random_bot(db, owner_id) for _ in range(num_bots)]
+    db.add_all(
+        GroupChatBots(group_chat_id=group_chat.group_chat_id, bot_id=bot.bot_id)
+        for bot in bots
+    )
+    db.add_all(
+        Message(
+            group_chat_id=group_chat.group_chat_id,
+            message=random_lower_string(),
+            created_by_bot=bots[i % num_bots].bot_id,
+            is_bot=True,
+        )
+        for i in range(num_messages)
+    )
+    db.commit()
+    return group_chat
@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+from typing import Generator, List
+
+from sqlalchemy import event
+
+from app.database import async_engine
+
+
+@contextmanager
+def count_queries() -> Generator[List[str], None, None]:
+    """Collects the statements the async engine runs inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        yield statements
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
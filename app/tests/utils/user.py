@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from sqlalchemy.orm import Session
 
@@ -8,8 +8,9 @@ from app.tests.utils.utils import random_email, random_lower_string
 from app.utils import format_dob, format_dob_str
 
 
-def create_random_user(db: Session) -> User:
-    user_id = random_lower_string()
+def create_random_user(db: Session, user_id: Optional[str] = None) -> User:
+    if user_id is None:
+        user_id = random_lower_string()
     username = random_lower_string()
     gmail = random_email()
     first_name = random_lower_string()